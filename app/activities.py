@@ -1,6 +1,9 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from temporalio import activity
-from app.database import get_db
-from app.models import Order, Payment
+from app.database import get_async_db
 
 from app.function_stubs import (
     order_received,
@@ -9,117 +12,134 @@ from app.function_stubs import (
     order_shipped,
 )
 
+# Well inside the heartbeat_timeout OrderWorkflow gives its activities
+HEARTBEAT_INTERVAL_SECONDS = 1.0
 
-@activity.defn
-async def validate_order_activity(order_data: dict) -> bool:
-    """Validating order data"""
-    print(f"✅ Validating order {order_data['order_id']}...")
 
-    db = next(get_db())
+@asynccontextmanager
+async def heartbeating(interval: Optional[float] = None):
+    """Heartbeat in the background while the block runs.
 
-    try:
-        # Update order status
-        return await order_validated(order_data["order_id"], db)
+    A slow DB step (say, queued for a pool connection) then only runs into
+    start_to_close_timeout, never heartbeat_timeout, and a timed-out attempt
+    still learns of its cancellation at the next heartbeat.
+    """
+    interval = interval or HEARTBEAT_INTERVAL_SECONDS
+
+    async def beat():
+        while True:
+            activity.heartbeat()
+            await asyncio.sleep(interval)
 
-    except Exception as e:
-        db.rollback()
-        print(f"❌ Failed to validate order {order_data['order_id']}: {str(e)}")
-        raise
+    task = asyncio.create_task(beat()) if activity.in_activity() else None
+    try:
+        yield
     finally:
-        db.close()
+        if task is not None:
+            task.cancel()
 
 
 @activity.defn
-async def receive_order_activity(order_id: str) -> dict:
-    """Create a new order in the database with idempotency"""
-    print(f"📦 Receiving order {order_id}")
+async def validate_order_activity(order_data: dict) -> bool:
+    """Validating order data"""
+    activity.logger.info("Validating order")
 
-    db = next(get_db())
-    try:
-        # IDEMPOTENCY CHECK: Check if order already exists
-        existing_order = db.query(Order).filter(Order.id == order_id).first()
-        if existing_order:
-            print(f"✅ Order {order_id} already exists, returning existing result")
-            return {
-                "order_id": order_id,
-                "status": existing_order.status,
-                "items": existing_order.items,
-                "already_processed": True,
-            }
+    async with heartbeating(), get_async_db() as db:
+        try:
+            # Update order status
+            return await order_validated(order_data["order_id"], db)
 
-        # Call the required function stub
-        order = await order_received(order_id, db)
+        except Exception as e:
+            await db.rollback()
+            activity.logger.warning("Failed to validate order: %s", e)
+            raise
 
-        print(f"✅ Order {order_id} created in database")
-        return {"order_id": order_id, "status": "received", "items": order.items}
 
-    except Exception as e:
-        db.rollback()
-        print(f"❌ Failed to create order {order_id}: {str(e)}")
-        raise
-    finally:
-        db.close()
+@activity.defn
+async def receive_order_activity(order_id: str) -> dict:
+    """Create a new order in the database with idempotency"""
+    activity.logger.info("Receiving order")
+
+    async with heartbeating(), get_async_db() as db:
+        try:
+            # Call the required function stub; IDEMPOTENCY is enforced by the
+            # insert itself, which returns the existing order on a retry
+            order = await order_received(order_id, db)
+            if order["already_processed"]:
+                activity.logger.info("Order already exists, returning existing result")
+                return {
+                    "order_id": order_id,
+                    "status": order["status"],
+                    "items": order["items"],
+                    "already_processed": True,
+                }
+
+            activity.logger.info("Order created in database")
+            return {"order_id": order_id, "status": "received", "items": order["items"]}
+
+        except Exception as e:
+            await db.rollback()
+            activity.logger.warning("Failed to create order: %s", e)
+            raise
 
 
 @activity.defn
 async def charge_payment_activity(payment_id: str, order_id: str) -> dict:
     """Process payment and save to database"""
-    print(f"Charging payment {payment_id} for order {order_id}")
-
-    db = next(get_db())
-
-    try:
-        # IDEMPOTENCY CHECK: Check if payment already exists
-        existing_payment = db.query(Payment).filter(Payment.id == payment_id).first()
-        if existing_payment:
-            print(
-                f"✅ Payment {payment_id} already processed, returning existing result"
+    activity.logger.info("Charging payment", extra={"payment_id": payment_id})
+
+    async with heartbeating(), get_async_db() as db:
+        try:
+            # IDEMPOTENCY is enforced by the payment insert, which returns the
+            # stored payment when this payment_id was already charged
+            result = await payment_charged(
+                order_id=order_id, payment_id=payment_id, db=db
             )
+            if result["already_processed"]:
+                activity.logger.info(
+                    "Payment already processed, returning existing result",
+                    extra={"payment_id": payment_id},
+                )
+                return {
+                    "payment_id": payment_id,
+                    "status": result["status"],
+                    "order_id": order_id,
+                    "already_processed": True,
+                }
+
+            activity.logger.info("Payment processed", extra={"payment_id": payment_id})
             return {
                 "payment_id": payment_id,
-                "status": existing_payment.status,
+                "status": result["status"],
                 "order_id": order_id,
-                "already_processed": True,
+                "transaction_id": result["transaction_id"],
             }
 
-        result = await payment_charged(order_id=order_id, payment_id=payment_id, db=db)
-
-        print(f"✅ Payment {payment_id} processed for order {order_id}")
-        return {
-            "payment_id": payment_id,
-            "status": result["status"],
-            "order_id": order_id,
-            "transaction_id": result["transaction_id"],
-        }
-
-    except Exception as e:
-        db.rollback()
-        print(f"❌ Failed to process payment {payment_id}: {str(e)}")
-        raise
-    finally:
-        db.close()
+        except Exception as e:
+            await db.rollback()
+            activity.logger.warning(
+                "Failed to process payment: %s", e, extra={"payment_id": payment_id}
+            )
+            raise
 
 
 @activity.defn
 async def start_shipping_activity(order_id: str) -> dict:
     """Start shipping process and save to database"""
-    print(f"🚚 Starting shipping for order {order_id}")
+    activity.logger.info("Starting shipping")
 
-    db = next(get_db())
+    async with get_async_db() as db:
+        try:
+            # Update order status to shipping
+            await order_shipped(order_id, db)
+            activity.logger.info("Shipping started")
+            return {
+                "order_id": order_id,
+                "status": "shipping",
+                "message": "Shipping process initiated",
+            }
 
-    try:
-        # Update order status to shipping
-        await order_shipped(order_id, db)
-        print(f"✅ Shipping started for order {order_id}")
-        return {
-            "order_id": order_id,
-            "status": "shipping",
-            "message": "Shipping process initiated",
-        }
-
-    except Exception as e:
-        db.rollback()
-        print(f"❌ Failed to start shipping for order {order_id}: {str(e)}")
-        raise
-    finally:
-        db.close()
+        except Exception as e:
+            await db.rollback()
+            activity.logger.warning("Failed to start shipping: %s", e)
+            raise
@@ -0,0 +1,20 @@
+"""Activity names referenced by the workflows.
+
+Workflows call activities by name so the workflow sandbox never imports
+the activity modules (and with them SQLAlchemy and the database drivers).
+Each name must match the function registered with the worker.
+"""
+
+# Order activities (app/activities.py, my-task-queue)
+RECEIVE_ORDER = "receive_order_activity"
+VALIDATE_ORDER = "validate_order_activity"
+CHARGE_PAYMENT = "charge_payment_activity"
+START_SHIPPING = "start_shipping_activity"
+
+# Shipping activities (app/shipping_activities.py, shipping-task-queue)
+PICK_ITEMS = "pick_items_activity"
+PACKAGE_ITEMS = "package_items_activity"
+SELECT_CARRIER = "select_carrier_activity"
+GENERATE_TRACKING = "generate_tracking_activity"
+CONFIRM_DELIVERY = "confirm_delivery_activity"
+SHIP_ORDER = "ship_order_activity"
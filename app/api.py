@@ -1,9 +1,32 @@
+import time
 import uuid
-from fastapi import FastAPI, HTTPException
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from temporalio.client import Client
+from app.temporal_client import get_client, reset_client
+from temporalio.exceptions import WorkflowAlreadyStartedError
+from temporalio.service import RPCError, RPCStatusCode
+from app.cache import TTLCache
+from app.concurrency import gather_bounded, signal_orders
+from app.config import (
+    SHIPPING_MODES,
+    BatchConfig,
+    StatusCacheConfig,
+    shipping_mode_from_env,
+)
+from app.database import AsyncEventRepository, get_async_db, get_pool_stats
+from app.models import Order
+from app.logs import setup_logging
+from app.metrics import (
+    HTTP_REQUEST_LATENCY,
+    PROMETHEUS_CONTENT_TYPE,
+    REGISTRY,
+    Counter,
+)
 from app.order_workflow import OrderWorkflow
+from app.shipping_workflow import ShippingWorkflow
 
 app = FastAPI(title="Order Lifecycle API", version="1.0.0")
 
@@ -14,6 +37,8 @@ class OrderRequest(BaseModel):
     customer_email: str
     items: list
     shipping_address: dict
+    # One of SHIPPING_MODES; defaults to SHIPPING_MODE
+    shipping_mode: Optional[str] = None
 
 
 class OrderResponse(BaseModel):
@@ -23,20 +48,131 @@ class OrderResponse(BaseModel):
     message: str
 
 
+class BatchOrder(OrderRequest):
+    order_id: str
+
+
+class BatchOrderRequest(BaseModel):
+    orders: List[BatchOrder]
+
+
+class BatchOrderResponse(BaseModel):
+    total: int
+    started: int
+    already_started: int
+    failed: int
+    results: List[OrderResponse]
+
+
+class ReviewRequest(BaseModel):
+    approved: bool
+    reason: Optional[str] = None
+
+
+class BatchSignalRequest(BaseModel):
+    order_ids: List[str]
+    data: Optional[Dict[str, Any]] = None
+
+
+class BatchReviewRequest(ReviewRequest):
+    order_ids: List[str]
+
+
+class SignalResult(BaseModel):
+    order_id: str
+    workflow_id: str
+    status: str
+    message: str
+
+
+class BatchSignalResponse(BaseModel):
+    total: int
+    sent: int
+    not_found: int
+    failed: int
+    results: List[SignalResult]
+
+
 class SignalRequest(BaseModel):
     signal_type: str
     data: Optional[Dict[str, Any]] = None
 
 
+class EventResponse(BaseModel):
+    id: int
+    event_type: str
+    event_data: Optional[Dict[str, Any]] = None
+    workflow_id: Optional[str] = None
+    timestamp: datetime
+
+
+class EventPageResponse(BaseModel):
+    order_id: str
+    events: List[EventResponse]
+    # Pass as ?cursor= to get the next page; None on the last page
+    next_cursor: Optional[str] = None
+
+
+# Events returned per page of an order's timeline
+EVENTS_PAGE_DEFAULT = 100
+EVENTS_PAGE_MAX = 1000
+
+
 # Global Temporal client
 temporal_client: Optional[Client] = None
 
+default_shipping_mode = shipping_mode_from_env()
+batch_config = BatchConfig.from_env()
+
+# describe() results keyed by order_id, so polling clients don't hit Temporal
+status_cache_config = StatusCacheConfig.from_env()
+status_cache = TTLCache(
+    max_size=status_cache_config.max_size, ttl=status_cache_config.ttl_seconds
+)
+
+
+def invalidate_order(order_id: str) -> None:
+    """Drop every cached view of an order after changing it"""
+    status_cache.invalidate(order_id)
+    status_cache.invalidate((order_id, "progress"))
+
+
+STATUS_CACHE_EVENTS = Counter(
+    "status_cache_events_total",
+    "Order status cache hits, misses, evictions and invalidations",
+    labelnames=("event",),
+    collect=lambda: [
+        ({"event": event}, status_cache.stats()[event])
+        for event in ("hits", "misses", "evictions", "invalidations")
+    ],
+)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Time every request into HTTP_REQUEST_LATENCY, labelled by route template"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status,
+        )
+
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize Temporal client on startup"""
     global temporal_client
-    temporal_client = await Client.connect("localhost:7233")
+    setup_logging()
+    temporal_client = await get_client()
     print("🚀 Temporal client connected")
 
 
@@ -46,9 +182,31 @@ async def shutdown_event():
     global temporal_client
     if temporal_client:
         # Note: Client doesn't have close() method in this version
+        reset_client()
+        temporal_client = None
         print("🔌 Temporal client shutdown")
 
 
+async def start_order(order_id: str, request: OrderRequest) -> str:
+    """Start OrderWorkflow for one order and return its payment_id"""
+    shipping_mode = request.shipping_mode or default_shipping_mode
+    if shipping_mode not in SHIPPING_MODES:
+        raise ValueError(f"Unknown shipping mode: {shipping_mode}")
+
+    # Generate payment ID
+    payment_id = f"payment-{uuid.uuid4()}"
+
+    # Start the workflow
+    await temporal_client.start_workflow(
+        OrderWorkflow.run,
+        args=[order_id, payment_id, shipping_mode],
+        id=f"workflow-{order_id}",
+        task_queue="my-task-queue",
+    )
+    invalidate_order(order_id)
+    return payment_id
+
+
 @app.post("/orders/{order_id}/start", response_model=OrderResponse)
 async def start_order_workflow(order_id: str, request: OrderRequest):
     """Start OrderWorkflow with provided order_id and payment_id"""
@@ -56,16 +214,7 @@ async def start_order_workflow(order_id: str, request: OrderRequest):
         raise HTTPException(status_code=500, detail="Temporal client not available")
 
     try:
-        # Generate payment ID
-        payment_id = f"payment-{uuid.uuid4()}"
-
-        # Start the workflow
-        await temporal_client.start_workflow(
-            OrderWorkflow.run,
-            args=[order_id, payment_id],
-            id=f"workflow-{order_id}",
-            task_queue="my-task-queue",
-        )
+        payment_id = await start_order(order_id, request)
 
         return OrderResponse(
             order_id=order_id,
@@ -74,12 +223,99 @@ async def start_order_workflow(order_id: str, request: OrderRequest):
             message=f"Order workflow started with payment_id: {payment_id}",
         )
 
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to start workflow: {str(e)}"
         )
 
 
+async def start_batch_order(order: BatchOrder) -> OrderResponse:
+    """Start one order of a batch, reporting failures in the result"""
+    workflow_id = f"workflow-{order.order_id}"
+    try:
+        payment_id = await start_order(order.order_id, order)
+        status = "started"
+        message = f"Order workflow started with payment_id: {payment_id}"
+    except WorkflowAlreadyStartedError:
+        status = "already_started"
+        message = "Order workflow is already running"
+    except Exception as e:
+        status = "failed"
+        message = f"Failed to start workflow: {str(e)}"
+    return OrderResponse(
+        order_id=order.order_id, workflow_id=workflow_id, status=status, message=message
+    )
+
+
+@app.post("/batch/orders", response_model=BatchOrderResponse)
+async def start_order_workflows(request: BatchOrderRequest):
+    """Start OrderWorkflows for many orders with bounded concurrency"""
+    if not temporal_client:
+        raise HTTPException(status_code=500, detail="Temporal client not available")
+    if len(request.orders) > batch_config.max_batch_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {batch_config.max_batch_size} orders",
+        )
+
+    results = await gather_bounded(
+        start_batch_order, request.orders, batch_config.concurrency
+    )
+
+    counts = {"started": 0, "already_started": 0, "failed": 0}
+    for result in results:
+        counts[result.status] += 1
+    return BatchOrderResponse(total=len(results), results=results, **counts)
+
+
+async def signal_batch(
+    order_ids: List[str], signal: str, arg: Any = None
+) -> BatchSignalResponse:
+    """Signal many orders with bounded concurrency"""
+    if not temporal_client:
+        raise HTTPException(status_code=500, detail="Temporal client not available")
+    if len(order_ids) > batch_config.max_batch_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {batch_config.max_batch_size} orders",
+        )
+
+    results = await signal_orders(
+        temporal_client,
+        order_ids,
+        signal,
+        arg,
+        limit=batch_config.concurrency,
+        on_sent=invalidate_order,
+    )
+
+    counts = {"sent": 0, "not_found": 0, "failed": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return BatchSignalResponse(total=len(results), results=results, **counts)
+
+
+@app.post("/batch/orders/signals/cancel", response_model=BatchSignalResponse)
+async def cancel_orders(request: BatchSignalRequest):
+    """Send CancelOrder signal to many running workflows"""
+    return await signal_batch(request.order_ids, "cancel_order_signal")
+
+
+@app.post("/batch/orders/signals/update-address", response_model=BatchSignalResponse)
+async def update_addresses(request: BatchSignalRequest):
+    """Send the same UpdateAddress signal to many running workflows"""
+    return await signal_batch(request.order_ids, "update_address_signal", request.data)
+
+
+@app.post("/batch/orders/signals/review", response_model=BatchSignalResponse)
+async def review_orders(request: BatchReviewRequest):
+    """Send the same review decision to many running workflows"""
+    decision = {"approved": request.approved, "reason": request.reason}
+    return await signal_batch(request.order_ids, "review_order_signal", decision)
+
+
 @app.post("/orders/{order_id}/signals/cancel")
 async def cancel_order(order_id: str):
     """Send CancelOrder signal to running workflow"""
@@ -92,6 +328,7 @@ async def cancel_order(order_id: str):
 
         # Send cancel signal
         await workflow_handle.signal("cancel_order_signal")
+        invalidate_order(order_id)
 
         return {"message": f"Cancel signal sent to order {order_id}"}
 
@@ -113,6 +350,7 @@ async def update_address(order_id: str, request: SignalRequest):
 
         # Send address update signal
         await workflow_handle.signal("update_address_signal", request.data)
+        invalidate_order(order_id)
 
         return {"message": f"Address update signal sent to order {order_id}"}
 
@@ -122,9 +360,38 @@ async def update_address(order_id: str, request: SignalRequest):
         )
 
 
+@app.post("/orders/{order_id}/signals/review")
+async def review_order(order_id: str, request: ReviewRequest):
+    """Send the manual review decision to a running workflow"""
+    if not temporal_client:
+        raise HTTPException(status_code=500, detail="Temporal client not available")
+
+    try:
+        workflow_id = f"workflow-{order_id}"
+        workflow_handle = temporal_client.get_workflow_handle(workflow_id)
+
+        # Send review decision signal
+        await workflow_handle.signal("review_order_signal", request.model_dump())
+        invalidate_order(order_id)
+
+        decision = "Approval" if request.approved else "Rejection"
+        return {"message": f"{decision} signal sent to order {order_id}"}
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to send review signal: {str(e)}"
+        )
+
+
 @app.get("/orders/{order_id}/status")
 async def get_order_status(order_id: str):
     """Query OrderWorkflow status to retrieve current state"""
+    cached = status_cache.get(order_id)
+    if cached is not None:
+        return cached
+    # A signal landing while Temporal is queried must not be cached over
+    token = status_cache.token()
+
     if not temporal_client:
         raise HTTPException(status_code=500, detail="Temporal client not available")
 
@@ -135,7 +402,7 @@ async def get_order_status(order_id: str):
         # Get workflow status
         status = await workflow_handle.describe()
 
-        return {
+        result = {
             "order_id": order_id,
             "workflow_id": workflow_id,
             "status": status.status.name,
@@ -144,6 +411,8 @@ async def get_order_status(order_id: str):
             "start_time": status.start_time.isoformat() if status.start_time else None,
             "close_time": status.close_time.isoformat() if status.close_time else None,
         }
+        status_cache.set(order_id, result, token)
+        return result
 
     except Exception as e:
         raise HTTPException(
@@ -151,7 +420,100 @@ async def get_order_status(order_id: str):
         )
 
 
+@app.get("/orders/{order_id}/progress")
+async def get_order_progress(order_id: str):
+    """Query the workflows for the current lifecycle step"""
+    cache_key = (order_id, "progress")
+    cached = status_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    token = status_cache.token()
+
+    if not temporal_client:
+        raise HTTPException(status_code=500, detail="Temporal client not available")
+
+    try:
+        workflow_id = f"workflow-{order_id}"
+        workflow_handle = temporal_client.get_workflow_handle(workflow_id)
+
+        # A query is answered by the worker from the workflow's state,
+        # without fetching history like describe()
+        progress = await workflow_handle.query(OrderWorkflow.get_progress)
+
+        shipping = None
+        if progress.get("shipping_workflow_id"):
+            shipping_handle = temporal_client.get_workflow_handle(
+                progress["shipping_workflow_id"]
+            )
+            shipping = await shipping_handle.query(ShippingWorkflow.get_progress)
+
+        result = {"workflow_id": workflow_id, **progress, "shipping": shipping}
+        status_cache.set(
+            cache_key, result, token, ttl=status_cache_config.progress_ttl_seconds
+        )
+        return result
+
+    except RPCError as e:
+        # Not started (or not visible) yet: clients polling right after a
+        # start can tell this apart from a failure
+        if e.status == RPCStatusCode.NOT_FOUND:
+            raise HTTPException(status_code=404, detail="Workflow not found")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to query workflow progress: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to query workflow progress: {str(e)}"
+        )
+
+
+@app.get("/orders/{order_id}/events", response_model=EventPageResponse)
+async def get_order_events(
+    order_id: str,
+    limit: int = Query(EVENTS_PAGE_DEFAULT, ge=1, le=EVENTS_PAGE_MAX),
+    cursor: Optional[str] = None,
+):
+    """Page through an order's audit events, oldest first"""
+    async with get_async_db() as db:
+        try:
+            events, next_cursor = await AsyncEventRepository(db).get_order_events_page(
+                order_id, limit, cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Only an empty first page pays for telling "no events" from "no order"
+        if not events and cursor is None and await db.get(Order, order_id) is None:
+            raise HTTPException(status_code=404, detail="Order not found")
+
+    return {
+        "order_id": order_id,
+        "events": [
+            EventResponse.model_validate(e, from_attributes=True) for e in events
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "Order Lifecycle API"}
+
+
+@app.get("/health/db-pool")
+async def db_pool_stats():
+    """Connection pool occupancy and checkout wait times"""
+    return get_pool_stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of API, DB pool and cache metrics"""
+    return Response(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/health/status-cache")
+async def status_cache_stats():
+    """Hit/miss counters for the order status cache"""
+    return status_cache.stats()
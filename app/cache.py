@@ -0,0 +1,116 @@
+"""Small in-process caches for the API"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire `ttl` seconds after being set.
+
+    A read-through caller takes a token() before fetching and passes it to
+    set(); the write is dropped if the key was invalidated in between, so a
+    slow read cannot cache a result older than the invalidating change.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Tick of each key's latest invalidation, bounded like the entries;
+        # keys pushed out count as invalidated at the newest forgotten tick
+        self._tick = 0
+        self._invalidated: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._forgotten_tick = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value for `key`, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def token(self) -> int:
+        """Take before reading the source; see set()"""
+        with self._lock:
+            return self._tick
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        token: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        """Store `value`, evicting the least recently used entry when full.
+
+        With a `token`, nothing is stored if `key` was invalidated after the
+        token was taken. `ttl` overrides the cache's TTL for this entry.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if self.max_size <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            if token is not None:
+                invalidated = self._invalidated.get(key, self._forgotten_tick)
+                if invalidated > token:
+                    return
+            self._entries[key] = (self.clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop `key` so the next read goes to the source"""
+        with self._lock:
+            self._tick += 1
+            self._invalidated[key] = self._tick
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > max(self.max_size, 1):
+                _, self._forgotten_tick = self._invalidated.popitem(last=False)
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,69 @@
+"""Helpers for running many Temporal calls concurrently"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+from temporalio.client import Client
+from temporalio.service import RPCError, RPCStatusCode
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def gather_bounded(
+    func: Callable[[T], Awaitable[R]], items: Iterable[T], limit: int
+) -> List[R]:
+    """Call `func` on every item with at most `limit` calls in flight.
+
+    Results are returned in the order of `items`. `func` is expected to
+    turn its own failures into results so one item cannot fail the batch.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(item: T) -> R:
+        async with semaphore:
+            return await func(item)
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+async def signal_orders(
+    client: Client,
+    order_ids: Iterable[str],
+    signal: str,
+    arg: Any = None,
+    limit: int = 50,
+    on_sent: Optional[Callable[[str], None]] = None,
+) -> List[dict]:
+    """Send one signal to the OrderWorkflow of every order id.
+
+    Returns {"order_id", "workflow_id", "status", "message"} per order, with
+    status "sent", "not_found" or "failed". `on_sent` is called with each
+    order id that was signalled.
+    """
+    args = [] if arg is None else [arg]
+
+    async def send(order_id: str) -> dict:
+        workflow_id = f"workflow-{order_id}"
+        try:
+            await client.get_workflow_handle(workflow_id).signal(signal, *args)
+        except RPCError as e:
+            not_found = e.status == RPCStatusCode.NOT_FOUND
+            status = "not_found" if not_found else "failed"
+            return _signal_result(order_id, workflow_id, status, str(e))
+        except Exception as e:
+            return _signal_result(order_id, workflow_id, "failed", str(e))
+        if on_sent is not None:
+            on_sent(order_id)
+        return _signal_result(order_id, workflow_id, "sent", f"{signal} sent")
+
+    return await gather_bounded(send, order_ids, limit)
+
+
+def _signal_result(order_id: str, workflow_id: str, status: str, message: str):
+    return {
+        "order_id": order_id,
+        "workflow_id": workflow_id,
+        "status": status,
+        "message": message,
+    }
@@ -0,0 +1,222 @@
+"""Buffered, batched writer for the events audit table"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import exists, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import EventSinkConfig
+from app.models import Event
+
+EVENT_COLUMNS = ("order_id", "event_type", "event_data", "workflow_id", "timestamp")
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+def event_timestamp() -> datetime:
+    """Timestamp for a new event: naive UTC, like the events column holds"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class BatchedEventSink:
+    """Collect events in-process and write them with one multi-row INSERT.
+
+    A batch is flushed when it reaches `max_batch_size` or `flush_interval`
+    seconds after its first event, whichever comes first. A failed flush is
+    retried `flush_attempts` times. In durable mode `write()` only returns
+    once the event's batch has committed, and raises if every attempt failed
+    so the calling activity fails and Temporal retries it.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        max_batch_size: int = 500,
+        flush_interval: float = 0.05,
+        durable: bool = False,
+        flush_attempts: int = 3,
+    ):
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.durable = durable
+        self.flush_attempts = flush_attempts
+        self.batches_written = 0
+        self.events_written = 0
+        self.events_dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def start(self) -> None:
+        """Start the background flush task on the running loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def write(self, event_data: dict) -> None:
+        """Queue an event; in durable mode wait until it has been committed"""
+        if self._task is None or self._task.done() or self._closing:
+            raise RuntimeError("Event sink is not running")
+
+        row = {column: event_data.get(column) for column in EVENT_COLUMNS}
+        # Stamp the event now so batching does not reorder the timeline
+        if row["timestamp"] is None:
+            row["timestamp"] = event_timestamp()
+
+        future = asyncio.get_running_loop().create_future() if self.durable else None
+        self._queue.put_nowait((row, future))
+        if future is not None:
+            await future
+
+    async def close(self) -> None:
+        """Flush everything still buffered and stop the background task"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._queue.put_nowait(_STOP)
+        await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "durable": self.durable,
+            "pending": self._queue.qsize(),
+            "batches_written": self.batches_written,
+            "events_written": self.events_written,
+            "events_dropped": self.events_dropped,
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[dict, Optional[asyncio.Future]]]) -> None:
+        rows = [row for row, _ in batch]
+        error = None
+        for attempt in range(self.flush_attempts):
+            if attempt:
+                await asyncio.sleep(0.1 * 2**attempt)
+            try:
+                async with self.session_factory() as db:
+                    await db.execute(insert(Event).values(rows))
+                    await db.commit()
+                break
+            except Exception as e:
+                error = e
+        else:
+            self.events_dropped += len(rows)
+            logger.error("Failed to write %d buffered events: %s", len(rows), error)
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(error)
+            return
+
+        self.batches_written += 1
+        self.events_written += len(rows)
+        for _, future in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+
+# Process-wide sink; None means events are written inline
+_sink: Optional[BatchedEventSink] = None
+
+
+def get_event_sink() -> Optional[BatchedEventSink]:
+    """The running event sink, if batching is enabled"""
+    return _sink
+
+
+def start_event_sink(
+    config: EventSinkConfig, session_factory: Callable[[], AsyncSession]
+) -> Optional[BatchedEventSink]:
+    """Start the process-wide sink unless the config asks for inline writes"""
+    global _sink
+    if config.mode == "inline":
+        return None
+
+    _sink = BatchedEventSink(
+        session_factory,
+        max_batch_size=config.max_batch_size,
+        flush_interval=config.flush_interval_ms / 1000,
+        durable=config.mode == "durable",
+    )
+    _sink.start()
+    return _sink
+
+
+async def stop_event_sink() -> None:
+    """Flush and stop the process-wide sink (call on worker shutdown)"""
+    global _sink
+    if _sink is not None:
+        await _sink.close()
+        _sink = None
+
+
+async def commit_with_event(db: AsyncSession, event_data: dict) -> None:
+    """Commit `db` together with one audit event.
+
+    Inline mode adds the event to the same transaction. Otherwise the status
+    change is committed first (the event references the order) and the event
+    goes to the sink; in durable mode this waits for the event's batch, so
+    the activity does not complete before its event is stored.
+
+    Both modes stamp the event from the worker's clock; a database now()
+    default would mix two clocks in one timeline when modes are mixed.
+    """
+    if event_data.get("timestamp") is None:
+        event_data = {**event_data, "timestamp": event_timestamp()}
+    sink = get_event_sink()
+    if sink is None:
+        db.add(Event(**event_data))
+        await db.commit()
+    else:
+        await db.commit()
+        await sink.write(event_data)
+
+
+async def ensure_event(db: AsyncSession, event_data: dict) -> bool:
+    """Write `event_data` unless the order already has an event of its type.
+
+    For retries that find their row already committed. With a sink the row
+    commits before the event is written, so a failed sink write followed by
+    a retry would otherwise lose the event. Returns True if it was missing.
+    """
+    stored = await db.scalar(
+        select(
+            exists().where(
+                Event.order_id == event_data["order_id"],
+                Event.event_type == event_data["event_type"],
+            )
+        )
+    )
+    if stored:
+        return False
+    await commit_with_event(db, event_data)
+    return True
@@ -0,0 +1,95 @@
+"""Seeded fault injection for the simulated order activities"""
+
+import asyncio
+import itertools
+import random
+from typing import Optional
+
+from temporalio import activity
+
+from app.config import FaultConfig
+
+fault_config = FaultConfig.from_env()
+
+# Keys calls made outside an activity (scripts, tests) when seeded
+_call_counter = itertools.count()
+
+
+class InjectedFault(RuntimeError):
+    """Failure raised on purpose by the fault profile"""
+
+
+def configure_faults(config: FaultConfig) -> None:
+    """Use `config` for every following fault_point() call"""
+    global fault_config, _call_counter
+    fault_config = config
+    _call_counter = itertools.count()
+
+
+def describe_faults(config: FaultConfig) -> str:
+    """One-line summary of the profile for startup logs"""
+    if not config.enabled:
+        return "off"
+    seed = "unseeded" if config.seed is None else f"seed={config.seed}"
+    return (
+        f"{seed}, fail={config.failure_rate:.0%}, "
+        f"hang={config.hang_rate:.0%} for {config.hang_seconds:g}s, "
+        f"latency={config.latency_min_ms}-{config.latency_max_ms}ms"
+    )
+
+
+def _call_key() -> str:
+    """Identity of this call: the same activity attempt gets the same key"""
+    if activity.in_activity():
+        info = activity.info()
+        return f"{info.workflow_id}:{info.activity_type}:{info.attempt}"
+    return f"call:{next(_call_counter)}"
+
+
+def _rng(config: FaultConfig, key: str) -> random.Random:
+    if config.seed is None:
+        return random.Random()
+    return random.Random(f"{config.seed}:{key}")
+
+
+def draw_fault(config: FaultConfig, key: str) -> tuple:
+    """(outcome, latency seconds) for a call; outcome is ok, fail or hang"""
+    rng = _rng(config, key)
+    latency = rng.uniform(config.latency_min_ms, config.latency_max_ms) / 1000
+    roll = rng.random()
+    if roll < config.failure_rate:
+        return "fail", latency
+    if roll < config.failure_rate + config.hang_rate:
+        return "hang", latency
+    return "ok", latency
+
+
+async def _sleep_heartbeating(seconds: float, heartbeat_seconds: float) -> None:
+    """Sleep for `seconds`, heartbeating so a timed-out attempt is cancelled.
+
+    Once the server has timed the attempt out, the next heartbeat delivers
+    the cancellation and the sleep raises CancelledError, freeing the
+    activity slot instead of holding it for the rest of the hang. The
+    heartbeats also keep long injected latency within heartbeat_timeout.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    in_activity = activity.in_activity()
+    while (remaining := deadline - loop.time()) > 0:
+        if in_activity:
+            activity.heartbeat("injected hang")
+        await asyncio.sleep(min(heartbeat_seconds, remaining))
+
+
+async def fault_point(config: Optional[FaultConfig] = None) -> None:
+    """Apply the fault profile to one call: add latency, then fail or hang"""
+    config = config or fault_config
+    if not config.enabled:
+        return
+    outcome, latency = draw_fault(config, _call_key())
+    if latency > 0:
+        await _sleep_heartbeating(latency, config.heartbeat_seconds)
+    if outcome == "fail":
+        raise InjectedFault("Forced failure for testing")
+    if outcome == "hang":
+        await _sleep_heartbeating(config.hang_seconds, config.heartbeat_seconds)
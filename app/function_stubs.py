@@ -1,71 +1,98 @@
-import asyncio
-import random
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import uuid
 
-from sqlalchemy.orm import Session
+from sqlalchemy import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from temporalio import activity
 
-from app.models import Event, Order, Payment
+from app.database import AsyncOrderRepository, AsyncPaymentRepository
+from app.event_sink import commit_with_event, ensure_event
+from app.faults import fault_point
+from app.metrics import DB_STEP_LATENCY
+from app.query_profile import query_budget
 
 
 async def flaky_call() -> None:
-    """Either raise an error or sleep long enough to trigger an activity timeout."""
-    rand_num = random.random()
-    if rand_num < 0.33:
-        raise RuntimeError("Forced failure for testing")
+    """Inject the configured fault profile (see app.faults)."""
+    await fault_point()
+
+
+async def _transition(
+    db: AsyncSession,
+    order_id: str,
+    status: str,
+    event_type: str,
+    event_data: dict,
+    from_status: Optional[str] = None,
+) -> Optional[Row]:
+    """Move an order to `status`, commit it and log its event.
+
+    Inline, the event commits in the same transaction as the status; with a
+    batched or durable sink it is written after that commit (see
+    commit_with_event). The UPDATE returns the columns callers need, so
+    there is no SELECT before it and no reload after the commit. Returns
+    None (without committing) when no order matches `order_id` and
+    `from_status`.
+    """
+    row = await AsyncOrderRepository(db).transition_order(order_id, status, from_status)
+    if row is None:
+        return None
 
-    if rand_num < 0.67:
-        await asyncio.sleep(
-            300
-        )  # Expect the activity layer to time out before this completes
+    await commit_with_event(
+        db,
+        {"order_id": order_id, "event_type": event_type, "event_data": event_data},
+    )
+    return row
 
 
-async def order_received(order_id: str, db: Session) -> Dict[str, Any]:
+@query_budget(4)
+async def order_received(order_id: str, db: AsyncSession) -> Dict[str, Any]:
     await flaky_call()
-    # Create order record
-    order = Order(
-        id=order_id,
-        status="received",
-        customer_name="John Doe",
-        customer_email="john@example.com",
-        total_amount=99.99,
-        items=[{"sku": "ABC123", "qty": 1, "price": 99.99}],
-        shipping_address={
-            "street": "123 Main St",
-            "city": "Anytown",
-            "state": "CA",
-        },
-    )
-    db.add(order)
-    # Log event
-    event = Event(
-        order_id=order_id,
-        event_type="order_received",
-        event_data={"status": "created"},
-    )
-    db.add(event)
-
-    db.commit()
-    return order
+    with DB_STEP_LATENCY.time(step="order_received"):
+        # Create order record; a retry finds the existing one in the same statement
+        order, created = await AsyncOrderRepository(db).insert_or_get_order(
+            {
+                "id": order_id,
+                "status": "received",
+                "customer_name": "John Doe",
+                "customer_email": "john@example.com",
+                "total_amount": 99.99,
+                "items": [{"sku": "ABC123", "qty": 1, "price": 99.99}],
+                "shipping_address": {
+                    "street": "123 Main St",
+                    "city": "Anytown",
+                    "state": "CA",
+                },
+            },
+        )
+        event = {
+            "order_id": order_id,
+            "event_type": "order_received",
+            "event_data": {"status": "created"},
+        }
+        if created:
+            await commit_with_event(db, event)
+        else:
+            await ensure_event(db, event)
+    return {
+        "status": order.status,
+        "items": order.items,
+        "already_processed": not created,
+    }
 
 
-async def order_validated(order_id: str, db: Session) -> bool:
+@query_budget(2)
+async def order_validated(order_id: str, db: AsyncSession) -> bool:
     await flaky_call()
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if order:
-        order.status = "validated"
-        db.commit()
-
-        # Log event
-        event = Event(
-            order_id=order_id,
-            event_type="order_validated",
-            event_data={"status": "validated"},
+    with DB_STEP_LATENCY.time(step="order_validated"):
+        order = await _transition(
+            db, order_id, "validated", "order_validated", {"status": "validated"}
+        )
+    if order is None:
+        activity.logger.warning(
+            "Order not found in database", extra={"order_id": order_id}
         )
-        db.add(event)
-        db.commit()
-    else:
-        print(f"❌ Order {order_id} not found in database")
         return False
 
     items = order.items
@@ -75,108 +102,133 @@ async def order_validated(order_id: str, db: Session) -> bool:
     return True
 
 
+@query_budget(4)
 async def payment_charged(
-    order_id: str, payment_id: str, db: Session
+    order_id: str, payment_id: str, db: AsyncSession
 ) -> Dict[str, Any]:
     """Charge payment after simulating an error/timeout first.
-    You must implement your own idempotency logic in the activity or here.
+    Idempotent on payment_id: a retry gets the stored payment back from the
+    same INSERT statement instead of charging again.
     """
     await flaky_call()
-    # VALIDATION: Check if order exists and is in correct state
-
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise ValueError(f"Order {order_id} not found")
 
-    if order.status != "validated":
+    with DB_STEP_LATENCY.time(step="payment_charged"):
+        # Create payment record unless a previous attempt already did
+        try:
+            payment, created = await AsyncPaymentRepository(db).insert_or_get_payment(
+                {
+                    "id": payment_id,
+                    "order_id": order_id,
+                    "amount": 99.99,
+                    "status": "completed",
+                    "payment_method": "credit_card",
+                    "transaction_id": f"txn-{uuid.uuid4()}",
+                },
+            )
+        except IntegrityError:
+            # PostgreSQL's payments.order_id foreign key rejects an unknown
+            # order here; fail the same way as backends without the key do
+            await db.rollback()
+            if await AsyncOrderRepository(db).get_order_status(order_id) is None:
+                raise ValueError(f"Order {order_id} not found")
+            raise
+        if not created:
+            # The payment and the "paid" status commit together; only the
+            # event can be missing if the sink failed after that commit
+            await ensure_event(
+                db,
+                {
+                    "order_id": order_id,
+                    "event_type": "payment_charged",
+                    "event_data": {
+                        "payment_id": payment_id,
+                        "status": "completed",
+                        "transaction_id": payment.transaction_id,
+                    },
+                },
+            )
+            return {
+                "status": payment.status,
+                "transaction_id": payment.transaction_id,
+                "already_processed": True,
+            }
+
+        # VALIDATION: the order moves to "paid" only if it is currently
+        # "validated"; payment, status and event commit together
+        order = await _transition(
+            db,
+            order_id,
+            "paid",
+            "payment_charged",
+            {
+                "payment_id": payment_id,
+                "status": "completed",
+                "transaction_id": payment.transaction_id,
+            },
+            from_status="validated",
+        )
+    if order is None:
+        # Only the failure path pays for a second look at the order
+        await db.rollback()
+        status = await AsyncOrderRepository(db).get_order_status(order_id)
+        if status is None:
+            raise ValueError(f"Order {order_id} not found")
         raise ValueError(
-            f"Order {order_id} is in {order.status} state, cannot process payment"
+            f"Order {order_id} is in {status} state, cannot process payment"
         )
 
-    # Create payment record
-    payment = Payment(
-        id=payment_id,
-        order_id=order_id,
-        amount=99.99,
-        status="completed",
-        payment_method="credit_card",
-        transaction_id=f"txn-{uuid.uuid4()}",
-    )
-    db.add(payment)
-
-    order.status = "paid"
-    db.commit()
-
-    # Log the event
-    event = Event(
-        order_id=order_id,
-        event_type="payment_charged",
-        event_data={
-            "payment_id": payment_id,
-            "status": "completed",
-            "transaction_id": payment.transaction_id,
-        },
-    )
-    db.add(event)
-    db.commit()
     amount = sum(i.get("qty", 1) for i in order.items)
     return {
         "status": "charged",
         "amount": amount,
         "transaction_id": payment.transaction_id,
+        "already_processed": False,
     }
 
 
-async def order_shipped(order_id: str, db: Session) -> str:
+@query_budget(2)
+async def order_shipped(order_id: str, db: AsyncSession) -> str:
     await flaky_call()
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if order:
-        order.status = "shipping"
-        # db.add(order)
-        db.commit()
-
-    # Create shipping event
-    event = Event(
-        order_id=order_id,
-        event_type="shipping_started",
-        event_data={"status": "shipping_initiated"},
-    )
-    db.add(event)
-
-    db.commit()
-
+    with DB_STEP_LATENCY.time(step="shipping_started"):
+        order = await _transition(
+            db,
+            order_id,
+            "shipping",
+            "shipping_started",
+            {"status": "shipping_initiated"},
+        )
+    if order is None:
+        raise ValueError(f"Order {order_id} not found")
     return "Shipped"
 
 
-async def package_prepared(order_id: str, db: Session) -> str:
+@query_budget(2)
+async def package_prepared(order_id: str, db: AsyncSession) -> str:
     await flaky_call()
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if order:
-        order.status = "package_prepared"
-        db.commit()
-
-    event = Event(
-        order_id=order_id,
-        event_type="package_prepared",
-        event_data={"status": "package_prepared"},
-    )
-    db.add(event)
-    db.commit()
+    with DB_STEP_LATENCY.time(step="package_prepared"):
+        order = await _transition(
+            db,
+            order_id,
+            "package_prepared",
+            "package_prepared",
+            {"status": "package_prepared"},
+        )
+    if order is None:
+        raise ValueError(f"Order {order_id} not found")
     return "Package ready"
 
 
-async def carrier_dispatched(order_id: str, db: Session) -> str:
+@query_budget(2)
+async def carrier_dispatched(order_id: str, db: AsyncSession) -> str:
     await flaky_call()
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if order:
-        order.status = "carrier_dispatched"
-        db.commit()
-
-    event = Event(
-        order_id=order_id,
-        event_type="carrier_dispatched",
-        event_data={"status": "carrier_dispatched"},
-    )
-    db.add(event)
-    db.commit()
+    with DB_STEP_LATENCY.time(step="carrier_dispatched"):
+        order = await _transition(
+            db,
+            order_id,
+            "carrier_dispatched",
+            "carrier_dispatched",
+            {"status": "carrier_dispatched"},
+        )
+    if order is None:
+        raise ValueError(f"Order {order_id} not found")
     return "Dispatched"
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""Drive N orders through the system and report throughput and latency"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from temporalio.exceptions import WorkflowAlreadyStartedError
+
+from app.config import SHIPPING_MODES, add_temporal_arguments, temporal_config_from_args
+from app.order_workflow import OrderWorkflow
+from app.temporal_client import configure_temporal, get_client
+
+# OrderWorkflow steps that end the run (see OrderWorkflow.get_progress)
+TERMINAL_STEPS = ("completed", "failed", "cancelled", "rejected")
+
+# Error messages kept in the report; all of them are counted
+MAX_ERROR_SAMPLES = 20
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """q-th percentile (0-100) with linear interpolation, None if empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    value = ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+    return round(value, 4)
+
+
+def summarize(values: List[float]) -> dict:
+    """Count, mean and percentiles of a list of latencies in seconds"""
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4) if values else None,
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": round(max(values), 4) if values else None,
+    }
+
+
+class ClientTarget:
+    """Start and follow orders directly through the Temporal client"""
+
+    name = "client"
+
+    def __init__(self, client, shipping_mode: str):
+        self.client = client
+        self.shipping_mode = shipping_mode
+
+    async def start(self, order_id: str) -> None:
+        await self.client.start_workflow(
+            OrderWorkflow.run,
+            args=[order_id, f"payment-{order_id}", self.shipping_mode],
+            id=f"workflow-{order_id}",
+            task_queue="my-task-queue",
+        )
+
+    async def approve(self, order_id: str) -> None:
+        handle = self.client.get_workflow_handle(f"workflow-{order_id}")
+        await handle.signal("review_order_signal", {"approved": True})
+
+    async def wait(self, order_id: str) -> dict:
+        handle = self.client.get_workflow_handle(f"workflow-{order_id}")
+        return await handle.result()
+
+    async def close(self) -> None:
+        pass
+
+
+class ApiTarget:
+    """Start orders through the FastAPI service and poll their progress.
+
+    Completion is only seen at the next poll, so end-to-end latency has a
+    resolution of `poll_interval`. Run the API with
+    STATUS_CACHE_PROGRESS_TTL_SECONDS=0 to avoid measuring the cache TTL too.
+    """
+
+    name = "api"
+
+    def __init__(self, base_url: str, shipping_mode: str, poll_interval: float):
+        import httpx
+
+        self.http = httpx.AsyncClient(base_url=base_url, timeout=30.0)
+        self.shipping_mode = shipping_mode
+        self.poll_interval = poll_interval
+
+    async def start(self, order_id: str) -> None:
+        response = await self.http.post(
+            f"/orders/{order_id}/start",
+            json={
+                "customer_name": "Load Test",
+                "customer_email": "loadtest@example.com",
+                "items": [{"sku": "ABC123", "qty": 1, "price": 99.99}],
+                "shipping_address": {"street": "123 Main St", "city": "Anytown"},
+                "shipping_mode": self.shipping_mode,
+            },
+        )
+        response.raise_for_status()
+
+    async def approve(self, order_id: str) -> None:
+        response = await self.http.post(
+            f"/orders/{order_id}/signals/review", json={"approved": True}
+        )
+        response.raise_for_status()
+
+    async def wait(self, order_id: str) -> dict:
+        """Poll until the order ends; raises on any error but an early 404.
+
+        A 404 before the first successful poll means the workflow is not
+        visible yet; once it has been seen, a 404 is an error too.
+        """
+        seen = False
+        while True:
+            response = await self.http.get(f"/orders/{order_id}/progress")
+            if response.status_code == 200:
+                seen = True
+                progress = response.json()
+                if progress["step"] in TERMINAL_STEPS:
+                    return {
+                        "status": progress["step"],
+                        "step_timings": progress.get("step_timings", {}),
+                    }
+            elif response.status_code != 404 or seen:
+                response.raise_for_status()
+            await asyncio.sleep(self.poll_interval)
+
+    async def close(self) -> None:
+        await self.http.aclose()
+
+
+class LoadGenerator:
+    """Start `orders` orders at `rate` per second and wait for each one.
+
+    An order that has not finished `order_timeout` seconds after it started
+    (0: no limit) counts as a timeout error.
+    """
+
+    def __init__(
+        self,
+        target,
+        orders: int,
+        rate: float = 0.0,
+        concurrency: int = 100,
+        approve_review: bool = False,
+        run_id: Optional[str] = None,
+        order_timeout: float = 600.0,
+    ):
+        self.target = target
+        self.orders = orders
+        self.rate = rate
+        self.concurrency = concurrency
+        self.approve_review = approve_review
+        self.order_timeout = order_timeout
+        self.run_id = run_id or uuid.uuid4().hex[:8]
+        self.start_latencies: List[float] = []
+        self.end_to_end: List[float] = []
+        self.step_latencies: Dict[str, List[float]] = {}
+        self.outcomes: Dict[str, int] = {}
+        self.error_count = 0
+        # The first few errors, as samples; error_count has the total
+        self.errors: List[str] = []
+        self.first_start: Optional[float] = None
+        self.last_completion: Optional[float] = None
+
+    async def run(self) -> dict:
+        started_at = datetime.now(timezone.utc)
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        loop_start = time.perf_counter()
+
+        async def one(index: int):
+            # Open-loop schedule: order i is due at i / rate seconds
+            if self.rate > 0:
+                delay = loop_start + index / self.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            async with semaphore:
+                await self._drive(f"load-{self.run_id}-{index}")
+
+        await asyncio.gather(*(one(index) for index in range(self.orders)))
+        await self.target.close()
+        return self.report(started_at, time.perf_counter() - loop_start)
+
+    async def _drive(self, order_id: str) -> None:
+        start = time.perf_counter()
+        try:
+            await self.target.start(order_id)
+        except WorkflowAlreadyStartedError:
+            self._record_outcome("already_started")
+            return
+        except Exception as e:
+            self._record_error("start", order_id, e)
+            return
+        started = time.perf_counter()
+        self.start_latencies.append(started - start)
+        if self.first_start is None or start < self.first_start:
+            self.first_start = start
+
+        try:
+            result = await asyncio.wait_for(
+                self._finish(order_id), self.order_timeout or None
+            )
+        except asyncio.TimeoutError:
+            self._record_error(
+                "timeout",
+                order_id,
+                TimeoutError(f"not finished after {self.order_timeout}s"),
+            )
+            return
+        except Exception as e:
+            self._record_error("wait", order_id, e)
+            return
+
+        finished = time.perf_counter()
+        self.last_completion = max(self.last_completion or finished, finished)
+        self._record_outcome(result.get("status", "unknown"))
+        if result.get("status") == "completed":
+            self.end_to_end.append(finished - start)
+        for step, seconds in (result.get("step_timings") or {}).items():
+            self.step_latencies.setdefault(step, []).append(seconds)
+
+    async def _finish(self, order_id: str) -> dict:
+        if self.approve_review:
+            await self.target.approve(order_id)
+        return await self.target.wait(order_id)
+
+    def _record_outcome(self, outcome: str) -> None:
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def _record_error(self, phase: str, order_id: str, error: Exception) -> None:
+        self._record_outcome(f"{phase}_error")
+        self.error_count += 1
+        if len(self.errors) < MAX_ERROR_SAMPLES:
+            self.errors.append(f"{phase} {order_id}: {type(error).__name__}: {error}")
+
+    def report(self, started_at: datetime, duration: float) -> dict:
+        completed = self.outcomes.get("completed", 0)
+        window = None
+        if self.first_start is not None and self.last_completion is not None:
+            window = self.last_completion - self.first_start
+        return {
+            "run_id": self.run_id,
+            "target": self.target.name,
+            "started_at": started_at.isoformat(),
+            "duration_seconds": round(duration, 3),
+            "config": {
+                "orders": self.orders,
+                "rate_per_second": self.rate,
+                "concurrency": self.concurrency,
+                "approve_review": self.approve_review,
+                "order_timeout_seconds": self.order_timeout,
+                "shipping_mode": self.target.shipping_mode,
+            },
+            "orders": {
+                "requested": self.orders,
+                "started": len(self.start_latencies),
+                "completed": completed,
+                "outcomes": dict(sorted(self.outcomes.items())),
+            },
+            "throughput": {
+                "started_per_second": (
+                    round(len(self.start_latencies) / duration, 3) if duration else None
+                ),
+                "completed_per_second": (
+                    round(completed / window, 3) if window else None
+                ),
+            },
+            "latency_seconds": {
+                "start": summarize(self.start_latencies),
+                "end_to_end": summarize(self.end_to_end),
+                "steps": {
+                    step: summarize(values)
+                    for step, values in sorted(self.step_latencies.items())
+                },
+            },
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def print_summary(report: dict) -> None:
+    e2e = report["latency_seconds"]["end_to_end"]
+    print(
+        f"📊 {report['orders']['completed']}/{report['orders']['requested']} "
+        f"orders completed, {report['throughput']['completed_per_second']} "
+        f"orders/s"
+    )
+    print(f"⏱️  End-to-end p50={e2e['p50']}s p95={e2e['p95']}s p99={e2e['p99']}s")
+    for step, stats in report["latency_seconds"]["steps"].items():
+        print(f"   {step:<20} p50={stats['p50']}s p95={stats['p95']}s")
+    if report["error_count"]:
+        print(f"❌ {report['error_count']} errors, e.g. {report['errors'][0]}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Order lifecycle load generator")
+    parser.add_argument("--orders", type=int, default=100, help="Orders to run")
+    parser.add_argument(
+        "--rate", type=float, default=0.0, help="Orders started per second (0: max)"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=100, help="Orders in flight at once"
+    )
+    parser.add_argument(
+        "--target",
+        choices=("client", "api"),
+        default="client",
+        help="Start orders via the Temporal client or the FastAPI service",
+    )
+    parser.add_argument(
+        "--api-url", default="http://localhost:8000", help="API base URL"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=0.2,
+        help="Progress poll interval for --target api",
+    )
+    parser.add_argument(
+        "--order-timeout",
+        type=float,
+        default=600.0,
+        help="Seconds an order may take before it counts as failed (0: no limit)",
+    )
+    parser.add_argument("--shipping-mode", choices=SHIPPING_MODES, default="activities")
+    parser.add_argument(
+        "--approve-review",
+        action="store_true",
+        help="Approve the manual review right away instead of waiting it out",
+    )
+    parser.add_argument(
+        "--output", default="loadgen-report.json", help="Where to write the report"
+    )
+    add_temporal_arguments(parser)
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> dict:
+    if args.target == "api":
+        target = ApiTarget(args.api_url, args.shipping_mode, args.poll_interval)
+    else:
+        target = ClientTarget(await get_client(), args.shipping_mode)
+
+    print(
+        f"🚀 Running {args.orders} orders via {args.target} "
+        f"(rate={args.rate or 'max'}/s, concurrency={args.concurrency})"
+    )
+    generator = LoadGenerator(
+        target,
+        orders=args.orders,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        approve_review=args.approve_review,
+        order_timeout=args.order_timeout,
+    )
+    report = await generator.run()
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_summary(report)
+    print(f"📝 Report written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_temporal(temporal_config_from_args(args))
+    asyncio.run(main(args))
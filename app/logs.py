@@ -0,0 +1,164 @@
+"""Structured logging written to stdout by a background thread"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from temporalio import activity, workflow
+
+from app.config import LOG_FORMATS, LogConfig
+from app.metrics import Counter
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total", "Log records dropped because the queue was full"
+)
+
+# Workflow id prefixes that carry the order id (see api.start_order)
+_ORDER_WORKFLOW_PREFIXES = ("workflow-", "shipping-")
+
+# Temporal's logger adapters put their context under these record attributes
+_TEMPORAL_CONTEXT = ("temporal_workflow", "temporal_activity")
+
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {
+    "message",
+    "asctime",
+    "taskName",
+    *_TEMPORAL_CONTEXT,
+}
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[QueueHandler] = None
+
+
+def order_id_from_workflow_id(workflow_id: str) -> Optional[str]:
+    """Order id of an OrderWorkflow or ShippingWorkflow id"""
+    for prefix in _ORDER_WORKFLOW_PREFIXES:
+        if workflow_id.startswith(prefix):
+            return workflow_id[len(prefix) :]
+    return None
+
+
+def record_fields(record: logging.LogRecord) -> dict:
+    """Correlation and `extra` fields of a record.
+
+    Flattens the workflow/activity context Temporal's loggers attach and
+    derives order_id from the workflow id when the call did not pass one.
+    """
+    fields = {}
+    for name in _TEMPORAL_CONTEXT:
+        fields.update(getattr(record, name, None) or {})
+    for name, value in vars(record).items():
+        if name not in _STANDARD_ATTRS and not name.startswith("_"):
+            fields[name] = value
+    if "order_id" not in fields and "workflow_id" in fields:
+        order_id = order_id_from_workflow_id(fields["workflow_id"])
+        if order_id is not None:
+            fields["order_id"] = order_id
+    return fields
+
+
+def _timestamp(record: logging.LogRecord) -> str:
+    created = datetime.fromtimestamp(record.created, timezone.utc)
+    return created.isoformat(timespec="milliseconds")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": _timestamp(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **record_fields(record),
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Readable line with the fields appended as key=value"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{k}={v}" for k, v in record_fields(record).items())
+        line = f"{_timestamp(record)} {record.levelname:<7} {record.getMessage()}"
+        if fields:
+            line = f"{line} [{fields}]"
+        if record.exc_text:
+            line = f"{line}\n{record.exc_text}"
+        return line
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when full.
+
+    The record is reduced to plain data here, on the logging thread; the
+    listener thread does the formatting and the write to stdout.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def setup_logging(config: Optional[LogConfig] = None) -> None:
+    """Route the root logger through a background queue to stdout.
+
+    Safe to call again to change the settings. Temporal's workflow and
+    activity loggers keep their context in fields instead of appending it
+    to the message; the workflow logger already skips replayed lines.
+    """
+    global _listener, _handler
+    config = config or LogConfig.from_env()
+    if config.format not in LOG_FORMATS:
+        raise ValueError(
+            f"LOG_FORMAT must be one of {', '.join(LOG_FORMATS)}, got {config.format!r}"
+        )
+
+    stop_logging()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if config.format == "json" else TextFormatter())
+    log_queue = queue.Queue(maxsize=config.queue_size)
+    _handler = NonBlockingQueueHandler(log_queue)
+    _listener = QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(config.level)
+
+    activity.logger.activity_info_on_message = False
+    workflow.logger.workflow_info_on_message = False
+
+
+def stop_logging() -> None:
+    """Flush queued records and detach the handler"""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,331 @@
+"""In-process metrics with a Prometheus text exposition endpoint"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from sub-millisecond DB calls to activity timeouts
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+class Registry:
+    """Metrics rendered together by one /metrics endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, "Metric"] = {}
+
+    def register(self, metric: "Metric") -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base for labelled metrics; registers itself unless registry is None"""
+
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Tuple[str, ...] = (),
+        registry: Optional[Registry] = REGISTRY,
+    ):
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _ValueMetric(Metric):
+    """One number per label set, stored or read at render time.
+
+    `collect` returns (labels dict, value) pairs for values owned elsewhere
+    (pool occupancy, cache counters); they are read on every render.
+    """
+
+    def __init__(
+        self,
+        *args,
+        collect: Optional[Callable[[], Iterable[Tuple[dict, float]]]] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.collect = collect
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self.collect is not None:
+            for labels, value in self.collect():
+                values[self._key(labels)] = value
+        return [
+            f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Counter(_ValueMetric):
+    """Monotonic count keyed by label values"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_ValueMetric):
+    """Current value keyed by label values"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Cumulative latency histogram keyed by label values"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: Optional[Registry] = REGISTRY,
+    ):
+        super().__init__(name, description, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], dict] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """Record one observation"""
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets)}
+                self._series[key] = series
+            series["count"] += 1
+            series["sum"] += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the wall-clock duration of the block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], dict]:
+        """Copy of every series: count, sum and cumulative bucket counts"""
+        with self._lock:
+            return {
+                key: {
+                    "count": series["count"],
+                    "sum": series["sum"],
+                    "buckets": list(series["buckets"]),
+                }
+                for key, series in self._series.items()
+            }
+
+    def summary(self) -> Dict[str, dict]:
+        """Count and mean per series, keyed by joined label values"""
+        summary = {}
+        for key, series in self.snapshot().items():
+            if series["count"]:
+                summary[",".join(key) or self.name] = {
+                    "count": series["count"],
+                    "avg_ms": round(series["sum"] * 1000 / series["count"], 3),
+                }
+        return summary
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, series in self.snapshot().items():
+            for bound, count in zip(self.buckets, series["buckets"]):
+                le = _labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+            le = _labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {series['count']}")
+            labels = _labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would drown the worker output
+        pass
+
+
+def start_metrics_server(
+    host: str, port: int, registry: Registry = REGISTRY
+) -> ThreadingHTTPServer:
+    """Serve GET /metrics from a daemon thread; port 0 picks a free port"""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(
+        target=server.serve_forever, name="metrics-server", daemon=True
+    )
+    thread.start()
+    return server
+
+
+# Database time spent in each order lifecycle transition (one transaction each)
+DB_STEP_LATENCY = Histogram(
+    "order_db_step_seconds",
+    "Database time per order lifecycle transition",
+    labelnames=("step",),
+)
+
+# Every SQL statement, by engine (sync/async) and statement verb
+DB_QUERY_LATENCY = Histogram(
+    "db_query_seconds",
+    "SQL statement execution time",
+    labelnames=("engine", "operation"),
+)
+
+# Time spent waiting for a pooled connection
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time waiting to check a connection out of the pool",
+    labelnames=("engine",),
+)
+
+# Activity executions as seen by the worker, one observation per attempt
+ACTIVITY_LATENCY = Histogram(
+    "activity_execution_seconds",
+    "Activity attempt duration by outcome (success, failure, cancelled)",
+    labelnames=("activity", "task_queue", "outcome"),
+)
+
+ACTIVITY_RETRIES = Counter(
+    "activity_retries_total",
+    "Activity attempts after the first one",
+    labelnames=("activity", "task_queue"),
+)
+
+HTTP_REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "API request duration by route template and status code",
+    labelnames=("method", "route", "status"),
+)
+
+# SQL statements and statement time per activity attempt (app.query_profile)
+ACTIVITY_DB_STATEMENTS = Histogram(
+    "activity_db_statements",
+    "SQL statements executed by one activity attempt",
+    labelnames=("activity", "task_queue"),
+    buckets=(0, 1, 2, 3, 4, 5, 10, 20, 50, 100),
+)
+
+ACTIVITY_DB_TIME = Histogram(
+    "activity_db_seconds",
+    "SQL statement time within one activity attempt",
+    labelnames=("activity", "task_queue"),
+)
+
+DB_SLOW_QUERIES = Counter(
+    "db_slow_queries_total",
+    "Statements slower than DB_SLOW_QUERY_MS",
+    labelnames=("engine", "operation"),
+)
+
+QUERY_BUDGET_EXCEEDED = Counter(
+    "db_query_budget_exceeded_total",
+    "Calls that ran more SQL statements than their declared budget",
+    labelnames=("function",),
+)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Apply the SQL migrations in migrations/ that have not run yet"""
+
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.config import (
+    PartitionConfig,
+    add_database_arguments,
+    database_config_from_args,
+)
+from app.database import configure_database, get_engine
+from app.models import Base
+from app.partitions import ensure_event_partitions, is_partitioned
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+
+# Arbitrary key for pg_advisory_lock so concurrent runs apply files once
+MIGRATION_LOCK_ID = 7_233_001
+
+SCHEMA_MIGRATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(255) PRIMARY KEY,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def discover_migrations(directory: Path = MIGRATIONS_DIR) -> List[Path]:
+    """Migration files in the order they must be applied"""
+    return sorted(directory.glob("*.sql"))
+
+
+def applied_versions(conn: Connection) -> set:
+    """Versions already recorded in schema_migrations"""
+    return set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+
+def pending_migrations(conn: Connection, directory: Path = MIGRATIONS_DIR) -> list:
+    """Migration files that have not been applied yet"""
+    applied = applied_versions(conn)
+    return [path for path in discover_migrations(directory) if path.stem not in applied]
+
+
+def apply_migration(conn: Connection, path: Path) -> None:
+    """Run one migration file as-is.
+
+    Without no_parameters, psycopg2 gets an empty parameter dict and reads
+    the %I / %L of plpgsql format() calls as placeholders.
+    """
+    conn.execution_options(no_parameters=True).exec_driver_sql(path.read_text())
+
+
+def migrate(
+    engine: Engine,
+    directory: Path = MIGRATIONS_DIR,
+    partitions_ahead: Optional[int] = None,
+) -> List[str]:
+    """Apply pending migrations, each in its own transaction.
+
+    Files must be safe to re-run (IF NOT EXISTS / OR REPLACE): the postgres
+    container also executes them on first start without recording them.
+    Afterwards the events partitions for the current month and
+    `partitions_ahead` more (default EVENTS_PARTITIONS_AHEAD) are created.
+    """
+    if engine.dialect.name == "sqlite":
+        return create_sqlite_schema(engine)
+
+    applied = []
+    with engine.connect() as conn:
+        conn.exec_driver_sql(f"SELECT pg_advisory_lock({MIGRATION_LOCK_ID})")
+        try:
+            conn.exec_driver_sql(SCHEMA_MIGRATIONS_DDL)
+            pending = pending_migrations(conn, directory)
+            conn.commit()
+
+            for path in pending:
+                print(f"⏫ Applying {path.name}")
+                with conn.begin():
+                    apply_migration(conn, path)
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version) VALUES (:v)"),
+                        {"v": path.stem},
+                    )
+                applied.append(path.stem)
+
+            with conn.begin():
+                if is_partitioned(conn):
+                    if partitions_ahead is None:
+                        partitions_ahead = PartitionConfig.from_env().months_ahead
+                    for name in ensure_event_partitions(conn, partitions_ahead):
+                        print(f"🗓️  Created partition {name}")
+        finally:
+            conn.exec_driver_sql(f"SELECT pg_advisory_unlock({MIGRATION_LOCK_ID})")
+            conn.commit()
+    return applied
+
+
+def missing_sqlite_tables(engine: Engine) -> List[str]:
+    """Model tables that do not exist in the SQLite database yet"""
+    existing = set(inspect(engine).get_table_names())
+    return [t.name for t in Base.metadata.sorted_tables if t.name not in existing]
+
+
+def create_sqlite_schema(engine: Engine) -> List[str]:
+    """Create the tables from the models for a local SQLite stand-in.
+
+    The SQL files are PostgreSQL-specific (triggers, plpgsql), so SQLite
+    only gets the tables and indexes the ORM knows about.
+    """
+    missing = missing_sqlite_tables(engine)
+    Base.metadata.create_all(engine)
+    for name in missing:
+        print(f"⏫ Created table {name}")
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument(
+        "--status", action="store_true", help="List pending migrations and exit"
+    )
+    add_database_arguments(parser)
+    args = parser.parse_args()
+
+    configure_database(database_config_from_args(args))
+    engine = get_engine()
+
+    if args.status:
+        if engine.dialect.name == "sqlite":
+            pending = missing_sqlite_tables(engine)
+        else:
+            with engine.connect() as conn:
+                conn.exec_driver_sql(SCHEMA_MIGRATIONS_DDL)
+                pending = [path.name for path in pending_migrations(conn)]
+                conn.commit()
+        for name in pending:
+            print(f"⏳ Pending: {name}")
+        if not pending:
+            print("✅ Database schema is up to date")
+        return
+
+    applied = migrate(engine)
+    if applied:
+        print(f"✅ Applied {len(applied)} migration(s)")
+    else:
+        print("✅ Database schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, String, DateTime, Numeric, Integer, func
+from sqlalchemy import JSON, Column, String, DateTime, Numeric, Integer, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.dialects.postgresql import JSONB
 
 
 Base = declarative_base()
 
+# JSONB on PostgreSQL, plain JSON elsewhere (SQLite stand-in for local runs)
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 
 class Order(Base):
     __tablename__ = "orders"
@@ -14,8 +17,8 @@ class Order(Base):
     customer_name = Column(String(255))
     customer_email = Column(String(255))
     total_amount = Column(Numeric(10, 2))
-    items = Column(JSONB)
-    shipping_address = Column(JSONB)
+    items = Column(JSONType)
+    shipping_address = Column(JSONType)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
@@ -39,6 +42,11 @@ class Event(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     order_id = Column(String(255), nullable=False)
     event_type = Column(String(100), nullable=False)
-    event_data = Column(JSONB)
+    event_data = Column(JSONType)
     workflow_id = Column(String(255))
     timestamp = Column(DateTime, default=func.now())
+
+    # Order timelines page through this index (migrations/003)
+    __table_args__ = (
+        Index("idx_events_order_timeline", "order_id", "timestamp", "id"),
+    )
@@ -1,19 +1,25 @@
+import asyncio
 from temporalio import workflow
 from temporalio.common import RetryPolicy
 from datetime import timedelta
 from app.shipping_workflow import ShippingWorkflow
 
 
-from app.activities import (
-    receive_order_activity,
-    validate_order_activity,
-    charge_payment_activity,
+# Activities are referenced by name so the sandbox never imports app.activities
+from app.activity_names import (
+    CHARGE_PAYMENT,
+    RECEIVE_ORDER,
+    VALIDATE_ORDER,
 )
 
 
 MANUAL_REVIEW_TIMEOUT = 3
 PAYMENT_PROCESSING_DELAY = 2
 SHIPPING_DELAY = 2
+# Activities heartbeat throughout (app.activities.heartbeating), so a
+# timed-out attempt learns it was cancelled within this window instead of
+# running on in the background; slow steps still get start_to_close_timeout
+ACTIVITY_HEARTBEAT_TIMEOUT = timedelta(seconds=10)
 
 
 @workflow.defn
@@ -23,150 +29,237 @@ class OrderWorkflow:
         self.cancelled = False
         self.new_shipping_address = None
         self.payment_cancelled = False
+        self.review_decision = None  # "approved" or "rejected"
+        self.review_reason = None
+        # Lifecycle position, exposed through the get_progress query
+        self.order_id = None
+        self.step = "starting"
+        self.step_started_at = None
+        # Seconds spent in each finished step, from workflow time
+        self.step_timings = {}
+        self.shipping_workflow_id = None
 
     @workflow.run
-    async def run(self, order_id: str, payment_id: str) -> dict:
+    async def run(
+        self, order_id: str, payment_id: str, shipping_mode: str = "activities"
+    ) -> dict:
         """Main order workflow with signal handling"""
-        print(f"�� Starting OrderWorkflow for {order_id}")
+        workflow.logger.info("Starting OrderWorkflow", extra={"order_id": order_id})
+        self.order_id = order_id
 
         try:
             # Step 1: Receive Order
-            print(f"Step 1: Receiving order {order_id}")
+            workflow.logger.info("Step 1: Receiving order")
+            self._set_step("receiving")
             order_data = await workflow.execute_activity(
-                receive_order_activity,
+                RECEIVE_ORDER,
                 order_id,
+                result_type=dict,
                 start_to_close_timeout=timedelta(seconds=30),
+                heartbeat_timeout=ACTIVITY_HEARTBEAT_TIMEOUT,
                 retry_policy=RetryPolicy(maximum_attempts=3),
             )
 
             # Check for cancellation after each step
             if self.cancelled:
-                print(f"❌ Order {order_id} cancelled during receive step")
-                return {"status": "cancelled", "reason": "Order cancelled by customer"}
+                workflow.logger.info("Order cancelled during receive step")
+                return self._cancelled("Order cancelled by customer")
 
             # Step 2: Validate Order
-            print(f"Step 2: Validating order {order_id}")
+            workflow.logger.info("Step 2: Validating order")
+            self._set_step("validating")
             is_valid = await workflow.execute_activity(
-                validate_order_activity,
+                VALIDATE_ORDER,
                 order_data,
+                result_type=bool,
                 start_to_close_timeout=timedelta(seconds=30),
+                heartbeat_timeout=ACTIVITY_HEARTBEAT_TIMEOUT,
                 retry_policy=RetryPolicy(maximum_attempts=2),
             )
             if self.cancelled:
-                print(f"❌ Order {order_id} cancelled during validation")
-                return {"status": "cancelled", "reason": "Order cancelled by customer"}
+                workflow.logger.info("Order cancelled during validation")
+                return self._cancelled("Order cancelled by customer")
 
             if not is_valid:
+                self._set_step("failed")
                 return {"status": "failed", "reason": "validation_failed"}
 
-            # Step 3: Manual review with signal checking
-            print(f"Step 3: Waiting for manual review approval for {order_id}")
-            print(f"⏰ Added {MANUAL_REVIEW_TIMEOUT} seconds to send signals!")
+            # Step 3: Manual review, decided by review_order_signal
+            workflow.logger.info(
+                "Step 3: Waiting up to %ss for manual review", MANUAL_REVIEW_TIMEOUT
+            )
+            self._set_step("manual_review")
 
-            review_completed = False
-            start_time = workflow.now()
+            if workflow.patched("event-driven-review"):
+                # Wakes on a review or cancel signal, or once at the timeout
+                try:
+                    await workflow.wait_condition(
+                        lambda: self.review_decision is not None or self.cancelled,
+                        timeout=timedelta(seconds=MANUAL_REVIEW_TIMEOUT),
+                    )
+                except asyncio.TimeoutError:
+                    self.review_decision = "approved"
+                    self.review_reason = "Review window elapsed"
+            else:
+                # Workflows started before the patch replay the polling loop
+                review_completed = False
+                start_time = workflow.now()
 
-            while not review_completed and not self.cancelled:
-                # Check for signals every second
-                await workflow.sleep(timedelta(seconds=1))
+                while not review_completed and not self.cancelled:
+                    # Check for signals every second
+                    await workflow.sleep(timedelta(seconds=1))
 
-                # Check if review timeout reached
-                if workflow.now() - start_time > timedelta(
-                    seconds=MANUAL_REVIEW_TIMEOUT
-                ):
-                    review_completed = True
-                    print(f"Manual review completed for {order_id}")
+                    # Check if review timeout reached
+                    if workflow.now() - start_time > timedelta(
+                        seconds=MANUAL_REVIEW_TIMEOUT
+                    ):
+                        review_completed = True
 
             if self.cancelled:
-                print(f"❌ Order {order_id} cancelled during review")
-                return {"status": "cancelled", "reason": "Order cancelled by customer"}
+                workflow.logger.info("Order cancelled during review")
+                return self._cancelled("Order cancelled by customer")
+
+            if self.review_decision == "rejected":
+                workflow.logger.info("Order rejected in manual review")
+                self._set_step("rejected")
+                return {
+                    "status": "rejected",
+                    "reason": self.review_reason or "Rejected in manual review",
+                }
+            workflow.logger.info("Manual review completed")
 
             # Step 4: Charge Payment
             if not self.payment_cancelled:
-                print(f"Step 4: Charging payment {payment_id} for {order_id}")
-                print(
-                    f"⏰ Payment processing will take {PAYMENT_PROCESSING_DELAY} seconds..."
+                workflow.logger.info(
+                    "Step 4: Charging payment after %ss",
+                    PAYMENT_PROCESSING_DELAY,
+                    extra={"payment_id": payment_id},
                 )
+                self._set_step("charging_payment")
 
                 # Add delay before payment processing
                 await workflow.sleep(timedelta(seconds=PAYMENT_PROCESSING_DELAY))
 
                 # Check for cancellation during delay
                 if self.cancelled:
-                    print(f"❌ Order {order_id} cancelled during payment delay")
-                    return {
-                        "status": "cancelled",
-                        "reason": "Order cancelled by customer",
-                    }
+                    workflow.logger.info("Order cancelled during payment delay")
+                    return self._cancelled("Order cancelled by customer")
 
                 await workflow.execute_activity(
-                    charge_payment_activity,
+                    CHARGE_PAYMENT,
                     args=[payment_id, order_id],
+                    result_type=dict,
                     start_to_close_timeout=timedelta(seconds=30),
+                    heartbeat_timeout=ACTIVITY_HEARTBEAT_TIMEOUT,
                     retry_policy=RetryPolicy(maximum_attempts=3),
                 )
             else:
-                print(f"❌ Payment cancelled for {order_id}")
-                return {
-                    "status": "cancelled",
-                    "reason": "Payment cancelled by customer",
-                }
+                workflow.logger.info("Payment cancelled")
+                return self._cancelled("Payment cancelled by customer")
 
             if self.cancelled:
-                print(f"❌ Order {order_id} cancelled after payment")
-                return {"status": "cancelled", "reason": "Order cancelled by customer"}
+                workflow.logger.info("Order cancelled after payment")
+                return self._cancelled("Order cancelled by customer")
 
             # Step 5: Start Shipping Workflow
-            print(f"Step 5: Starting shipping workflow for {order_id}")
-            print(f"⏰ Shipping setup will take {SHIPPING_DELAY} seconds...")
+            workflow.logger.info(
+                "Step 5: Starting shipping workflow after %ss", SHIPPING_DELAY
+            )
+            self._set_step("starting_shipping")
 
             # Add delay before shipping
             await workflow.sleep(timedelta(seconds=SHIPPING_DELAY))
             # Check for cancellation during delay
             if self.cancelled:
-                print(f"❌ Order {order_id} cancelled during shipping delay")
-                return {"status": "cancelled", "reason": "Order cancelled by customer"}
+                workflow.logger.info("Order cancelled during shipping delay")
+                return self._cancelled("Order cancelled by customer")
 
-            # Start child shipping workflow
+            # Start child shipping workflow (the mode is only passed when
+            # it is not the default, so older histories replay unchanged)
+            shipping_args = [order_id, order_data.get("items", [])]
+            if shipping_mode != "activities":
+                shipping_args.append(shipping_mode)
             await workflow.start_child_workflow(
                 ShippingWorkflow.run,
-                args=[order_id, order_data.get("items", [])],
+                args=shipping_args,
                 id=f"shipping-{order_id}",
                 task_queue="shipping-task-queue",  # Different task queue for shipping
             )
-            print(f"🚚 Shipping workflow completed for {order_id}")
+            self.shipping_workflow_id = f"shipping-{order_id}"
+            workflow.logger.info("Shipping workflow started")
 
             # Final status check
             if self.cancelled:
-                print(f"❌ Order {order_id} cancelled during shipping")
-                return {"status": "cancelled", "reason": "Order cancelled by customer"}
+                workflow.logger.info("Order cancelled during shipping")
+                return self._cancelled("Order cancelled by customer")
 
-            print(f"🎉 OrderWorkflow completed successfully for {order_id}")
+            workflow.logger.info("OrderWorkflow completed")
+            self._set_step("completed")
             # Return only serializable data
             return {
                 "status": "completed",
                 "order_id": order_id,
+                "step_timings": self.step_timings,
             }
 
         except Exception as e:
-            print(f"💥 OrderWorkflow failed for {order_id}: {str(e)}")
+            workflow.logger.exception("OrderWorkflow failed")
+            self._set_step("failed")
             return {"status": "failed", "reason": "workflow_error", "error": str(e)}
 
+    def _set_step(self, step: str) -> None:
+        """Move to `step`, recording how long the previous step took"""
+        now = workflow.now()
+        if self.step_started_at is not None:
+            elapsed = (now - self.step_started_at).total_seconds()
+            self.step_timings[self.step] = round(elapsed, 3)
+        self.step = step
+        self.step_started_at = now
+
+    def _cancelled(self, reason: str) -> dict:
+        """Record the cancellation for get_progress and build the result"""
+        self._set_step("cancelled")
+        return {"status": "cancelled", "reason": reason}
+
     # Signal definitions
     @workflow.signal
     def cancel_order_signal(self):
         """Signal to cancel the entire order"""
         self.cancelled = True
-        print("🛑 Cancel signal received for order workflow")
+        workflow.logger.info("Cancel signal received")
 
     @workflow.signal
     def update_address_signal(self, new_address: dict):
         """Signal to update shipping address"""
         self.new_shipping_address = new_address
-        print("🏠 Address update signal received: {new_address}")
+        workflow.logger.info("Address update signal received")
+
+    @workflow.signal
+    def review_order_signal(self, review: dict):
+        """Signal to approve or reject the order in manual review"""
+        if self.review_decision is not None:
+            return
+        self.review_decision = "approved" if review.get("approved") else "rejected"
+        self.review_reason = review.get("reason")
+        workflow.logger.info("Review signal received: %s", self.review_decision)
 
     @workflow.signal
     def cancel_payment_signal(self):
         """Signal to cancel payment processing"""
         self.payment_cancelled = True
-        print("💳 Payment cancellation signal received")
+        workflow.logger.info("Payment cancellation signal received")
+
+    # Query definitions
+    @workflow.query
+    def get_progress(self) -> dict:
+        """Current lifecycle step and pending signal state"""
+        return {
+            "order_id": self.order_id,
+            "step": self.step,
+            "cancelled": self.cancelled,
+            "payment_cancelled": self.payment_cancelled,
+            "review_decision": self.review_decision,
+            "pending_shipping_address": self.new_shipping_address,
+            "shipping_workflow_id": self.shipping_workflow_id,
+            "step_timings": self.step_timings,
+        }
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""Create upcoming events partitions and archive expired ones.
+
+Run daily (cron, a Kubernetes CronJob, ...). python -m app.migrate also
+creates upcoming partitions after applying migrations. Partitions come from
+migrations/002_partition_events.sql; SQLite keeps a plain events table and
+is left alone.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+from datetime import date
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.config import (
+    PartitionConfig,
+    add_database_arguments,
+    add_partition_arguments,
+    database_config_from_args,
+    partition_config_from_args,
+)
+from app.database import configure_database, get_engine
+
+ARCHIVE_SCHEMA = "events_archive"
+
+# Monthly partitions are named events_pYYYY_MM (see create_events_partition)
+_PARTITION_NAME = re.compile(r"^events_p(\d{4})_(\d{2})$")
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month `months` after (or before) `month`"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """Name of the partition holding `month`"""
+    return f"events_p{month.year:04d}_{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """First day of the month a partition holds, None for other tables"""
+    match = _PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def expired_partitions(
+    names: List[str], retention_months: int, today: Optional[date] = None
+) -> List[str]:
+    """Partitions whose whole month is older than the retention window.
+
+    With a retention of 12 months, on any day of June 2025 everything up to
+    and including May 2024 has expired. The default partition never does.
+    """
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(today or date.today(), -retention_months)
+    return sorted(
+        name
+        for name in names
+        if (month := partition_month(name)) is not None and month < cutoff
+    )
+
+
+def is_partitioned(conn: Connection) -> bool:
+    """Whether events is a partitioned table (migration 002 has run)"""
+    if conn.dialect.name != "postgresql":
+        return False
+    kind = conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass('events')")
+    ).scalar()
+    return kind == "p"
+
+
+def event_partitions(conn: Connection) -> List[str]:
+    """Partitions currently attached to events, including events_default"""
+    return list(
+        conn.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'events'::regclass ORDER BY c.relname"
+            )
+        ).scalars()
+    )
+
+
+def ensure_event_partitions(
+    conn: Connection, months_ahead: int, today: Optional[date] = None
+) -> List[str]:
+    """Create the current month's partition and `months_ahead` more"""
+    first = (today or date.today()).replace(day=1)
+    return list(
+        conn.execute(
+            text("SELECT create_events_partitions(:first, :months)"),
+            {"first": first, "months": months_ahead + 1},
+        ).scalars()
+    )
+
+
+def _quote(conn: Connection, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def export_rows(conn: Connection, table: str, directory: Path) -> Path:
+    """Write every row of `table` to directory/<table>.jsonl.gz.
+
+    Rows are streamed, and the file only appears under its final name once
+    complete, so a failed export never looks like an archive.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{table}.jsonl.gz"
+    partial = path.with_name(path.name + ".partial")
+    result = conn.execution_options(stream_results=True).execute(
+        text(f"SELECT * FROM {_quote(conn, table)} ORDER BY id")
+    )
+    with gzip.open(partial, "wt", encoding="utf-8") as out:
+        for row in result.mappings():
+            out.write(json.dumps(dict(row), default=str) + "\n")
+    os.replace(partial, path)
+    return path
+
+
+def detached_partitions(conn: Connection) -> List[str]:
+    """Monthly tables left detached by an archive run that did not finish"""
+    names = conn.execute(
+        text(
+            "SELECT relname FROM pg_class "
+            "WHERE relnamespace = current_schema()::regnamespace "
+            "AND relkind = 'r' AND NOT relispartition"
+        )
+    ).scalars()
+    return sorted(name for name in names if partition_month(name) is not None)
+
+
+def detach_partition(conn: Connection, name: str) -> None:
+    """Detach a partition from events in a transaction of its own.
+
+    DETACH holds an ACCESS EXCLUSIVE lock on events until commit, blocking
+    every read and write of the live table, so nothing else runs under it.
+    (CONCURRENTLY is not allowed alongside a default partition.)
+    """
+    with conn.begin():
+        conn.exec_driver_sql(
+            f"ALTER TABLE events DETACH PARTITION {_quote(conn, name)}"
+        )
+
+
+def archive_detached(conn: Connection, name: str, config: PartitionConfig) -> str:
+    """Archive a detached partition; returns where it went.
+
+    Only the detached table is locked meanwhile. If the export fails the
+    table stays detached and the next run archives it.
+    """
+    quoted = _quote(conn, name)
+    with conn.begin():
+        if config.archive == "file":
+            path = export_rows(conn, name, Path(config.archive_dir))
+            conn.exec_driver_sql(f"DROP TABLE {quoted}")
+            return str(path)
+
+        # Archived rows must not stop orders from being deleted later
+        foreign_keys = conn.execute(
+            text(
+                "SELECT conname FROM pg_constraint "
+                "WHERE conrelid = to_regclass(:name) AND contype = 'f'"
+            ),
+            {"name": name},
+        ).scalars()
+        for constraint in list(foreign_keys):
+            conn.exec_driver_sql(
+                f"ALTER TABLE {quoted} DROP CONSTRAINT {_quote(conn, constraint)}"
+            )
+        conn.exec_driver_sql(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+        conn.exec_driver_sql(f"ALTER TABLE {quoted} SET SCHEMA {ARCHIVE_SCHEMA}")
+        return f"{ARCHIVE_SCHEMA}.{name}"
+
+
+def archive_partition(conn: Connection, name: str, config: PartitionConfig) -> str:
+    """Detach one partition, then archive it; returns where it went"""
+    detach_partition(conn, name)
+    return archive_detached(conn, name, config)
+
+
+def maintain_partitions(
+    engine: Engine,
+    config: PartitionConfig,
+    today: Optional[date] = None,
+    dry_run: bool = False,
+) -> dict:
+    """Create upcoming partitions, then archive expired ones.
+
+    Each partition is detached and archived in transactions of its own so
+    one failure does not undo the others; tables a failed run left detached
+    are archived first. Returns the created partitions and where each archived
+    one went (None in a dry run).
+    """
+    report = {"partitioned": False, "created": [], "archived": {}}
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return report
+        report["partitioned"] = True
+
+        if not dry_run:
+            report["created"] = ensure_event_partitions(
+                conn, config.months_ahead, today
+            )
+            conn.commit()
+
+        leftovers = detached_partitions(conn)
+        expired = expired_partitions(
+            event_partitions(conn), config.retention_months, today
+        )
+        conn.rollback()
+        for name in leftovers + expired:
+            if dry_run:
+                report["archived"][name] = None
+            elif name in leftovers:
+                report["archived"][name] = archive_detached(conn, name, config)
+            else:
+                report["archived"][name] = archive_partition(conn, name, config)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain events partitions")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="List expired partitions only"
+    )
+    add_database_arguments(parser)
+    add_partition_arguments(parser)
+    args = parser.parse_args()
+
+    configure_database(database_config_from_args(args))
+    config = partition_config_from_args(args)
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        print("ℹ️  Events are only partitioned on PostgreSQL; nothing to do")
+        return
+
+    report = maintain_partitions(engine, config, dry_run=args.dry_run)
+    if not report["partitioned"]:
+        print("⚠️  events is not partitioned yet; run python -m app.migrate")
+        return
+    for name in report["created"]:
+        print(f"🗓️  Created partition {name}")
+    for name, destination in report["archived"].items():
+        if destination is None:
+            print(f"⏳ Would archive {name}")
+        else:
+            print(f"📦 Archived {name} -> {destination}")
+    if not report["created"] and not report["archived"]:
+        print("✅ Events partitions are up to date")
+
+
+if __name__ == "__main__":
+    main()
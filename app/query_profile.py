@@ -0,0 +1,138 @@
+"""Per-call SQL statement counts, slow-query logging and query budgets"""
+
+import functools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from app.config import QUERY_BUDGET_MODES, DatabaseConfig
+from app.metrics import QUERY_BUDGET_EXCEEDED
+
+logger = logging.getLogger(__name__)
+
+# Longest statement text kept in profiles and log lines
+MAX_STATEMENT_CHARS = 500
+
+budget_mode = DatabaseConfig.from_env().query_budget_mode
+
+# Profiles open in the current task, outermost first
+_active: ContextVar[Tuple["QueryProfile", ...]] = ContextVar(
+    "query_profiles", default=()
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A call ran more SQL statements than its budget (raise mode)"""
+
+
+@dataclass
+class QueryProfile:
+    """Statements executed while a profile_queries() block was open"""
+
+    name: str
+    budget: Optional[int] = None
+    statements: int = 0
+    seconds: float = 0.0
+    queries: List[Tuple[str, float]] = field(default_factory=list)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.statements += 1
+        self.seconds += seconds
+        self.queries.append((shorten(statement), seconds))
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.statements > self.budget
+
+    def describe(self) -> str:
+        """Multi-line listing of the statements, for failure messages"""
+        lines = [
+            f"{self.name} ran {self.statements} SQL statements "
+            f"(budget {self.budget}) in {self.seconds * 1000:.1f}ms:"
+        ]
+        lines.extend(
+            f"  {i}. [{seconds * 1000:.1f}ms] {statement}"
+            for i, (statement, seconds) in enumerate(self.queries, 1)
+        )
+        return "\n".join(lines)
+
+
+def shorten(statement: str) -> str:
+    """Statement on one line, cut to MAX_STATEMENT_CHARS"""
+    statement = " ".join(statement.split())
+    if len(statement) > MAX_STATEMENT_CHARS:
+        return statement[: MAX_STATEMENT_CHARS - 3] + "..."
+    return statement
+
+
+def configure_query_budgets(mode: str) -> None:
+    """Set what happens when a budget is exceeded: off, warn or raise"""
+    global budget_mode
+    if mode not in QUERY_BUDGET_MODES:
+        raise ValueError(
+            f"DB_QUERY_BUDGET_MODE must be one of {', '.join(QUERY_BUDGET_MODES)}, "
+            f"got {mode!r}"
+        )
+    budget_mode = mode
+
+
+def current_profile() -> Optional[QueryProfile]:
+    """Innermost open profile of the current task, if any"""
+    active = _active.get()
+    return active[-1] if active else None
+
+
+def record(statement: str, seconds: float) -> None:
+    """Add a statement to every profile open in the current task"""
+    for profile in _active.get():
+        profile.record(statement, seconds)
+
+
+def _check_budget(profile: QueryProfile) -> None:
+    if not profile.over_budget or budget_mode == "off":
+        return
+    QUERY_BUDGET_EXCEEDED.inc(function=profile.name)
+    if budget_mode == "raise":
+        raise QueryBudgetExceeded(profile.describe())
+    logger.warning(
+        "%s exceeded its query budget",
+        profile.name,
+        extra={
+            "function": profile.name,
+            "statements": profile.statements,
+            "budget": profile.budget,
+        },
+    )
+
+
+@contextmanager
+def profile_queries(name: str, budget: Optional[int] = None) -> Iterator[QueryProfile]:
+    """Count the statements run by the current task inside the block.
+
+    Profiles nest: a statement counts towards every open profile. The
+    budget is checked when the block exits without an exception.
+    """
+    profile = QueryProfile(name, budget)
+    token = _active.set(_active.get() + (profile,))
+    try:
+        yield profile
+    finally:
+        _active.reset(token)
+    _check_budget(profile)
+
+
+def query_budget(max_statements: int) -> Callable:
+    """Declare how many statements each call of an async function may run"""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with profile_queries(func.__name__, budget=max_statements):
+                return await func(*args, **kwargs)
+
+        wrapper.query_budget = max_statements
+        return wrapper
+
+    return decorator
@@ -1,13 +1,26 @@
 #!/usr/bin/env python3
 """Script to send signals to running workflows"""
 
+import argparse
 import asyncio
-from temporalio.client import Client
+import json
+import sys
+from app.concurrency import signal_orders
+from app.config import add_temporal_arguments, temporal_config_from_args
+from app.temporal_client import configure_temporal, get_client
+
+# Batch signal names accepted by --batch, and the workflow signal they send
+BATCH_SIGNALS = {
+    "cancel": "cancel_order_signal",
+    "update-address": "update_address_signal",
+    "approve": "review_order_signal",
+    "reject": "review_order_signal",
+}
 
 
 async def send_cancel_signal(workflow_id: str):
     """Send cancel signal to a running workflow"""
-    client = await Client.connect("localhost:7233")
+    client = await get_client()
 
     try:
         # Get workflow handle first, then send signal
@@ -22,7 +35,7 @@ async def send_cancel_signal(workflow_id: str):
 
 async def send_address_update_signal(workflow_id: str, new_address: dict):
     """Send address update signal to a running workflow"""
-    client = await Client.connect("localhost:7233")
+    client = await get_client()
 
     try:
         # Get workflow handle first, then send signal
@@ -36,6 +49,92 @@ async def send_address_update_signal(workflow_id: str, new_address: dict):
         print(f"❌ Failed to send address update signal: {str(e)}")
 
 
+async def send_review_signal(workflow_id: str, approved: bool, reason: str = None):
+    """Send the manual review decision to a running workflow"""
+    client = await get_client()
+
+    try:
+        # Get workflow handle first, then send signal
+        workflow_handle = client.get_workflow_handle(workflow_id)
+        await workflow_handle.signal(
+            "review_order_signal",  # Signal name as string
+            {"approved": approved, "reason": reason},  # Signal arguments
+        )
+        decision = "Approval" if approved else "Rejection"
+        print(f"✅ {decision} signal sent to workflow {workflow_id}")
+    except Exception as e:
+        print(f"❌ Failed to send review signal: {str(e)}")
+
+
+def read_order_ids(path: str) -> list:
+    """Order ids, one per line, from a file or stdin ("-")"""
+    stream = sys.stdin if path == "-" else open(path)
+    try:
+        return [line.strip() for line in stream if line.strip()]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def batch_signal_arg(args: argparse.Namespace):
+    """Signal argument for a --batch run"""
+    if args.batch == "update-address":
+        return json.loads(args.address)
+    if args.batch in ("approve", "reject"):
+        return {"approved": args.batch == "approve", "reason": args.reason}
+    return None
+
+
+async def send_batch(args: argparse.Namespace):
+    """Send one signal to every order id over a single connection"""
+    order_ids = read_order_ids(args.ids_file)
+    if not order_ids:
+        print("❌ No order IDs provided")
+        return
+
+    client = await get_client()
+    print(f"📨 Sending {args.batch} to {len(order_ids)} orders")
+    results = await signal_orders(
+        client,
+        order_ids,
+        BATCH_SIGNALS[args.batch],
+        batch_signal_arg(args),
+        limit=args.concurrency,
+    )
+
+    for result in results:
+        if result["status"] != "sent":
+            print(f"❌ {result['order_id']}: {result['status']} - {result['message']}")
+    sent = sum(1 for result in results if result["status"] == "sent")
+    print(f"✅ Signal sent to {sent}/{len(results)} orders")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Send signals to running workflows (interactive by default)"
+    )
+    parser.add_argument(
+        "--batch", choices=sorted(BATCH_SIGNALS), help="Signal every listed order"
+    )
+    parser.add_argument(
+        "--ids-file",
+        default="-",
+        help="File with one order ID per line, or - for stdin (default)",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=50, help="Signals in flight at once"
+    )
+    parser.add_argument(
+        "--address", help="New address as JSON, for --batch update-address"
+    )
+    parser.add_argument("--reason", help="Review reason, for --batch approve/reject")
+    add_temporal_arguments(parser)
+    args = parser.parse_args()
+    if args.batch == "update-address" and not args.address:
+        parser.error("--batch update-address requires --address")
+    return args
+
+
 async def main():
     """Main function to demonstrate signals"""
     workflow_id = input("Enter workflow ID to signal: ").strip()
@@ -48,8 +147,10 @@ async def main():
     print("1. Cancel order")
     print("2. Update address")
     print("3. Cancel payment")
+    print("4. Approve review")
+    print("5. Reject review")
 
-    choice = input("Choose signal (1-3): ").strip()
+    choice = input("Choose signal (1-5): ").strip()
 
     if choice == "1":
         await send_cancel_signal(workflow_id)
@@ -58,9 +159,19 @@ async def main():
         await send_address_update_signal(workflow_id, new_address)
     elif choice == "3":
         print("Payment cancellation not implemented yet")
+    elif choice == "4":
+        await send_review_signal(workflow_id, approved=True)
+    elif choice == "5":
+        reason = input("Rejection reason: ").strip() or None
+        await send_review_signal(workflow_id, approved=False, reason=reason)
     else:
         print("❌ Invalid choice")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    configure_temporal(temporal_config_from_args(args))
+    if args.batch:
+        asyncio.run(send_batch(args))
+    else:
+        asyncio.run(main())
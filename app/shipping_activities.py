@@ -6,11 +6,11 @@ from datetime import datetime
 @activity.defn
 async def pick_items_activity(order_id: str, items: list) -> dict:
     """Pick items from warehouse"""
-    print(f"📦 Picking items for order {order_id}: {items}")
+    activity.logger.info("Picking %d items", len(items))
 
-    print("⏳ Simulating warehouse picking...")
+    activity.logger.debug("Simulating warehouse picking")
 
-    print(f"✅ Items picked for order {order_id}")
+    activity.logger.info("Items picked")
     return {
         "order_id": order_id,
         "picked_items": items,
@@ -22,8 +22,8 @@ async def pick_items_activity(order_id: str, items: list) -> dict:
 @activity.defn
 async def package_items_activity(order_id: str, pick_result: dict) -> dict:
     """Package picked items"""
-    print(f"📦 Packaging items for order {order_id}")
-    print(f"✅ Items packaged for order {order_id}")
+    activity.logger.info("Packaging items")
+    activity.logger.info("Items packaged")
     return {
         "order_id": order_id,
         "package_weight": 2.5,
@@ -36,10 +36,10 @@ async def package_items_activity(order_id: str, pick_result: dict) -> dict:
 @activity.defn
 async def select_carrier_activity(order_id: str, package_result: dict) -> dict:
     """Select shipping carrier based on package details"""
-    print(f"🚛 Selecting carrier for order {order_id}")
+    activity.logger.info("Selecting carrier")
 
     # Simulate carrier selection logic
-    print("⏳ Simulating carrier selection...")
+    activity.logger.debug("Simulating carrier selection")
 
     # Simple carrier selection based on weight
     if package_result["package_weight"] < 5:
@@ -49,7 +49,9 @@ async def select_carrier_activity(order_id: str, package_result: dict) -> dict:
         carrier = "FedEx"
         service = "Ground"
 
-    print(f"✅ Carrier selected for order {order_id}: {carrier} - {service}")
+    activity.logger.info(
+        "Carrier selected", extra={"carrier": carrier, "service": service}
+    )
     return {
         "order_id": order_id,
         "carrier": carrier,
@@ -62,15 +64,17 @@ async def select_carrier_activity(order_id: str, package_result: dict) -> dict:
 @activity.defn
 async def generate_tracking_activity(order_id: str, carrier_result: dict) -> dict:
     """Generate tracking number for shipment"""
-    print(f"🔍 Generating tracking for order {order_id}")
+    activity.logger.info("Generating tracking")
 
     # Simulate tracking generation
-    print("⏳ Simulating tracking generation...")
+    activity.logger.debug("Simulating tracking generation")
 
     # Generate unique tracking number
     tracking_number = f"{carrier_result['carrier']}-{uuid.uuid4().hex[:8].upper()}"
 
-    print(f"✅ Tracking generated for order {order_id}: {tracking_number}")
+    activity.logger.info(
+        "Tracking generated", extra={"tracking_number": tracking_number}
+    )
     return {
         "order_id": order_id,
         "tracking_number": tracking_number,
@@ -83,11 +87,11 @@ async def generate_tracking_activity(order_id: str, carrier_result: dict) -> dic
 @activity.defn
 async def confirm_delivery_activity(order_id: str, tracking_result: dict) -> dict:
     """Confirm delivery of shipment"""
-    print(f"✅ Confirming delivery for order {order_id}")
+    activity.logger.info("Confirming delivery")
 
     delivery_date = datetime.utcnow()
 
-    print(f"✅ Delivery confirmed for order {order_id}")
+    activity.logger.info("Delivery confirmed")
     return {
         "order_id": order_id,
         "delivery_date": delivery_date.isoformat(),
@@ -95,3 +99,20 @@ async def confirm_delivery_activity(order_id: str, tracking_result: dict) -> dic
         "signature_required": False,
         "delivery_notes": "Left at front door",
     }
+
+
+@activity.defn
+async def ship_order_activity(order_id: str, items: list) -> dict:
+    """Run every shipping step in one activity (combined shipping mode)"""
+    pick_result = await pick_items_activity(order_id, items)
+    package_result = await package_items_activity(order_id, pick_result)
+    carrier_result = await select_carrier_activity(order_id, package_result)
+    tracking_result = await generate_tracking_activity(order_id, carrier_result)
+    delivery_result = await confirm_delivery_activity(order_id, tracking_result)
+    return {
+        "pick": pick_result,
+        "package": package_result,
+        "carrier": carrier_result,
+        "tracking": tracking_result,
+        "delivery": delivery_result,
+    }
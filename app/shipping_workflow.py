@@ -1,16 +1,25 @@
 from temporalio import workflow
+from temporalio.exceptions import ApplicationError
 from datetime import timedelta
+from app.config import SHIPPING_MODES
 
 
-# Import shipping activities (we'll create these next)
-from app.shipping_activities import (
-    pick_items_activity,
-    package_items_activity,
-    select_carrier_activity,
-    generate_tracking_activity,
-    confirm_delivery_activity,
+# Shipping activities, referenced by name (see app/activity_names.py)
+from app.activity_names import (
+    CONFIRM_DELIVERY,
+    GENERATE_TRACKING,
+    PACKAGE_ITEMS,
+    PICK_ITEMS,
+    SELECT_CARRIER,
+    SHIP_ORDER,
 )
 
+# How the shipping steps are executed (SHIPPING_MODES):
+#   activities - one regular activity per step (default)
+#   local      - one local activity per step, run inside the workflow task
+#   combined   - a single activity running every step
+STEP_TIMEOUT = timedelta(seconds=30)
+
 
 @workflow.defn
 class ShippingWorkflow:
@@ -18,82 +27,85 @@ class ShippingWorkflow:
         self.cancelled = False
         self.tracking_number = None
         self.carrier = None
+        # Lifecycle position, exposed through the get_progress query
+        self.order_id = None
+        self.step = "starting"
+        self.mode = "activities"
 
     @workflow.run
-    async def run(self, order_id: str, items: list) -> dict:
+    async def run(self, order_id: str, items: list, mode: str = "activities") -> dict:
         """Main shipping workflow - processes order from warehouse to delivery"""
 
-        print(f"🚚 Starting ShippingWorkflow for order {order_id}")
+        workflow.logger.info(
+            "Starting ShippingWorkflow (%s)", mode, extra={"order_id": order_id}
+        )
+        self.order_id = order_id
+        if mode not in SHIPPING_MODES:
+            raise ApplicationError(f"Unknown shipping mode: {mode}", non_retryable=True)
+        self.mode = mode
+
+        if mode == "combined":
+            return await self._run_combined(order_id, items)
 
         # Step 1: Pick items from warehouse
-        print(f"📦 Step 1: Picking items for order {order_id}")
-        pick_result = await workflow.execute_activity(
-            pick_items_activity,
-            args=[order_id, items],
-            start_to_close_timeout=timedelta(seconds=30),
-        )
+        workflow.logger.info("Step 1: Picking items")
+        self.step = "picking"
+        pick_result = await self._execute(PICK_ITEMS, order_id, items)
 
         if self.cancelled:
-            print(f"❌ Shipping cancelled during picking for {order_id}")
-            return {"status": "cancelled", "reason": "Shipping cancelled"}
+            workflow.logger.info("Shipping cancelled during picking")
+            return self._cancelled()
 
         # Step 2: Package items
-        print(f"📦 Step 2: Packaging items for order {order_id}")
-        package_result = await workflow.execute_activity(
-            package_items_activity,
-            args=[order_id, pick_result],
-            start_to_close_timeout=timedelta(seconds=30),
-        )
+        workflow.logger.info("Step 2: Packaging items")
+        self.step = "packaging"
+        package_result = await self._execute(PACKAGE_ITEMS, order_id, pick_result)
 
         if self.cancelled:
-            print(f"❌ Shipping cancelled during packaging for {order_id}")
-            return {"status": "cancelled", "reason": "Shipping cancelled"}
+            workflow.logger.info("Shipping cancelled during packaging")
+            return self._cancelled()
 
         # Step 3: Select shipping carrier
-        print(f"🚛 Step 3: Selecting carrier for order {order_id}")
-        carrier_result = await workflow.execute_activity(
-            select_carrier_activity,
-            args=[order_id, package_result],
-            start_to_close_timeout=timedelta(seconds=30),
-        )
+        workflow.logger.info("Step 3: Selecting carrier")
+        self.step = "selecting_carrier"
+        carrier_result = await self._execute(SELECT_CARRIER, order_id, package_result)
 
         self.carrier = carrier_result["carrier"]
 
         if self.cancelled:
-            print(f"❌ Shipping cancelled during carrier selection for {order_id}")
-            return {"status": "cancelled", "reason": "Shipping cancelled"}
+            workflow.logger.info("Shipping cancelled during carrier selection")
+            return self._cancelled()
 
         # Step 4: Generate tracking number
-        print(f"�� Step 4: Generating tracking for order {order_id}")
-        tracking_result = await workflow.execute_activity(
-            generate_tracking_activity,
-            args=[order_id, carrier_result],
-            start_to_close_timeout=timedelta(seconds=30),
+        workflow.logger.info("Step 4: Generating tracking")
+        self.step = "generating_tracking"
+        tracking_result = await self._execute(
+            GENERATE_TRACKING, order_id, carrier_result
         )
 
         self.tracking_number = tracking_result["tracking_number"]
 
         if self.cancelled:
-            print(f"❌ Shipping cancelled during tracking generation for {order_id}")
-            return {"status": "cancelled", "reason": "Shipping cancelled"}
+            workflow.logger.info("Shipping cancelled during tracking generation")
+            return self._cancelled()
 
         # Step 5: Wait for delivery confirmation (simulated)
-        print(f"📋 Step 5: Waiting for delivery confirmation for {order_id}")
-        print("⏰ Delivery will take 45 seconds to simulate...")
+        workflow.logger.info("Step 5: Waiting for delivery confirmation")
+        self.step = "awaiting_delivery"
 
         if self.cancelled:
-            print(f"❌ Shipping cancelled during delivery for {order_id}")
-            return {"status": "cancelled", "reason": "Shipping cancelled"}
+            workflow.logger.info("Shipping cancelled during delivery")
+            return self._cancelled()
 
         # Step 6: Confirm delivery
-        print(f"✅ Step 6: Confirming delivery for order {order_id}")
-        delivery_result = await workflow.execute_activity(
-            confirm_delivery_activity,
-            args=[order_id, tracking_result],
-            start_to_close_timeout=timedelta(seconds=30),
+        workflow.logger.info("Step 6: Confirming delivery")
+        self.step = "confirming_delivery"
+        delivery_result = await self._execute(
+            CONFIRM_DELIVERY, order_id, tracking_result
         )
 
-        print(f"🎉 ShippingWorkflow completed successfully for {order_id}")
+        workflow.logger.info("ShippingWorkflow completed")
+        self.step = "delivered"
         return {
             "status": "delivered",
             "order_id": order_id,
@@ -102,9 +114,65 @@ class ShippingWorkflow:
             "delivery_date": delivery_result["delivery_date"],
         }
 
+    async def _execute(self, activity: str, *args) -> dict:
+        """Run one shipping step as a regular or a local activity"""
+        options = dict(
+            args=list(args), result_type=dict, start_to_close_timeout=STEP_TIMEOUT
+        )
+        if self.mode == "local":
+            return await workflow.execute_local_activity(activity, **options)
+        return await workflow.execute_activity(activity, **options)
+
+    async def _run_combined(self, order_id: str, items: list) -> dict:
+        """Run every shipping step in one activity.
+
+        Cancellation is only checked before the activity starts; a retry
+        runs all steps again.
+        """
+        if self.cancelled:
+            workflow.logger.info("Shipping cancelled before processing")
+            return self._cancelled()
+
+        self.step = "processing"
+        result = await workflow.execute_activity(
+            SHIP_ORDER,
+            args=[order_id, items],
+            result_type=dict,
+            start_to_close_timeout=STEP_TIMEOUT * 5,
+        )
+        self.carrier = result["carrier"]["carrier"]
+        self.tracking_number = result["tracking"]["tracking_number"]
+
+        workflow.logger.info("ShippingWorkflow completed")
+        self.step = "delivered"
+        return {
+            "status": "delivered",
+            "order_id": order_id,
+            "tracking_number": self.tracking_number,
+            "carrier": self.carrier,
+            "delivery_date": result["delivery"]["delivery_date"],
+        }
+
+    def _cancelled(self) -> dict:
+        """Record the cancellation for get_progress and build the result"""
+        self.step = "cancelled"
+        return {"status": "cancelled", "reason": "Shipping cancelled"}
+
     # Signal to cancel shipping
     @workflow.signal
     def cancel_shipping_signal(self):
         """Signal to cancel the shipping process"""
         self.cancelled = True
-        print("🛑 Shipping cancellation signal received")
+        workflow.logger.info("Shipping cancellation signal received")
+
+    @workflow.query
+    def get_progress(self) -> dict:
+        """Current shipping step, carrier and tracking number"""
+        return {
+            "order_id": self.order_id,
+            "step": self.step,
+            "mode": self.mode,
+            "cancelled": self.cancelled,
+            "carrier": self.carrier,
+            "tracking_number": self.tracking_number,
+        }
@@ -1,11 +1,12 @@
 import asyncio
 import uuid
-from temporalio.client import Client
+from app.config import shipping_mode_from_env
 from app.order_workflow import OrderWorkflow
+from app.temporal_client import get_client
 
 
 async def main():
-    client = await Client.connect("localhost:7233")
+    client = await get_client()
     id = uuid.uuid4()
     order_id = f"order-{id}"
     payment_id = f"payment-{id}"
@@ -14,7 +15,7 @@ async def main():
 
     result = await client.execute_workflow(
         OrderWorkflow.run,
-        args=[order_id, payment_id],
+        args=[order_id, payment_id, shipping_mode_from_env()],
         id=workflow_id,
         task_queue="my-task-queue",
     )
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Run several worker processes per task queue and keep them running"""
+
+import argparse
+import asyncio
+import os
+import shlex
+import signal
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.config import DatabaseConfig
+
+# Worker entry point for each task queue
+WORKER_MODULES = {
+    "my-task-queue": "app.worker",
+    "shipping-task-queue": "app.worker_shipping",
+}
+
+
+@dataclass
+class WorkerProcess:
+    """One supervised worker slot"""
+
+    name: str
+    command: List[str]
+    process: Optional[asyncio.subprocess.Process] = None
+    restarts: int = 0
+    pids: List[int] = field(default_factory=list)
+    env: Dict[str, str] = field(default_factory=dict)  # On top of os.environ
+
+
+class Supervisor:
+    """Start worker processes, restart the ones that crash, stop on signal.
+
+    A child that exits while the supervisor is running is restarted after
+    `restart_delay` seconds, doubling up to `max_restart_delay` while it
+    keeps crashing within `stable_after` seconds of starting. On SIGTERM or
+    SIGINT every child gets SIGTERM (the workers then finish in-flight
+    tasks) and is killed if it is still running after `shutdown_timeout`.
+    """
+
+    def __init__(
+        self,
+        workers: List[WorkerProcess],
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 30.0,
+        stable_after: float = 60.0,
+        shutdown_timeout: float = 30.0,
+    ):
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_after = stable_after
+        self.shutdown_timeout = shutdown_timeout
+        self._stopping: Optional[asyncio.Event] = None
+
+    def stop(self) -> None:
+        """Ask every child to shut down and stop restarting them"""
+        if self._stopping is not None and not self._stopping.is_set():
+            print("🛑 Stopping workers")
+            self._stopping.set()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        signals = (signal.SIGINT, signal.SIGTERM)
+        for signum in signals:
+            loop.add_signal_handler(signum, self.stop)
+        try:
+            await asyncio.gather(*(self._supervise(w) for w in self.workers))
+        finally:
+            for signum in signals:
+                loop.remove_signal_handler(signum)
+
+    async def _supervise(self, worker: WorkerProcess) -> None:
+        loop = asyncio.get_running_loop()
+        delay = self.restart_delay
+        while not self._stopping.is_set():
+            started_at = loop.time()
+            worker.process = await asyncio.create_subprocess_exec(
+                *worker.command, env={**os.environ, **worker.env}
+            )
+            worker.pids.append(worker.process.pid)
+            print(f"▶️  {worker.name} started (pid {worker.process.pid})")
+
+            stop_wait = asyncio.ensure_future(self._stopping.wait())
+            exit_wait = asyncio.ensure_future(worker.process.wait())
+            await asyncio.wait(
+                {stop_wait, exit_wait}, return_when=asyncio.FIRST_COMPLETED
+            )
+            stop_wait.cancel()
+
+            if self._stopping.is_set():
+                await self._terminate(worker, exit_wait)
+                return
+
+            returncode = exit_wait.result()
+            if loop.time() - started_at >= self.stable_after:
+                delay = self.restart_delay
+            print(
+                f"💥 {worker.name} exited with code {returncode}, "
+                f"restarting in {delay:.1f}s"
+            )
+            try:
+                await asyncio.wait_for(self._stopping.wait(), delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+            worker.restarts += 1
+            delay = min(delay * 2, self.max_restart_delay)
+
+    async def _terminate(self, worker: WorkerProcess, exit_wait) -> None:
+        process = worker.process
+        if process.returncode is None:
+            process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(exit_wait, self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️  {worker.name} did not stop in time, killing it")
+            process.kill()
+            await process.wait()
+        print(f"⏹️  {worker.name} stopped (code {process.returncode})")
+
+
+def build_workers(
+    order_workers: int,
+    shipping_workers: int,
+    order_args: List[str],
+    shipping_args: List[str],
+    metrics_port_base: int = 0,
+    temporal_metrics_port_base: int = 0,
+) -> List[WorkerProcess]:
+    """Worker slots for both task queues.
+
+    With a port base, worker i serves /metrics on base + i (METRICS_PORT) and
+    SDK metrics on its own base + i (TEMPORAL_METRICS_PORT).
+    """
+    plan = [
+        ("my-task-queue", order_workers, order_args),
+        ("shipping-task-queue", shipping_workers, shipping_args),
+    ]
+    workers = []
+    for task_queue, count, extra_args in plan:
+        module = WORKER_MODULES[task_queue]
+        for index in range(count):
+            env = {}
+            if metrics_port_base > 0:
+                env["METRICS_PORT"] = str(metrics_port_base + len(workers))
+            if temporal_metrics_port_base > 0:
+                port = temporal_metrics_port_base + len(workers)
+                env["TEMPORAL_METRICS_PORT"] = str(port)
+            workers.append(
+                WorkerProcess(
+                    name=f"{task_queue}[{index}]",
+                    command=[sys.executable, "-m", module, *extra_args],
+                    env=env,
+                )
+            )
+    return workers
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Run N worker processes per task queue. Children inherit the "
+            "environment, so DATABASE_URL, TEMPORAL_*, WORKER_* etc. apply "
+            "to all of them."
+        )
+    )
+    parser.add_argument(
+        "--order-workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes for my-task-queue (default: CPU count)",
+    )
+    parser.add_argument(
+        "--shipping-workers",
+        type=int,
+        default=1,
+        help="Processes for shipping-task-queue (default: 1)",
+    )
+    parser.add_argument(
+        "--order-args",
+        default="",
+        help='Extra flags for app.worker, e.g. "--db-pool-size 4"',
+    )
+    parser.add_argument(
+        "--shipping-args", default="", help="Extra flags for app.worker_shipping"
+    )
+    parser.add_argument(
+        "--restart-delay",
+        type=float,
+        default=1.0,
+        help="Seconds before restarting a crashed worker (doubles while it "
+        "keeps crashing)",
+    )
+    parser.add_argument(
+        "--shutdown-timeout",
+        type=float,
+        default=30.0,
+        help="Seconds to wait for workers to stop before killing them",
+    )
+    parser.add_argument(
+        "--metrics-port-base",
+        type=int,
+        default=0,
+        help="Worker i serves /metrics on this port + i (0: use METRICS_PORT)",
+    )
+    parser.add_argument(
+        "--temporal-metrics-port-base",
+        type=int,
+        default=0,
+        help="Worker i serves Temporal SDK metrics on this port + i",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workers = build_workers(
+        args.order_workers,
+        args.shipping_workers,
+        shlex.split(args.order_args),
+        shlex.split(args.shipping_args),
+        args.metrics_port_base,
+        args.temporal_metrics_port_base,
+    )
+    if not workers:
+        print("❌ No workers requested")
+        return
+
+    print(
+        f"🧭 Supervising {args.order_workers} order and "
+        f"{args.shipping_workers} shipping worker processes"
+    )
+    pool_capacity = DatabaseConfig.from_env().pool_capacity
+    print(
+        f"🗄️  Order workers may open up to {args.order_workers * pool_capacity} "
+        f"DB connections ({pool_capacity} per process)"
+    )
+    supervisor = Supervisor(
+        workers,
+        restart_delay=args.restart_delay,
+        shutdown_timeout=args.shutdown_timeout,
+    )
+    asyncio.run(supervisor.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Process-wide Temporal client built from TemporalConfig"""
+
+import asyncio
+from dataclasses import replace
+from datetime import timedelta
+from typing import Dict, Optional
+
+from temporalio.client import (
+    CancelWorkflowInput,
+    Client,
+    DescribeWorkflowInput,
+    Interceptor,
+    OutboundInterceptor,
+    QueryWorkflowInput,
+    SignalWorkflowInput,
+    StartWorkflowInput,
+    TerminateWorkflowInput,
+)
+from temporalio.converter import DataConverter
+from temporalio.runtime import PrometheusConfig, Runtime, TelemetryConfig
+from temporalio.service import KeepAliveConfig, RetryConfig
+
+from app.config import TemporalConfig
+
+temporal_config = TemporalConfig.from_env()
+
+# Connected on first use by get_client()
+_client: Optional[Client] = None
+_client_lock: Optional[asyncio.Lock] = None
+
+# SDK runtimes with a Prometheus endpoint, by port: a port can only be bound
+# once per process, so reconnects reuse the runtime
+_runtimes: Dict[int, Runtime] = {}
+
+
+class _DefaultRpcTimeoutOutbound(OutboundInterceptor):
+    """Apply a default rpc_timeout to calls that did not set their own"""
+
+    def __init__(self, next: OutboundInterceptor, timeout: timedelta):
+        super().__init__(next)
+        self.timeout = timeout
+
+    def _with_timeout(self, input):
+        if input.rpc_timeout is None:
+            return replace(input, rpc_timeout=self.timeout)
+        return input
+
+    async def start_workflow(self, input: StartWorkflowInput):
+        return await super().start_workflow(self._with_timeout(input))
+
+    async def signal_workflow(self, input: SignalWorkflowInput) -> None:
+        await super().signal_workflow(self._with_timeout(input))
+
+    async def query_workflow(self, input: QueryWorkflowInput):
+        return await super().query_workflow(self._with_timeout(input))
+
+    async def describe_workflow(self, input: DescribeWorkflowInput):
+        return await super().describe_workflow(self._with_timeout(input))
+
+    async def cancel_workflow(self, input: CancelWorkflowInput) -> None:
+        await super().cancel_workflow(self._with_timeout(input))
+
+    async def terminate_workflow(self, input: TerminateWorkflowInput) -> None:
+        await super().terminate_workflow(self._with_timeout(input))
+
+
+class DefaultRpcTimeoutInterceptor(Interceptor):
+    """Client interceptor installing _DefaultRpcTimeoutOutbound"""
+
+    def __init__(self, timeout: timedelta):
+        self.timeout = timeout
+
+    def intercept_client(self, next: OutboundInterceptor) -> OutboundInterceptor:
+        return _DefaultRpcTimeoutOutbound(next, self.timeout)
+
+
+def build_data_converter(name: str) -> DataConverter:
+    """Data converter for a TEMPORAL_DATA_CONVERTER name"""
+    if name == "default":
+        return DataConverter.default
+    if name == "pydantic":
+        from temporalio.contrib.pydantic import pydantic_data_converter
+
+        return pydantic_data_converter
+    raise ValueError(f"Unknown Temporal data converter: {name}")
+
+
+def build_runtime(metrics_port: int) -> Optional[Runtime]:
+    """SDK runtime exporting its metrics on `metrics_port` (None for 0).
+
+    Covers what only the SDK sees: workflow task and activity schedule to
+    start latency, poll results, sticky cache hits and completions.
+    """
+    if metrics_port <= 0:
+        return None
+    if metrics_port not in _runtimes:
+        _runtimes[metrics_port] = Runtime(
+            telemetry=TelemetryConfig(
+                metrics=PrometheusConfig(bind_address=f"0.0.0.0:{metrics_port}")
+            )
+        )
+    return _runtimes[metrics_port]
+
+
+async def connect(config: TemporalConfig) -> Client:
+    """Open a new client connection with the given settings"""
+    interceptors = []
+    if config.rpc_timeout_seconds > 0:
+        timeout = timedelta(seconds=config.rpc_timeout_seconds)
+        interceptors.append(DefaultRpcTimeoutInterceptor(timeout))
+
+    return await Client.connect(
+        config.address,
+        namespace=config.namespace,
+        data_converter=build_data_converter(config.data_converter),
+        interceptors=interceptors,
+        keep_alive_config=KeepAliveConfig(
+            interval_millis=config.keepalive_interval_ms,
+            timeout_millis=config.keepalive_timeout_ms,
+        ),
+        retry_config=RetryConfig(max_retries=config.rpc_max_retries),
+        runtime=build_runtime(config.metrics_port),
+    )
+
+
+def configure_temporal(config: TemporalConfig) -> None:
+    """Use `config` for the process-wide client (reconnects on next use)"""
+    global temporal_config, _client
+    temporal_config = config
+    _client = None
+
+
+async def get_client() -> Client:
+    """The process-wide client, connecting on first use.
+
+    A failed connect is not cached, so the next call tries again.
+    """
+    global _client, _client_lock
+    if _client is not None:
+        return _client
+    if _client_lock is None:
+        _client_lock = asyncio.Lock()
+    async with _client_lock:
+        if _client is None:
+            _client = await connect(temporal_config)
+            print(
+                f"🔗 Connected to Temporal at {temporal_config.address} "
+                f"(namespace {temporal_config.namespace})"
+            )
+    return _client
+
+
+def reset_client() -> None:
+    """Drop the cached client so the next get_client() reconnects"""
+    global _client
+    _client = None
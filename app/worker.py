@@ -1,7 +1,42 @@
+import argparse
 import asyncio
-from temporalio.client import Client
+from typing import Optional
 from temporalio.worker import Worker
+from app.config import (
+    EventSinkConfig,
+    MetricsConfig,
+    WorkerConfig,
+    add_database_arguments,
+    add_event_sink_arguments,
+    add_fault_arguments,
+    add_log_arguments,
+    add_metrics_arguments,
+    add_temporal_arguments,
+    add_worker_arguments,
+    database_config_from_args,
+    event_sink_config_from_args,
+    fault_config_from_args,
+    log_config_from_args,
+    metrics_config_from_args,
+    temporal_config_from_args,
+    worker_config_from_args,
+)
+from app.database import (
+    configure_database,
+    get_async_session_factory,
+    get_pool_stats,
+)
+from app.event_sink import start_event_sink, stop_event_sink
+from app import faults
 from app.order_workflow import OrderWorkflow
+from app.logs import setup_logging
+from app.temporal_client import configure_temporal, get_client
+from app.worker_options import (
+    describe_worker_config,
+    run_until_stopped,
+    serve_metrics,
+    worker_options,
+)
 from app.activities import (
     validate_order_activity,
     charge_payment_activity,
@@ -10,8 +45,15 @@ from app.activities import (
 )
 
 
-async def main():
-    client = await Client.connect("localhost:7233")
+async def main(
+    event_sink_config: Optional[EventSinkConfig] = None,
+    worker_config: Optional[WorkerConfig] = None,
+    metrics_config: Optional[MetricsConfig] = None,
+):
+    event_sink_config = event_sink_config or EventSinkConfig.from_env()
+    worker_config = worker_config or WorkerConfig.from_env()
+    metrics_config = metrics_config or MetricsConfig.from_env()
+    client = await get_client()
     worker = Worker(
         client,
         task_queue="my-task-queue",
@@ -22,11 +64,52 @@ async def main():
             receive_order_activity,
             start_shipping_activity,
         ],
+        **worker_options(worker_config),
     )
+    start_event_sink(event_sink_config, get_async_session_factory())
     print("🚀 Worker started with workflows AND activities!")
+    print(f"⚙️  Worker settings: {describe_worker_config(worker_config)}")
+    pool_stats = get_pool_stats()
+    print(f"🗄️  DB pool: {pool_stats}")
+    if worker_config.max_concurrent_activities > pool_stats["pool_capacity"]:
+        print(
+            f"⚠️  {worker_config.max_concurrent_activities} concurrent activities "
+            f"share {pool_stats['pool_capacity']} DB connections; "
+            "activities will queue for a connection"
+        )
+    print(f"📝 Event sink: {event_sink_config.mode}")
+    print(f"🎲 Fault injection: {faults.describe_faults(faults.fault_config)}")
+    serve_metrics(metrics_config)
     print("Press Ctrl+C to stop the worker")
-    await worker.run()
+    try:
+        await run_until_stopped(worker)
+    finally:
+        # Buffered events must reach the database before the process exits
+        await stop_event_sink()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Order workflow worker")
+    add_database_arguments(parser)
+    add_event_sink_arguments(parser)
+    add_fault_arguments(parser)
+    add_log_arguments(parser)
+    add_metrics_arguments(parser)
+    add_temporal_arguments(parser)
+    add_worker_arguments(parser)
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    setup_logging(log_config_from_args(args))
+    configure_database(database_config_from_args(args))
+    faults.configure_faults(fault_config_from_args(args))
+    configure_temporal(temporal_config_from_args(args))
+    asyncio.run(
+        main(
+            event_sink_config_from_args(args),
+            worker_config_from_args(args),
+            metrics_config_from_args(args),
+        )
+    )
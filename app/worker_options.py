@@ -0,0 +1,197 @@
+"""Worker constructor options built from WorkerConfig"""
+
+import asyncio
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from temporalio import activity
+from temporalio.worker import (
+    ActivityInboundInterceptor,
+    ExecuteActivityInput,
+    Interceptor,
+    PollerBehaviorSimpleMaximum,
+    Worker,
+)
+from temporalio.worker.workflow_sandbox import (
+    SandboxedWorkflowRunner,
+    SandboxRestrictions,
+)
+
+from app.config import MetricsConfig, WorkerConfig
+from app.metrics import (
+    ACTIVITY_DB_STATEMENTS,
+    ACTIVITY_DB_TIME,
+    ACTIVITY_LATENCY,
+    ACTIVITY_RETRIES,
+    start_metrics_server,
+)
+from app.query_profile import profile_queries
+
+SDK_DEFAULT = "sdk default"
+
+# Modules the workflow sandbox shares with the worker instead of re-importing
+# for every workflow run. Workflows only import activity names, so these are
+# a guard against a workflow module pulling in DB or API code by accident;
+# the app modules listed are side-effect free.
+SANDBOX_PASSTHROUGH_MODULES = (
+    "sqlalchemy",
+    "asyncpg",
+    "psycopg2",
+    "psycopg",
+    "aiosqlite",
+    "pydantic",
+    "pydantic_core",
+    "fastapi",
+    "starlette",
+    "app.activity_names",
+    "app.config",
+)
+
+
+def workflow_runner() -> SandboxedWorkflowRunner:
+    """Sandboxed runner with SANDBOX_PASSTHROUGH_MODULES passed through"""
+    restrictions = SandboxRestrictions.default.with_passthrough_modules(
+        *SANDBOX_PASSTHROUGH_MODULES
+    )
+    return SandboxedWorkflowRunner(restrictions=restrictions)
+
+
+class _ActivityMetricsInbound(ActivityInboundInterceptor):
+    """Time each activity attempt, count retries and its SQL statements"""
+
+    async def execute_activity(self, input: ExecuteActivityInput):
+        info = activity.info()
+        labels = {"activity": info.activity_type, "task_queue": info.task_queue}
+        if info.attempt > 1:
+            ACTIVITY_RETRIES.inc(**labels)
+        start = time.perf_counter()
+        outcome = "failure"
+        try:
+            with profile_queries(info.activity_type) as queries:
+                result = await super().execute_activity(input)
+            outcome = "success"
+            return result
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            ACTIVITY_LATENCY.observe(
+                time.perf_counter() - start, outcome=outcome, **labels
+            )
+            ACTIVITY_DB_STATEMENTS.observe(queries.statements, **labels)
+            ACTIVITY_DB_TIME.observe(queries.seconds, **labels)
+
+
+class ActivityMetricsInterceptor(Interceptor):
+    """Worker interceptor recording the ACTIVITY_* metrics"""
+
+    def intercept_activity(
+        self, next: ActivityInboundInterceptor
+    ) -> ActivityInboundInterceptor:
+        return _ActivityMetricsInbound(next)
+
+
+def worker_options(config: WorkerConfig) -> dict:
+    """Keyword arguments for temporalio.worker.Worker.
+
+    Limits left at 0 are omitted so the SDK default applies.
+    """
+    options = {
+        "max_cached_workflows": config.max_cached_workflows,
+        "graceful_shutdown_timeout": timedelta(
+            seconds=config.graceful_shutdown_seconds
+        ),
+        "workflow_runner": workflow_runner(),
+        "interceptors": [ActivityMetricsInterceptor()],
+    }
+    limits = {
+        "max_concurrent_activities": config.max_concurrent_activities,
+        "max_concurrent_workflow_tasks": config.max_concurrent_workflow_tasks,
+        "max_concurrent_local_activities": config.max_concurrent_local_activities,
+    }
+    options.update({name: value for name, value in limits.items() if value > 0})
+
+    if config.workflow_task_pollers > 0:
+        options["workflow_task_poller_behavior"] = PollerBehaviorSimpleMaximum(
+            config.workflow_task_pollers
+        )
+    if config.activity_task_pollers > 0:
+        options["activity_task_poller_behavior"] = PollerBehaviorSimpleMaximum(
+            config.activity_task_pollers
+        )
+
+    if config.activity_executor == "thread":
+        options["activity_executor"] = ThreadPoolExecutor(
+            max_workers=config.activity_executor_threads or None,
+            thread_name_prefix="activity",
+        )
+    elif config.activity_executor != "none":
+        raise ValueError(f"Unknown activity executor: {config.activity_executor}")
+
+    if config.workflow_task_threads > 0:
+        options["workflow_task_executor"] = ThreadPoolExecutor(
+            max_workers=config.workflow_task_threads,
+            thread_name_prefix="workflow_task",
+        )
+    return options
+
+
+def describe_worker_config(config: WorkerConfig) -> dict:
+    """Effective settings for the startup log, 0 shown as the SDK default"""
+
+    def value(setting: int):
+        return setting if setting > 0 else SDK_DEFAULT
+
+    return {
+        "max_concurrent_activities": value(config.max_concurrent_activities),
+        "max_concurrent_workflow_tasks": value(config.max_concurrent_workflow_tasks),
+        "max_concurrent_local_activities": value(
+            config.max_concurrent_local_activities
+        ),
+        "workflow_task_pollers": value(config.workflow_task_pollers),
+        "activity_task_pollers": value(config.activity_task_pollers),
+        "max_cached_workflows": config.max_cached_workflows,
+        "activity_executor": config.activity_executor,
+        "activity_executor_threads": value(config.activity_executor_threads),
+        "workflow_task_threads": value(config.workflow_task_threads),
+        "graceful_shutdown_seconds": config.graceful_shutdown_seconds,
+    }
+
+
+def serve_metrics(config: MetricsConfig) -> None:
+    """Start the /metrics endpoint unless its port is 0"""
+    if config.port <= 0:
+        print("📈 Metrics endpoint disabled (set METRICS_PORT to enable)")
+        return
+    server = start_metrics_server(config.host, config.port)
+    host, port = server.server_address[:2]
+    print(f"📈 Metrics at http://{host}:{port}/metrics")
+
+
+async def run_until_stopped(worker: Worker) -> None:
+    """Run `worker` until SIGINT or SIGTERM, then shut it down gracefully.
+
+    In-flight activities get the worker's graceful_shutdown_timeout to
+    finish before they are cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    shutdown_task = None
+
+    def request_shutdown():
+        nonlocal shutdown_task
+        if shutdown_task is None:
+            print("🛑 Shutdown requested, finishing in-flight tasks")
+            shutdown_task = loop.create_task(worker.shutdown())
+
+    signals = (signal.SIGINT, signal.SIGTERM)
+    for signum in signals:
+        loop.add_signal_handler(signum, request_shutdown)
+    try:
+        await worker.run()
+    finally:
+        for signum in signals:
+            loop.remove_signal_handler(signum)
+        if shutdown_task is not None:
+            await shutdown_task
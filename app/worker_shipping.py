@@ -1,6 +1,19 @@
+import argparse
 import asyncio
-from temporalio.client import Client
 from temporalio.worker import Worker
+from typing import Optional
+from app.config import (
+    MetricsConfig,
+    WorkerConfig,
+    add_log_arguments,
+    add_metrics_arguments,
+    add_temporal_arguments,
+    add_worker_arguments,
+    log_config_from_args,
+    metrics_config_from_args,
+    temporal_config_from_args,
+    worker_config_from_args,
+)
 from app.shipping_workflow import ShippingWorkflow
 from app.shipping_activities import (
     pick_items_activity,
@@ -8,11 +21,25 @@ from app.shipping_activities import (
     select_carrier_activity,
     generate_tracking_activity,
     confirm_delivery_activity,
+    ship_order_activity,
+)
+from app.logs import setup_logging
+from app.temporal_client import configure_temporal, get_client
+from app.worker_options import (
+    describe_worker_config,
+    run_until_stopped,
+    serve_metrics,
+    worker_options,
 )
 
 
-async def main():
-    client = await Client.connect("localhost:7233")
+async def main(
+    worker_config: Optional[WorkerConfig] = None,
+    metrics_config: Optional[MetricsConfig] = None,
+):
+    worker_config = worker_config or WorkerConfig.from_env()
+    metrics_config = metrics_config or MetricsConfig.from_env()
+    client = await get_client()
 
     # Create worker for shipping workflows and activities
     worker = Worker(
@@ -25,14 +52,30 @@ async def main():
             select_carrier_activity,
             generate_tracking_activity,
             confirm_delivery_activity,
+            ship_order_activity,
         ],
+        **worker_options(worker_config),
     )
 
     print("🚚 Shipping worker started!")
+    print(f"⚙️  Worker settings: {describe_worker_config(worker_config)}")
+    serve_metrics(metrics_config)
     print("Press Ctrl+C to stop the worker")
 
-    await worker.run()
+    await run_until_stopped(worker)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Shipping workflow worker")
+    add_log_arguments(parser)
+    add_metrics_arguments(parser)
+    add_temporal_arguments(parser)
+    add_worker_arguments(parser)
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    setup_logging(log_config_from_args(args))
+    configure_temporal(temporal_config_from_args(args))
+    asyncio.run(main(worker_config_from_args(args), metrics_config_from_args(args)))
@@ -54,9 +54,9 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
--- Apply the trigger to tables
-CREATE TRIGGER update_orders_updated_at BEFORE UPDATE ON orders
+-- Apply the trigger to tables (OR REPLACE keeps the file safe to re-run)
+CREATE OR REPLACE TRIGGER update_orders_updated_at BEFORE UPDATE ON orders
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
-CREATE TRIGGER update_payments_updated_at BEFORE UPDATE ON payments
+CREATE OR REPLACE TRIGGER update_payments_updated_at BEFORE UPDATE ON payments
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
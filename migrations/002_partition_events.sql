@@ -0,0 +1,142 @@
+-- Partition the events table by month on timestamp
+--
+-- Each month lives in its own partition (events_pYYYY_MM) with its own
+-- small indexes, and old months can be detached instead of deleted row by
+-- row (see app/partitions.py). The primary key must include the partition
+-- key, so it becomes (id, timestamp); ids still come from events_id_seq.
+-- Safe to re-run: an existing plain events table is converted only once.
+
+CREATE SEQUENCE IF NOT EXISTS events_id_seq;
+
+-- Move a plain (not yet partitioned) events table out of the way
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class
+        WHERE oid = to_regclass('events') AND relkind = 'r'
+    ) THEN
+        ALTER TABLE events RENAME TO events_unpartitioned;
+        ALTER TABLE events_unpartitioned
+            RENAME CONSTRAINT events_pkey TO events_unpartitioned_pkey;
+        DROP INDEX IF EXISTS idx_events_order_id;
+        DROP INDEX IF EXISTS idx_events_timestamp;
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER NOT NULL DEFAULT nextval('events_id_seq'),
+    order_id VARCHAR(255) NOT NULL,
+    event_type VARCHAR(100) NOT NULL,
+    event_data JSONB,  -- Store event details as JSON
+    workflow_id VARCHAR(255),
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp),
+    FOREIGN KEY (order_id) REFERENCES orders(id)
+) PARTITION BY RANGE (timestamp);
+
+-- The sequence must outlive the old table it was created for
+ALTER SEQUENCE events_id_seq OWNED BY events.id;
+
+-- Catches rows outside every monthly partition so inserts never fail;
+-- create_events_partition moves them out when their month is created
+CREATE TABLE IF NOT EXISTS events_default PARTITION OF events DEFAULT;
+
+-- Partitioned indexes: each partition gets (and maintains) its own
+CREATE INDEX IF NOT EXISTS idx_events_order_id ON events(order_id);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp);
+
+-- Create the partition for the month containing month_start.
+-- Returns its name, or NULL when it already exists.
+CREATE OR REPLACE FUNCTION create_events_partition(month_start DATE)
+RETURNS TEXT AS $$
+DECLARE
+    start_ts TIMESTAMP := date_trunc('month', month_start);
+    end_ts TIMESTAMP := date_trunc('month', month_start) + INTERVAL '1 month';
+    partition_name TEXT := 'events_p' || to_char(month_start, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- Workers and the retention job may race to create the same month
+    PERFORM pg_advisory_xact_lock(hashtext('create_events_partition'));
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM events_default
+        WHERE timestamp >= start_ts AND timestamp < end_ts
+    ) THEN
+        -- Attaching would fail while the default partition holds rows of
+        -- this month, so move them into the new table first
+        EXECUTE format(
+            'CREATE TABLE %I (LIKE events INCLUDING DEFAULTS)', partition_name
+        );
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM events_default '
+            'WHERE timestamp >= %L AND timestamp < %L RETURNING *) '
+            'INSERT INTO %I SELECT * FROM moved',
+            start_ts, end_ts, partition_name
+        );
+        EXECUTE format(
+            'ALTER TABLE events ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name, start_ts, end_ts
+        );
+    ELSE
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF events FOR VALUES FROM (%L) TO (%L)',
+            partition_name, start_ts, end_ts
+        );
+    END IF;
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create the partitions for `months` consecutive months from first_month.
+-- Returns the names of the partitions that were created.
+CREATE OR REPLACE FUNCTION create_events_partitions(first_month DATE, months INTEGER)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    created TEXT;
+BEGIN
+    FOR i IN 0 .. months - 1 LOOP
+        created := create_events_partition(
+            (date_trunc('month', first_month) + make_interval(months => i))::DATE
+        );
+        IF created IS NOT NULL THEN
+            RETURN NEXT created;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Copy the rows of a converted table into their monthly partitions
+DO $$
+DECLARE
+    first_month DATE;
+BEGIN
+    IF to_regclass('events_unpartitioned') IS NULL THEN
+        RETURN;
+    END IF;
+
+    SELECT date_trunc('month', COALESCE(MIN(timestamp), CURRENT_TIMESTAMP))::DATE
+    INTO first_month FROM events_unpartitioned;
+    PERFORM create_events_partitions(
+        first_month,
+        ((EXTRACT(YEAR FROM CURRENT_DATE) - EXTRACT(YEAR FROM first_month)) * 12
+         + EXTRACT(MONTH FROM CURRENT_DATE) - EXTRACT(MONTH FROM first_month)
+         + 1)::INTEGER
+    );
+
+    -- Rows without a timestamp predate the column default; keep them as current
+    INSERT INTO events (id, order_id, event_type, event_data, workflow_id, timestamp)
+    SELECT id, order_id, event_type, event_data, workflow_id,
+           COALESCE(timestamp, CURRENT_TIMESTAMP)
+    FROM events_unpartitioned;
+
+    DROP TABLE events_unpartitioned;
+END $$;
+
+-- The current month and the next three; app/partitions.py keeps extending
+SELECT create_events_partitions(CURRENT_DATE, 4);
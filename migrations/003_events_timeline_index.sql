@@ -0,0 +1,16 @@
+-- Serve order timelines from one composite index
+--
+-- GET /orders/{id}/events pages through an order's events in
+-- (timestamp, id) order with a keyset cursor:
+--   WHERE order_id = $1 AND (timestamp, id) > ($2, $3)
+--   ORDER BY timestamp, id LIMIT $4
+-- (order_id, timestamp, id) turns that into a single index range scan with
+-- no sort, whatever the page. It also covers lookups by order_id alone, so
+-- the single-column indexes only cost insert time. On the partitioned
+-- table each monthly partition gets its own copy of the index.
+
+CREATE INDEX IF NOT EXISTS idx_events_order_timeline
+    ON events(order_id, timestamp, id);
+
+DROP INDEX IF EXISTS idx_events_order_id;
+DROP INDEX IF EXISTS idx_events_timestamp;
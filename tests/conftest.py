@@ -1,6 +1,7 @@
 """Pytest configuration and fixtures for Temporal Order Lifecycle testing"""
 
 import pytest
+import pytest_asyncio
 import asyncio
 import tempfile
 import os
@@ -8,13 +9,19 @@ from temporalio.testing import WorkflowEnvironment
 from temporalio.client import Client
 from temporalio.worker import Worker
 from sqlalchemy import create_engine
+from sqlalchemy import Column, String, DateTime, Numeric, Integer, JSON, func
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 # Import your application components
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
+from app import query_profile
+from app.database import instrument_engine
 from app.models import Base
 from app.activities import (
     receive_order_activity,
@@ -97,55 +104,59 @@ async def shipping_worker(temporal_client):
     return worker
 
 
+# Test-specific models with SQLite-compatible types
+TestBase = declarative_base()
+
+
+class TestOrder(TestBase):
+    __tablename__ = "orders"
+    id = Column(String(255), primary_key=True)
+    status = Column(String(50), nullable=False, default="pending")
+    customer_name = Column(String(255))
+    customer_email = Column(String(255))
+    total_amount = Column(Numeric(10, 2))
+    items = Column(JSON)  # Use JSON instead of JSONB for SQLite
+    shipping_address = Column(JSON)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class TestPayment(TestBase):
+    __tablename__ = "payments"
+    id = Column(String(255), primary_key=True)
+    order_id = Column(String(255), nullable=False)
+    amount = Column(Numeric(10, 2), nullable=False)
+    status = Column(String(50), nullable=False, default="pending")
+    payment_method = Column(String(100))
+    transaction_id = Column(String(255))
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class TestEvent(TestBase):
+    __tablename__ = "events"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(String(255), nullable=False)
+    event_type = Column(String(100), nullable=False)
+    event_data = Column(JSON)  # Use JSON instead of JSONB for SQLite
+    workflow_id = Column(String(255))
+    timestamp = Column(DateTime, default=func.now())
+
+
 @pytest.fixture
 def test_database():
     """Create a test database in memory."""
     # Use SQLite for testing (faster than PostgreSQL)
     engine = create_engine("sqlite:///:memory:")
-
-    # Create test-specific models with SQLite-compatible types
-    from sqlalchemy import Column, String, DateTime, Numeric, Integer, Text, JSON, func
-    from sqlalchemy.ext.declarative import declarative_base
-
-    TestBase = declarative_base()
-
-    class TestOrder(TestBase):
-        __tablename__ = "orders"
-        id = Column(String(255), primary_key=True)
-        status = Column(String(50), nullable=False, default="pending")
-        customer_name = Column(String(255))
-        customer_email = Column(String(255))
-        total_amount = Column(Numeric(10, 2))
-        items = Column(JSON)  # Use JSON instead of JSONB for SQLite
-        shipping_address = Column(JSON)
-        created_at = Column(DateTime, default=func.now())
-        updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
-
-    class TestPayment(TestBase):
-        __tablename__ = "payments"
-        id = Column(String(255), primary_key=True)
-        order_id = Column(String(255), nullable=False)
-        amount = Column(Numeric(10, 2), nullable=False)
-        status = Column(String(50), nullable=False, default="pending")
-        payment_method = Column(String(100))
-        transaction_id = Column(String(255))
-        created_at = Column(DateTime, default=func.now())
-        updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
-
-    class TestEvent(TestBase):
-        __tablename__ = "events"
-        id = Column(Integer, primary_key=True, autoincrement=True)
-        order_id = Column(String(255), nullable=False)
-        event_type = Column(String(100), nullable=False)
-        event_data = Column(JSON)  # Use JSON instead of JSONB for SQLite
-        workflow_id = Column(String(255))
-        timestamp = Column(DateTime, default=func.now())
+    instrument_engine(engine, "test")
 
     # Create all tables
     TestBase.metadata.create_all(bind=engine)
 
     # Create session factory
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    TestingSessionLocal = sessionmaker(
+        autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+    )
 
     yield TestingSessionLocal
 
@@ -153,6 +164,42 @@ def test_database():
     engine.dispose()
 
 
+@pytest_asyncio.fixture
+async def async_test_database():
+    """Create an async test database in memory."""
+    # A single shared connection keeps the in-memory database alive
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    instrument_engine(engine.sync_engine, "test")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(TestBase.metadata.create_all)
+
+    # Create async session factory
+    TestingAsyncSessionLocal = async_sessionmaker(
+        bind=engine, autoflush=False, expire_on_commit=False
+    )
+
+    yield TestingAsyncSessionLocal
+
+    # Cleanup
+    await engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets():
+    """Fail a test when a function runs more statements than its budget"""
+    mode = query_profile.budget_mode
+    query_profile.configure_query_budgets("raise")
+    yield
+    query_profile.configure_query_budgets(mode)
+
+
+@pytest.fixture
+def query_counter():
+    """Open a profile around a block: `with query_counter() as q: ...`"""
+    return query_profile.profile_queries
+
+
 @pytest.fixture
 def sample_order_data():
     """Sample order data for testing."""
@@ -1,13 +1,46 @@
 """Unit tests for Temporal activities"""
 
+import asyncio
 import pytest
+import time
 import uuid
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from temporalio.testing import ActivityEnvironment
+from app.config import FaultConfig
+from app.faults import InjectedFault, draw_fault, fault_point
 from app.activities import (
     receive_order_activity,
     validate_order_activity,
+    charge_payment_activity,
     start_shipping_activity,
 )
+from app.function_stubs import (
+    order_received,
+    order_validated,
+    payment_charged,
+    order_shipped,
+    package_prepared,
+    carrier_dispatched,
+)
+from app.models import Event, Order, Payment
+from app.shipping_activities import ship_order_activity
+
+
+def make_async_db(mock_get_db, existing=None):
+    """Wire a mocked AsyncSession into a patched get_async_db"""
+    mock_db = MagicMock()
+    mock_db.get = AsyncMock(return_value=existing)
+    mock_db.get_bind.return_value.dialect.name = "sqlite"
+    # Rows returned by INSERT/UPDATE ... RETURNING in the function stubs
+    mock_result = MagicMock()
+    mock_result.one_or_none.return_value = existing
+    mock_db.execute = AsyncMock(return_value=mock_result)
+    mock_db.commit = AsyncMock()
+    mock_db.rollback = AsyncMock()
+    mock_get_db.return_value.__aenter__.return_value = mock_db
+    return mock_db
 
 
 class TestReceiveOrderActivity:
@@ -20,17 +53,15 @@ class TestReceiveOrderActivity:
 
         # Mock the database session and flaky_call
         with (
-            patch("app.activities.get_db") as mock_get_db,
+            patch("app.activities.get_async_db") as mock_get_db,
             patch("app.function_stubs.flaky_call") as mock_flaky_call,
         ):
             # Mock flaky_call to succeed
             mock_flaky_call.return_value = None
 
-            mock_db = MagicMock()
-            mock_get_db.return_value = iter([mock_db])
-
-            # Mock the order query
-            mock_db.query.return_value.filter.return_value.first.return_value = None
+            # Mock the row returned by the order insert
+            new_order = MagicMock(status="received", items=[{"sku": "ABC123"}])
+            mock_db = make_async_db(mock_get_db, existing=new_order)
 
             result = await receive_order_activity(order_id)
 
@@ -38,12 +69,117 @@ class TestReceiveOrderActivity:
             assert result["order_id"] == order_id
             assert result["status"] == "received"
             assert "items" in result
+            assert "already_processed" not in result
 
             # Verify database operations were called
+            mock_db.execute.assert_called_once()
             mock_db.add.assert_called()
             mock_db.commit.assert_called()
 
 
+class TestActivityIdempotency:
+    """Test retried activities against a real database"""
+
+    @pytest.fixture(autouse=True)
+    def use_test_database(self, async_test_database):
+        """Route activities to the async test database and disable failures"""
+        with (
+            patch("app.activities.get_async_db", new=async_test_database),
+            patch("app.function_stubs.flaky_call", new=AsyncMock()),
+        ):
+            yield
+
+    @pytest.mark.asyncio
+    async def test_receive_order_twice(self, async_test_database):
+        """Test that a retried receive returns the stored order"""
+        order_id = f"order-{uuid.uuid4()}"
+
+        first = await receive_order_activity(order_id)
+        second = await receive_order_activity(order_id)
+
+        assert first["status"] == "received"
+        assert second["already_processed"] is True
+        assert second["items"] == first["items"]
+
+        async with async_test_database() as db:
+            events = await db.scalars(select(Event).where(Event.order_id == order_id))
+            assert len(events.all()) == 1
+
+    @pytest.mark.asyncio
+    async def test_charge_payment_twice(self, async_test_database):
+        """Test that a retried charge does not create a second payment"""
+        order_id = f"order-{uuid.uuid4()}"
+        payment_id = f"payment-{uuid.uuid4()}"
+
+        await receive_order_activity(order_id)
+        await validate_order_activity({"order_id": order_id})
+        first = await charge_payment_activity(payment_id, order_id)
+        second = await charge_payment_activity(payment_id, order_id)
+
+        assert first["status"] == "charged"
+        assert second == {
+            "payment_id": payment_id,
+            "status": "completed",
+            "order_id": order_id,
+            "already_processed": True,
+        }
+
+        async with async_test_database() as db:
+            payments = await db.scalars(
+                select(Payment).where(Payment.order_id == order_id)
+            )
+            assert [p.transaction_id for p in payments] == [first["transaction_id"]]
+
+    @pytest.mark.asyncio
+    async def test_retry_restores_lost_events(self, async_test_database):
+        """Test a retry re-emits an event lost after its row committed"""
+        order_id = f"order-{uuid.uuid4()}"
+        payment_id = f"payment-{uuid.uuid4()}"
+
+        await receive_order_activity(order_id)
+        await validate_order_activity({"order_id": order_id})
+        charged = await charge_payment_activity(payment_id, order_id)
+        # What a failed sink write leaves behind: rows without their events
+        async with async_test_database() as db:
+            await db.execute(
+                delete(Event).where(
+                    Event.order_id == order_id,
+                    Event.event_type.in_(["order_received", "payment_charged"]),
+                )
+            )
+            await db.commit()
+
+        await receive_order_activity(order_id)
+        await charge_payment_activity(payment_id, order_id)
+        await receive_order_activity(order_id)
+
+        async with async_test_database() as db:
+            events = await db.scalars(
+                select(Event).where(Event.order_id == order_id).order_by(Event.id)
+            )
+            events = events.all()
+        assert sorted(e.event_type for e in events) == [
+            "order_received",
+            "order_validated",
+            "payment_charged",
+        ]
+        payment_event = next(e for e in events if e.event_type == "payment_charged")
+        assert payment_event.event_data["transaction_id"] == charged["transaction_id"]
+
+    @pytest.mark.asyncio
+    async def test_failed_charge_leaves_no_payment(self, async_test_database):
+        """Test that a charge for an unvalidated order is rolled back"""
+        order_id = f"order-{uuid.uuid4()}"
+        payment_id = f"payment-{uuid.uuid4()}"
+
+        await receive_order_activity(order_id)
+        with pytest.raises(ValueError, match="received state"):
+            await charge_payment_activity(payment_id, order_id)
+
+        async with async_test_database() as db:
+            assert await db.get(Payment, payment_id) is None
+
+
 class TestValidateOrderActivity:
     """Test validate_order_activity"""
 
@@ -54,15 +190,12 @@ class TestValidateOrderActivity:
         order_data = {"order_id": order_id}
 
         with (
-            patch("app.activities.get_db") as mock_get_db,
+            patch("app.activities.get_async_db") as mock_get_db,
             patch("app.function_stubs.flaky_call") as mock_flaky_call,
         ):
             # Mock flaky_call to succeed
             mock_flaky_call.return_value = None
 
-            mock_db = MagicMock()
-            mock_get_db.return_value = iter([mock_db])
-
             # Mock existing order
             mock_order = MagicMock()
             mock_order.id = order_id
@@ -71,9 +204,7 @@ class TestValidateOrderActivity:
             mock_order.customer_name = "Test Customer"
             mock_order.total_amount = 25.00
 
-            mock_db.query.return_value.filter.return_value.first.return_value = (
-                mock_order
-            )
+            mock_db = make_async_db(mock_get_db, existing=mock_order)
 
             result = await validate_order_activity(order_data)
 
@@ -86,23 +217,55 @@ class TestValidateOrderActivity:
         order_data = {"order_id": order_id}
 
         with (
-            patch("app.activities.get_db") as mock_get_db,
+            patch("app.activities.get_async_db") as mock_get_db,
             patch("app.function_stubs.flaky_call") as mock_flaky_call,
         ):
             # Mock flaky_call to succeed
             mock_flaky_call.return_value = None
 
-            mock_db = MagicMock()
-            mock_get_db.return_value = iter([mock_db])
-
             # Mock no order found
-            mock_db.query.return_value.filter.return_value.first.return_value = None
+            mock_db = make_async_db(mock_get_db, existing=None)
 
             result = await validate_order_activity(order_data)
 
             assert result is False
 
 
+class TestActivityHeartbeats:
+    """Test order activities heartbeat through slow DB work"""
+
+    @pytest.mark.asyncio
+    async def test_slow_step_runs_to_completion(self):
+        """Test a stub that never heartbeats is not cut off by heartbeat_timeout"""
+        interval = 0.01
+
+        async def slow_validation(order_id, db):
+            # 30 heartbeat intervals without a heartbeat of its own
+            await asyncio.sleep(30 * interval)
+            return True
+
+        env = ActivityEnvironment()
+        beats = []
+        env.on_heartbeat = lambda *details: beats.append(time.monotonic())
+
+        with (
+            patch("app.activities.HEARTBEAT_INTERVAL_SECONDS", interval),
+            patch("app.activities.get_async_db") as mock_get_db,
+            patch("app.activities.order_validated", new=slow_validation),
+        ):
+            make_async_db(mock_get_db)
+            started = time.monotonic()
+            assert await env.run(validate_order_activity, {"order_id": "o-1"})
+            finished = time.monotonic()
+
+        # A heartbeat_timeout of 10 intervals never elapses between beats
+        gaps = [b - a for a, b in zip([started] + beats, beats + [finished])]
+        assert max(gaps) < 10 * interval
+        count = len(beats)
+        await asyncio.sleep(3 * interval)
+        assert len(beats) == count
+
+
 class TestStartShippingActivity:
     """Test start_shipping_activity"""
 
@@ -112,23 +275,18 @@ class TestStartShippingActivity:
         order_id = f"order-{uuid.uuid4()}"
 
         with (
-            patch("app.activities.get_db") as mock_get_db,
+            patch("app.activities.get_async_db") as mock_get_db,
             patch("app.function_stubs.flaky_call") as mock_flaky_call,
         ):
             # Mock flaky_call to succeed
             mock_flaky_call.return_value = None
 
-            mock_db = MagicMock()
-            mock_get_db.return_value = iter([mock_db])
-
             # Mock existing order
             mock_order = MagicMock()
             mock_order.id = order_id
             mock_order.status = "payment_completed"
 
-            mock_db.query.return_value.filter.return_value.first.return_value = (
-                mock_order
-            )
+            mock_db = make_async_db(mock_get_db, existing=mock_order)
 
             result = await start_shipping_activity(order_id)
 
@@ -138,3 +296,178 @@ class TestStartShippingActivity:
 
             # Verify database operations were called
             mock_db.commit.assert_called()
+
+
+class TestLifecycleTransitions:
+    """Test function stub state transitions against a real database"""
+
+    @pytest.fixture(autouse=True)
+    def no_flaky_calls(self):
+        """Disable simulated failures for these tests"""
+        with patch("app.function_stubs.flaky_call", new=AsyncMock()):
+            yield
+
+    async def _events(self, db, order_id):
+        result = await db.execute(
+            select(Event.event_type).where(Event.order_id == order_id)
+        )
+        return list(result.scalars())
+
+    @pytest.mark.asyncio
+    async def test_full_lifecycle(self, async_test_database):
+        """Test each step updates status and logs its event together"""
+        order_id = f"order-{uuid.uuid4()}"
+        payment_id = f"payment-{uuid.uuid4()}"
+
+        async with async_test_database() as db:
+            await order_received(order_id, db)
+            assert await order_validated(order_id, db) is True
+
+            result = await payment_charged(order_id, payment_id, db)
+            assert result["status"] == "charged"
+            assert result["amount"] == 1
+
+            await order_shipped(order_id, db)
+
+            order = await db.get(Order, order_id, populate_existing=True)
+            payment = await db.get(Payment, payment_id)
+            assert order.status == "shipping"
+            assert payment.transaction_id == result["transaction_id"]
+            assert await self._events(db, order_id) == [
+                "order_received",
+                "order_validated",
+                "payment_charged",
+                "shipping_started",
+            ]
+
+    @pytest.mark.asyncio
+    async def test_payment_requires_validated_order(self, async_test_database):
+        """Test that a payment is not written for an order in the wrong state"""
+        order_id = f"order-{uuid.uuid4()}"
+        payment_id = f"payment-{uuid.uuid4()}"
+
+        async with async_test_database() as db:
+            await order_received(order_id, db)
+
+            with pytest.raises(ValueError, match="received state"):
+                await payment_charged(order_id, payment_id, db)
+            await db.rollback()
+
+            assert await db.get(Payment, payment_id) is None
+            assert await self._events(db, order_id) == ["order_received"]
+
+            with pytest.raises(ValueError, match="not found"):
+                await payment_charged(f"order-{uuid.uuid4()}", payment_id, db)
+
+    @pytest.mark.asyncio
+    async def test_payment_foreign_key_violation(self, async_test_database):
+        """Test an unknown order fails alike where payments.order_id is a FK"""
+        order_id = f"order-{uuid.uuid4()}"
+        violation = IntegrityError("INSERT INTO payments", {}, Exception("fk"))
+
+        with patch(
+            "app.function_stubs.AsyncPaymentRepository.insert_or_get_payment",
+            side_effect=violation,
+        ):
+            async with async_test_database() as db:
+                with pytest.raises(ValueError, match=f"Order {order_id} not found"):
+                    await payment_charged(order_id, f"payment-{uuid.uuid4()}", db)
+
+                # Other integrity errors are not mistaken for a missing order
+                await order_received(order_id, db)
+                with pytest.raises(IntegrityError):
+                    await payment_charged(order_id, f"payment-{uuid.uuid4()}", db)
+
+    @pytest.mark.asyncio
+    async def test_validate_missing_order(self, async_test_database):
+        """Test that validating an unknown order writes nothing"""
+        order_id = f"order-{uuid.uuid4()}"
+
+        async with async_test_database() as db:
+            assert await order_validated(order_id, db) is False
+            assert await self._events(db, order_id) == []
+
+    @pytest.mark.asyncio
+    async def test_shipping_steps_require_an_order(self, async_test_database):
+        """Test that shipping steps fail instead of reporting success"""
+        order_id = f"order-{uuid.uuid4()}"
+
+        async with async_test_database() as db:
+            for step in (order_shipped, package_prepared, carrier_dispatched):
+                with pytest.raises(ValueError, match="not found"):
+                    await step(order_id, db)
+            assert await self._events(db, order_id) == []
+
+
+class TestCombinedShippingActivity:
+    """Test ship_order_activity (combined shipping mode)"""
+
+    @pytest.mark.asyncio
+    async def test_runs_every_shipping_step(self):
+        """Test one call returns the result of each step"""
+        items = [{"sku": "ABC", "qty": 1}]
+
+        result = await ship_order_activity("order-1", items)
+
+        assert result["pick"]["picked_items"] == items
+        assert result["carrier"]["carrier"] == "USPS"
+        assert result["tracking"]["tracking_number"].startswith("USPS-")
+        assert result["delivery"]["delivery_status"] == "delivered"
+
+
+class TestFaultInjection:
+    """Test the seeded fault profile behind flaky_call"""
+
+    def test_seeded_outcomes_are_reproducible(self):
+        """Test the same seed and call key always draw the same fault"""
+        config = FaultConfig(seed=7, latency_min_ms=10, latency_max_ms=50)
+        keys = [f"workflow-{i}:receive_order_activity:1" for i in range(200)]
+
+        first = [draw_fault(config, key) for key in keys]
+        assert first == [draw_fault(config, key) for key in reversed(keys)][::-1]
+        assert first != [draw_fault(FaultConfig(seed=8), key) for key in keys]
+
+        outcomes = [outcome for outcome, _ in first]
+        assert 40 < outcomes.count("fail") < 95
+        assert 40 < outcomes.count("hang") < 95
+        assert all(0.01 <= latency <= 0.05 for _, latency in first)
+
+    @pytest.mark.asyncio
+    async def test_disabled_profile_is_a_no_op(self):
+        """Test FAULTS_ENABLED=false never fails or sleeps"""
+        config = FaultConfig(enabled=False, failure_rate=1.0, hang_rate=0.0)
+        await fault_point(config)
+
+    @pytest.mark.asyncio
+    async def test_failure(self):
+        """Test a failure rate of 1 always raises"""
+        with pytest.raises(InjectedFault):
+            await fault_point(FaultConfig(failure_rate=1.0, hang_rate=0.0))
+
+    def test_invalid_rates_are_rejected(self):
+        """Test rates that add up to more than 1 are refused"""
+        with pytest.raises(ValueError):
+            FaultConfig(failure_rate=0.6, hang_rate=0.6)
+
+    @pytest.mark.asyncio
+    async def test_hang_heartbeats_and_honours_cancellation(self):
+        """Test a hanging activity heartbeats and stops as soon as it is cancelled"""
+        config = FaultConfig(
+            failure_rate=0.0, hang_rate=1.0, hang_seconds=60, heartbeat_seconds=0.01
+        )
+        env = ActivityEnvironment()
+        heartbeats = []
+        env.on_heartbeat = lambda *details: heartbeats.append(details)
+
+        async def cancel_soon():
+            await asyncio.sleep(0.05)
+            env.cancel()
+
+        canceller = asyncio.ensure_future(cancel_soon())
+        started = time.monotonic()
+        with pytest.raises(asyncio.CancelledError):
+            await env.run(fault_point, config)
+        await canceller
+
+        assert time.monotonic() - started < 1
+        assert heartbeats
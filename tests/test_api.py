@@ -0,0 +1,636 @@
+"""Tests for the FastAPI service"""
+
+import asyncio
+import httpx
+import pytest
+import pytest_asyncio
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock
+from fastapi.testclient import TestClient
+from temporalio.exceptions import WorkflowAlreadyStartedError
+from temporalio.service import RPCError, RPCStatusCode
+
+from app import api
+from app.cache import TTLCache
+from app.config import BatchConfig, StatusCacheConfig
+from app.metrics import Counter, Gauge, Histogram, Registry
+from app.models import Event, Order
+from app.order_workflow import OrderWorkflow
+from app.shipping_workflow import ShippingWorkflow
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def temporal_client():
+    """Mocked Temporal client whose workflows always report RUNNING"""
+    handle = MagicMock()
+    handle.describe = AsyncMock(
+        return_value=SimpleNamespace(
+            status=SimpleNamespace(name="RUNNING"),
+            run_id="run-1",
+            workflow_type="OrderWorkflow",
+            start_time=datetime(2024, 1, 1),
+            close_time=None,
+        )
+    )
+    handle.signal = AsyncMock()
+    client = MagicMock()
+    client.get_workflow_handle.return_value = handle
+    client.start_workflow = AsyncMock()
+
+    cache = TTLCache(max_size=100, ttl=60)
+    with patch.object(api, "temporal_client", client), patch.object(
+        api, "status_cache", cache
+    ):
+        yield client
+
+
+class TestTTLCache:
+    """Test the TTL + LRU cache"""
+
+    def test_hit_and_miss_counters(self):
+        cache = TTLCache(max_size=10, ttl=5)
+
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = TTLCache(max_size=10, ttl=5, clock=clock)
+        cache.set("a", 1)
+
+        clock.now = 4.9
+        assert cache.get("a") == 1
+        clock.now = 5.0
+        assert cache.get("a") is None
+        assert cache.stats()["size"] == 0
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+
+    def test_zero_ttl_disables_cache(self):
+        cache = TTLCache(max_size=10, ttl=0)
+        cache.set("a", 1)
+
+        assert cache.get("a") is None
+
+    def test_write_after_invalidation_is_dropped(self):
+        cache = TTLCache(max_size=10, ttl=60)
+        token = cache.token()
+        cache.invalidate("a")
+        cache.set("a", "stale", token)
+        cache.set("b", "fresh", token)
+
+        assert cache.get("a") is None
+        assert cache.get("b") == "fresh"
+        cache.set("a", "fresh", cache.token())
+        assert cache.get("a") == "fresh"
+
+    def test_forgotten_invalidations_still_drop_writes(self):
+        cache = TTLCache(max_size=1, ttl=60)
+        token = cache.token()
+        cache.invalidate("a")
+        cache.invalidate("b")
+
+        cache.set("a", "stale", token)
+        assert cache.get("a") is None
+
+    def test_ttl_per_entry(self):
+        clock = FakeClock()
+        cache = TTLCache(max_size=10, ttl=5, clock=clock)
+        cache.set("a", 1, ttl=0.5)
+        cache.set("b", 2)
+
+        clock.now = 1.0
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+
+
+class TestOrderStatusCache:
+    """Test GET /orders/{order_id}/status caching"""
+
+    def test_repeated_polls_describe_once(self, temporal_client):
+        client = TestClient(api.app)
+
+        for _ in range(3):
+            response = client.get("/orders/order-1/status")
+            assert response.status_code == 200
+            assert response.json()["status"] == "RUNNING"
+
+        handle = temporal_client.get_workflow_handle.return_value
+        assert handle.describe.await_count == 1
+        stats = client.get("/health/status-cache").json()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+
+    @pytest.mark.parametrize(
+        "path,body",
+        [
+            ("/orders/order-1/signals/cancel", None),
+            ("/orders/order-1/signals/update-address", {"signal_type": "x"}),
+        ],
+    )
+    def test_signals_invalidate_status(self, temporal_client, path, body):
+        client = TestClient(api.app)
+        handle = temporal_client.get_workflow_handle.return_value
+
+        client.get("/orders/order-1/status")
+        assert client.post(path, json=body).status_code == 200
+        client.get("/orders/order-1/status")
+
+        assert handle.describe.await_count == 2
+
+    def test_start_invalidates_status(self, temporal_client):
+        client = TestClient(api.app)
+        handle = temporal_client.get_workflow_handle.return_value
+        order = {
+            "customer_name": "Test",
+            "customer_email": "test@example.com",
+            "items": [],
+            "shipping_address": {},
+        }
+
+        client.get("/orders/order-1/status")
+        assert client.post("/orders/order-1/start", json=order).status_code == 200
+        client.get("/orders/order-1/status")
+
+        assert handle.describe.await_count == 2
+
+
+class TestOrderProgress:
+    """Test GET /orders/{order_id}/progress"""
+
+    def test_progress_has_its_own_ttl(self, temporal_client):
+        handle = temporal_client.get_workflow_handle.return_value
+        handle.query = AsyncMock(
+            return_value={"step": "manual_review", "shipping_workflow_id": None}
+        )
+        client = TestClient(api.app)
+
+        config = StatusCacheConfig(ttl_seconds=60, progress_ttl_seconds=0)
+        with patch.object(api, "status_cache_config", config):
+            client.get("/orders/order-1/progress")
+            client.get("/orders/order-1/progress")
+        client.get("/orders/order-1/status")
+        client.get("/orders/order-1/status")
+
+        assert handle.query.await_count == 2
+        assert handle.describe.await_count == 1
+
+    def test_signal_during_a_read_is_not_cached_over(self, temporal_client):
+        handle = temporal_client.get_workflow_handle.return_value
+        client = TestClient(api.app)
+
+        async def query_racing_a_signal(*args):
+            # The cancel signal lands while this read is still in flight
+            api.invalidate_order("order-1")
+            return {"step": "manual_review", "cancelled": False}
+
+        handle.query = AsyncMock(side_effect=query_racing_a_signal)
+        client.get("/orders/order-1/progress")
+        handle.query = AsyncMock(return_value={"step": "cancelled"})
+
+        assert client.get("/orders/order-1/progress").json()["step"] == "cancelled"
+
+    def test_progress_before_shipping(self, temporal_client):
+        handle = temporal_client.get_workflow_handle.return_value
+        handle.query = AsyncMock(
+            return_value={
+                "order_id": "order-1",
+                "step": "manual_review",
+                "cancelled": False,
+                "payment_cancelled": False,
+                "pending_shipping_address": {"city": "Lagos"},
+                "shipping_workflow_id": None,
+            }
+        )
+        client = TestClient(api.app)
+
+        response = client.get("/orders/order-1/progress")
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["step"] == "manual_review"
+        assert body["pending_shipping_address"] == {"city": "Lagos"}
+        assert body["shipping"] is None
+        assert handle.query.await_count == 1
+        handle.describe.assert_not_awaited()
+
+    def test_progress_includes_shipping(self, temporal_client):
+        handle = temporal_client.get_workflow_handle.return_value
+        handle.query = AsyncMock(
+            side_effect=[
+                {"step": "completed", "shipping_workflow_id": "shipping-order-1"},
+                {"step": "packaging", "carrier": None, "tracking_number": None},
+            ]
+        )
+        client = TestClient(api.app)
+
+        body = client.get("/orders/order-1/progress").json()
+
+        assert body["step"] == "completed"
+        assert body["shipping"]["step"] == "packaging"
+        temporal_client.get_workflow_handle.assert_called_with("shipping-order-1")
+
+    def test_progress_of_unknown_workflow_is_404(self, temporal_client):
+        handle = temporal_client.get_workflow_handle.return_value
+        handle.query = AsyncMock(
+            side_effect=RPCError("not found", RPCStatusCode.NOT_FOUND, b"")
+        )
+        client = TestClient(api.app)
+
+        response = client.get("/orders/order-1/progress")
+
+        assert response.status_code == 404
+
+    def test_signal_invalidates_progress(self, temporal_client):
+        handle = temporal_client.get_workflow_handle.return_value
+        handle.query = AsyncMock(
+            return_value={"step": "manual_review", "shipping_workflow_id": None}
+        )
+        client = TestClient(api.app)
+
+        client.get("/orders/order-1/progress")
+        client.get("/orders/order-1/progress")
+        client.post("/orders/order-1/signals/cancel")
+        client.get("/orders/order-1/progress")
+
+        assert handle.query.await_count == 2
+
+
+@pytest.fixture
+def workflow_logger():
+    """Stand-in for workflow.logger, which only works inside a workflow"""
+    with patch("temporalio.workflow.logger") as logger:
+        yield logger
+
+
+@pytest.mark.usefixtures("workflow_logger")
+class TestWorkflowQueries:
+    """Test the get_progress query handlers"""
+
+    def test_order_workflow_initial_progress(self):
+        wf = OrderWorkflow()
+        wf.update_address_signal({"city": "Abuja"})
+
+        progress = wf.get_progress()
+
+        assert progress["step"] == "starting"
+        assert progress["pending_shipping_address"] == {"city": "Abuja"}
+        assert progress["cancelled"] is False
+
+    def test_shipping_workflow_cancelled_progress(self):
+        wf = ShippingWorkflow()
+        wf.cancel_shipping_signal()
+        result = wf._cancelled()
+
+        assert result["status"] == "cancelled"
+        assert wf.get_progress()["step"] == "cancelled"
+        assert wf.get_progress()["cancelled"] is True
+
+
+class TestManualReview:
+    """Test the review signal"""
+
+    def test_review_endpoint_sends_decision(self, temporal_client):
+        handle = temporal_client.get_workflow_handle.return_value
+        client = TestClient(api.app)
+
+        response = client.post(
+            "/orders/order-1/signals/review",
+            json={"approved": False, "reason": "Fraud check"},
+        )
+
+        assert response.status_code == 200
+        handle.signal.assert_awaited_once_with(
+            "review_order_signal", {"approved": False, "reason": "Fraud check"}
+        )
+
+    def test_first_review_decision_wins(self, workflow_logger):
+        wf = OrderWorkflow()
+
+        wf.review_order_signal({"approved": False, "reason": "Out of stock"})
+        wf.review_order_signal({"approved": True})
+
+        assert wf.review_decision == "rejected"
+        assert wf.review_reason == "Out of stock"
+        assert wf.get_progress()["review_decision"] == "rejected"
+        workflow_logger.info.assert_called_once_with(
+            "Review signal received: %s", "rejected"
+        )
+
+
+class TestShippingMode:
+    """Test the shipping mode passed to new workflows"""
+
+    order = {
+        "customer_name": "Test",
+        "customer_email": "test@example.com",
+        "items": [],
+        "shipping_address": {},
+    }
+
+    def test_start_passes_requested_mode(self, temporal_client):
+        client = TestClient(api.app)
+
+        response = client.post(
+            "/orders/order-1/start", json={**self.order, "shipping_mode": "local"}
+        )
+
+        assert response.status_code == 200
+        args = temporal_client.start_workflow.await_args.kwargs["args"]
+        assert args[0] == "order-1"
+        assert args[2] == "local"
+
+    def test_start_defaults_to_configured_mode(self, temporal_client):
+        client = TestClient(api.app)
+
+        with patch.object(api, "default_shipping_mode", "combined"):
+            client.post("/orders/order-1/start", json=self.order)
+
+        args = temporal_client.start_workflow.await_args.kwargs["args"]
+        assert args[2] == "combined"
+
+    def test_unknown_mode_is_rejected(self, temporal_client):
+        client = TestClient(api.app)
+
+        response = client.post(
+            "/orders/order-1/start", json={**self.order, "shipping_mode": "fast"}
+        )
+
+        assert response.status_code == 422
+        temporal_client.start_workflow.assert_not_awaited()
+
+
+class TestBatchStart:
+    """Test POST /batch/orders"""
+
+    @staticmethod
+    def batch(*order_ids):
+        return {
+            "orders": [
+                {
+                    "order_id": order_id,
+                    "customer_name": "Test",
+                    "customer_email": "test@example.com",
+                    "items": [],
+                    "shipping_address": {},
+                }
+                for order_id in order_ids
+            ]
+        }
+
+    def test_reports_each_order(self, temporal_client):
+        async def start_workflow(*args, id, **kwargs):
+            if id == "workflow-dup":
+                raise WorkflowAlreadyStartedError(id, "OrderWorkflow")
+            if id == "workflow-bad":
+                raise RuntimeError("boom")
+
+        temporal_client.start_workflow = AsyncMock(side_effect=start_workflow)
+        client = TestClient(api.app)
+
+        response = client.post("/batch/orders", json=self.batch("a", "dup", "bad", "b"))
+
+        assert response.status_code == 200
+        body = response.json()
+        assert [r["status"] for r in body["results"]] == [
+            "started",
+            "already_started",
+            "failed",
+            "started",
+        ]
+        assert (body["started"], body["already_started"], body["failed"]) == (2, 1, 1)
+        assert "boom" in body["results"][2]["message"]
+
+    def test_concurrency_is_bounded(self, temporal_client):
+        in_flight = 0
+        peak = 0
+
+        async def start_workflow(*args, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        temporal_client.start_workflow = AsyncMock(side_effect=start_workflow)
+        client = TestClient(api.app)
+
+        with patch.object(api, "batch_config", BatchConfig(concurrency=3)):
+            body = client.post(
+                "/batch/orders", json=self.batch(*map(str, range(10)))
+            ).json()
+
+        assert body["started"] == 10
+        assert peak == 3
+
+    def test_oversized_batch_is_rejected(self, temporal_client):
+        client = TestClient(api.app)
+
+        with patch.object(api, "batch_config", BatchConfig(max_batch_size=2)):
+            response = client.post("/batch/orders", json=self.batch("a", "b", "c"))
+
+        assert response.status_code == 413
+        temporal_client.start_workflow.assert_not_awaited()
+
+
+class TestBatchSignals:
+    """Test the /batch/orders/signals endpoints"""
+
+    def test_cancel_reports_each_order(self, temporal_client):
+        handles = {}
+
+        def get_workflow_handle(workflow_id):
+            handle = MagicMock()
+            if workflow_id == "workflow-missing":
+                error = RPCError("not found", RPCStatusCode.NOT_FOUND, b"")
+                handle.signal = AsyncMock(side_effect=error)
+            else:
+                handle.signal = AsyncMock()
+            handles[workflow_id] = handle
+            return handle
+
+        temporal_client.get_workflow_handle.side_effect = get_workflow_handle
+        client = TestClient(api.app)
+
+        response = client.post(
+            "/batch/orders/signals/cancel", json={"order_ids": ["a", "missing", "b"]}
+        )
+
+        assert response.status_code == 200
+        body = response.json()
+        assert [r["status"] for r in body["results"]] == ["sent", "not_found", "sent"]
+        assert (body["sent"], body["not_found"], body["failed"]) == (2, 1, 0)
+        handles["workflow-a"].signal.assert_awaited_once_with("cancel_order_signal")
+
+    def test_update_address_sends_data(self, temporal_client):
+        handle = temporal_client.get_workflow_handle.return_value
+        client = TestClient(api.app)
+        address = {"street": "1 Main St"}
+
+        body = client.post(
+            "/batch/orders/signals/update-address",
+            json={"order_ids": ["a", "b"], "data": address},
+        ).json()
+
+        assert body["sent"] == 2
+        handle.signal.assert_awaited_with("update_address_signal", address)
+
+    def test_signals_invalidate_cached_status(self, temporal_client):
+        handle = temporal_client.get_workflow_handle.return_value
+        client = TestClient(api.app)
+
+        client.get("/orders/a/status")
+        client.post(
+            "/batch/orders/signals/review",
+            json={"order_ids": ["a"], "approved": True},
+        )
+        client.get("/orders/a/status")
+
+        assert handle.describe.await_count == 2
+        handle.signal.assert_awaited_with(
+            "review_order_signal", {"approved": True, "reason": None}
+        )
+
+    def test_order_named_batch_can_be_signalled(self, temporal_client):
+        client = TestClient(api.app)
+
+        response = client.post("/orders/batch/signals/cancel")
+
+        assert response.json() == {"message": "Cancel signal sent to order batch"}
+        temporal_client.get_workflow_handle.assert_called_once_with("workflow-batch")
+
+
+class TestMetrics:
+    """Test the Prometheus exposition and API request metrics"""
+
+    def test_registry_renders_text_format(self):
+        registry = Registry()
+        requests = Counter("jobs_total", "Jobs", ("queue",), registry=registry)
+        Gauge("depth", "Depth", collect=lambda: [({}, 3)], registry=registry)
+        latency = Histogram(
+            "job_seconds", "Job time", ("queue",), buckets=(0.1, 1.0), registry=registry
+        )
+
+        requests.inc(queue='a"b')
+        latency.observe(0.5, queue="a")
+
+        text = registry.render()
+        assert "# TYPE jobs_total counter" in text
+        assert 'jobs_total{queue="a\\"b"} 1' in text
+        assert "depth 3" in text
+        assert 'job_seconds_bucket{queue="a",le="0.1"} 0' in text
+        assert 'job_seconds_bucket{queue="a",le="1.0"} 1' in text
+        assert 'job_seconds_bucket{queue="a",le="+Inf"} 1' in text
+        assert 'job_seconds_count{queue="a"} 1' in text
+
+    def test_duplicate_names_are_rejected(self):
+        registry = Registry()
+        Counter("jobs_total", "Jobs", registry=registry)
+        with pytest.raises(ValueError):
+            Counter("jobs_total", "Jobs", registry=registry)
+
+    def test_requests_are_timed_by_route(self, temporal_client):
+        client = TestClient(api.app)
+
+        client.get("/orders/order-1/status")
+        client.get("/orders/order-2/status")
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        labels = 'method="GET",route="/orders/{order_id}/status",status="200"'
+        assert f"http_request_duration_seconds_count{{{labels}}}" in response.text
+        assert 'status_cache_events_total{event="misses"} 2' in response.text
+        assert "db_pool_capacity" in response.text
+
+
+class TestOrderEvents:
+    """Test GET /orders/{order_id}/events keyset pagination"""
+
+    @pytest_asyncio.fixture
+    async def http(self, async_test_database):
+        """API client reading events from the in-memory test database"""
+        async with async_test_database() as db:
+            db.add(Order(id="order-1", status="shipping"))
+            db.add(Order(id="order-2", status="received"))
+            db.add_all(
+                Event(
+                    order_id="order-1",
+                    event_type=f"step_{i}",
+                    event_data={"n": i},
+                    timestamp=datetime(2024, 5, 1, 10, 0, i // 2),
+                )
+                for i in range(5)
+            )
+            await db.commit()
+
+        transport = httpx.ASGITransport(app=api.app)
+        with patch.object(api, "get_async_db", new=async_test_database):
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                yield client
+
+    @pytest.mark.asyncio
+    async def test_pages_through_timeline(self, http, query_counter):
+        pages, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            with query_counter("events page") as queries:
+                response = await http.get("/orders/order-1/events", params=params)
+            assert response.status_code == 200
+            assert queries.statements == 1
+            body = response.json()
+            pages.append([e["event_type"] for e in body["events"]])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+
+        assert pages == [["step_0", "step_1"], ["step_2", "step_3"], ["step_4"]]
+        assert body["order_id"] == "order-1"
+        assert body["events"][0]["event_data"] == {"n": 4}
+
+    @pytest.mark.asyncio
+    async def test_unknown_order_and_empty_timeline(self, http):
+        assert (await http.get("/orders/missing/events")).status_code == 404
+
+        response = await http.get("/orders/order-2/events")
+        assert response.status_code == 200
+        assert response.json() == {
+            "order_id": "order-2",
+            "events": [],
+            "next_cursor": None,
+        }
+
+    @pytest.mark.asyncio
+    async def test_rejects_bad_cursor_and_limit(self, http):
+        response = await http.get("/orders/order-1/events", params={"cursor": "x!"})
+        assert response.status_code == 400
+
+        response = await http.get("/orders/order-1/events", params={"limit": 0})
+        assert response.status_code == 422
@@ -1,10 +1,57 @@
 """Unit tests for database operations"""
 
+import asyncio
+import os
+import subprocess
+import sys
 import pytest
 import uuid
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
 from datetime import datetime
+from sqlalchemy import event
+from app.config import (
+    DatabaseConfig,
+    EventSinkConfig,
+    add_database_arguments,
+    database_config_from_args,
+)
+from app.event_sink import (
+    BatchedEventSink,
+    commit_with_event,
+    get_event_sink,
+    start_event_sink,
+    stop_event_sink,
+)
+from app import database
 from app.models import Order, Payment, Event
-from app.database import OrderRepository, PaymentRepository, EventRepository
+from app.database import (
+    build_async_engine,
+    build_engine,
+    describe_pool,
+    OrderRepository,
+    PaymentRepository,
+    EventRepository,
+    AsyncOrderRepository,
+    AsyncPaymentRepository,
+    AsyncEventRepository,
+    insert_or_get,
+)
+
+
+@contextmanager
+def count_statements(engine):
+    """Collect the SQL statements executed on `engine`"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
 
 
 class TestDatabaseModels:
@@ -168,6 +215,24 @@ class TestOrderRepository:
         saved_order = db_session.query(Order).filter(Order.id == order_id).first()
         assert saved_order.status == "processing"
 
+    def test_writes_are_single_statements(self, db_session):
+        """Test that create and update return populated rows in one round trip"""
+        repo = OrderRepository(db_session)
+        order_id = f"order-{uuid.uuid4()}"
+
+        with count_statements(db_session.get_bind()) as statements:
+            order = repo.create_order({"id": order_id, "status": "pending"})
+            updated_order = repo.update_order_status(order_id, "processing")
+            # Attributes stay loaded after commit: no refresh queries
+            assert updated_order.created_at is not None
+            assert updated_order.status == "processing"
+
+        assert len(statements) == 2
+        assert all("RETURNING" in statement for statement in statements)
+        assert order is updated_order
+
+        assert repo.update_order_status(f"order-{uuid.uuid4()}", "processing") is None
+
 
 class TestPaymentRepository:
     """Test PaymentRepository operations"""
@@ -357,3 +422,574 @@ class TestEventRepository:
         assert order_events[0].event_type == "order_created"
         assert order_events[1].event_type == "payment_processed"
         assert order_events[2].event_type == "shipping_started"
+
+
+class TestAsyncRepositories:
+    """Test async repository operations"""
+
+    @pytest.fixture
+    def order_data(self):
+        """Order row for the async repositories"""
+        return {
+            "id": f"order-{uuid.uuid4()}",
+            "status": "pending",
+            "customer_name": "Test Customer",
+            "customer_email": "test@example.com",
+            "total_amount": 99.99,
+            "items": [{"sku": "TEST123", "qty": 1, "price": 99.99}],
+            "shipping_address": {
+                "street": "123 Test St",
+                "city": "Test City",
+                "state": "TS",
+            },
+        }
+
+    @pytest.mark.asyncio
+    async def test_create_and_update_order(self, async_test_database, order_data):
+        """Test creating, reading and updating an order"""
+        async with async_test_database() as db:
+            repo = AsyncOrderRepository(db)
+
+            order = await repo.create_order(order_data)
+            assert order.id == order_data["id"]
+
+            retrieved_order = await repo.get_order(order_data["id"])
+            assert retrieved_order.customer_name == "Test Customer"
+
+            updated_order = await repo.update_order_status(order_data["id"], "paid")
+            assert updated_order.status == "paid"
+
+            assert (
+                await repo.update_order_status(f"order-{uuid.uuid4()}", "paid") is None
+            )
+
+    @pytest.mark.asyncio
+    async def test_order_lifecycle_helpers(self, async_test_database, order_data):
+        """Test the insert-or-get and guarded transition used by the stubs"""
+        async with async_test_database() as db:
+            repo = AsyncOrderRepository(db)
+
+            order, created = await repo.insert_or_get_order(order_data)
+            assert created and order.status == "pending"
+            order, created = await repo.insert_or_get_order(
+                {**order_data, "status": "received"}
+            )
+            assert not created and order.status == "pending"
+
+            assert await repo.transition_order(order_data["id"], "paid", "new") is None
+            order = await repo.transition_order(order_data["id"], "paid", "pending")
+            assert order.status == "paid" and order.items == order_data["items"]
+            await db.commit()
+
+            assert await repo.get_order_status(order_data["id"]) == "paid"
+            assert await repo.get_order_status(f"order-{uuid.uuid4()}") is None
+
+    @pytest.mark.asyncio
+    async def test_payment_idempotency(self, async_test_database):
+        """Test async payment creation and idempotency check"""
+        payment_id = f"payment-{uuid.uuid4()}"
+
+        async with async_test_database() as db:
+            repo = AsyncPaymentRepository(db)
+
+            assert await repo.check_payment_exists(payment_id) is None
+
+            await repo.create_payment(
+                {
+                    "id": payment_id,
+                    "order_id": f"order-{uuid.uuid4()}",
+                    "amount": 99.99,
+                    "status": "pending",
+                }
+            )
+            updated_payment = await repo.update_payment_status(payment_id, "completed")
+
+            assert updated_payment.status == "completed"
+            existing_payment = await repo.check_payment_exists(payment_id)
+            assert existing_payment.status == "completed"
+
+    @pytest.mark.asyncio
+    async def test_get_order_events(self, async_test_database):
+        """Test logging and retrieving events asynchronously"""
+        order_id = f"order-{uuid.uuid4()}"
+
+        async with async_test_database() as db:
+            repo = AsyncEventRepository(db)
+            for event_type in ["order_created", "payment_processed"]:
+                await repo.log_event({"order_id": order_id, "event_type": event_type})
+
+            order_events = await repo.get_order_events(order_id)
+
+            assert [e.event_type for e in order_events] == [
+                "order_created",
+                "payment_processed",
+            ]
+
+    @pytest.mark.asyncio
+    async def test_insert_or_get_without_on_conflict(
+        self, async_test_database, order_data, monkeypatch
+    ):
+        """Test the fallback for backends without ON CONFLICT"""
+        monkeypatch.setattr(database, "_UPSERT_INSERTS", {})
+        payment = {
+            "id": f"payment-{uuid.uuid4()}",
+            "order_id": order_data["id"],
+            "amount": 99.99,
+            "status": "completed",
+        }
+        columns = [Payment.status, Payment.transaction_id]
+
+        async with async_test_database() as db:
+            db.add(Order(**order_data))
+            row, inserted = await insert_or_get(
+                db, Payment, {**payment, "transaction_id": "txn-1"}, columns
+            )
+            assert inserted and row.transaction_id == "txn-1"
+
+            row, inserted = await insert_or_get(
+                db, Payment, {**payment, "transaction_id": "txn-2"}, columns
+            )
+            assert not inserted and row.transaction_id == "txn-1"
+            await db.commit()
+
+        # The duplicate only rolled back its own insert
+        async with async_test_database() as db:
+            assert await db.get(Order, order_data["id"]) is not None
+
+
+class TestDatabaseConfig:
+    """Test database configuration and pool instrumentation"""
+
+    def test_config_from_env(self, monkeypatch):
+        """Test reading pool settings from the environment"""
+        monkeypatch.setenv("DATABASE_URL", "postgresql://u:p@db:5432/orders")
+        monkeypatch.setenv("DB_POOL_SIZE", "20")
+        monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+
+        config = DatabaseConfig.from_env()
+
+        assert config.url == "postgresql://u:p@db:5432/orders"
+        assert config.pool_size == 20
+        assert config.pool_pre_ping is False
+        assert config.pool_capacity == 20 + config.max_overflow
+
+    def test_cli_overrides_env(self, monkeypatch):
+        """Test that CLI flags win over environment values"""
+        import argparse
+
+        monkeypatch.setenv("DB_POOL_SIZE", "20")
+        parser = argparse.ArgumentParser()
+        add_database_arguments(parser)
+
+        args = parser.parse_args(["--db-pool-size", "8", "--no-db-pool-pre-ping"])
+        config = database_config_from_args(args)
+
+        assert config.pool_size == 8
+        assert config.pool_pre_ping is False
+
+    def test_async_engine_uses_async_driver(self):
+        """Test that the async engine swaps in the asyncpg driver"""
+        config = DatabaseConfig(
+            url="postgresql://u:p@db:5432/orders", statement_timeout_ms=5000
+        )
+
+        async_engine = build_async_engine(config)
+
+        assert async_engine.url.drivername == "postgresql+asyncpg"
+        assert async_engine.url.password == "p"
+        assert describe_pool(async_engine.pool)["size"] == config.pool_size
+
+    def test_pool_stats(self, tmp_path):
+        """Test pool occupancy and wait time reporting"""
+        config = DatabaseConfig(url=f"sqlite:///{tmp_path}/pool.db", pool_size=2)
+        engine = build_engine(config)
+
+        with engine.connect():
+            stats = describe_pool(engine.pool)
+            assert stats["checked_out"] == 1
+            assert stats["size"] == 2
+            assert stats["checkouts"] >= 1
+            assert stats["wait_time_max_ms"] >= 0
+
+        assert describe_pool(engine.pool)["checked_out"] == 0
+        engine.dispose()
+
+    def test_pool_wait_stats_per_engine(self, tmp_path):
+        """Test that each engine counts its own checkouts"""
+        first = build_engine(DatabaseConfig(url=f"sqlite:///{tmp_path}/a.db"))
+        second = build_engine(DatabaseConfig(url=f"sqlite:///{tmp_path}/b.db"))
+
+        for _ in range(3):
+            with first.connect():
+                pass
+
+        assert describe_pool(first.pool)["checkouts"] == 3
+        assert describe_pool(second.pool)["checkouts"] == 0
+        first.dispose()
+        second.dispose()
+
+    def test_migrate_creates_sqlite_schema(self, tmp_path):
+        """Test the SQLite stand-in gets its tables from the models"""
+        from app.migrate import migrate, missing_sqlite_tables
+
+        engine = build_engine(DatabaseConfig(url=f"sqlite:///{tmp_path}/m.db"))
+
+        assert set(missing_sqlite_tables(engine)) == {"orders", "payments", "events"}
+        assert set(migrate(engine)) == {"orders", "payments", "events"}
+        assert missing_sqlite_tables(engine) == []
+        assert migrate(engine) == []
+        engine.dispose()
+
+    def test_migrate_sends_files_without_parameters(self, tmp_path):
+        """Test format() placeholders in a file reach PostgreSQL untouched"""
+        from app.migrate import migrate
+
+        sql = "DO $$ BEGIN EXECUTE format('CREATE TABLE %I ()', 't'); END $$;"
+        (tmp_path / "001_format.sql").write_text(sql)
+        engine = MagicMock()
+        engine.dialect.name = "postgresql"
+        conn = engine.connect.return_value.__enter__.return_value
+
+        assert migrate(engine, tmp_path) == ["001_format"]
+
+        conn.execution_options.assert_called_once_with(no_parameters=True)
+        raw = conn.execution_options.return_value
+        raw.exec_driver_sql.assert_called_once_with(sql)
+        assert all("%I" not in str(c) for c in conn.exec_driver_sql.call_args_list)
+
+    def test_migrate_creates_upcoming_partitions(self, tmp_path):
+        """Test that migrating, not worker startup, creates events partitions"""
+        from app.migrate import migrate
+
+        engine = MagicMock()
+        engine.dialect.name = "postgresql"
+        conn = engine.connect.return_value.__enter__.return_value
+        conn.dialect.name = "postgresql"
+        conn.execute.return_value.scalars.return_value = []
+        conn.execute.return_value.scalar.return_value = "p"
+
+        with patch(
+            "app.migrate.ensure_event_partitions", return_value=["events_p2026_11"]
+        ) as ensure:
+            assert migrate(engine, tmp_path, partitions_ahead=2) == []
+
+        ensure.assert_called_once_with(conn, 2)
+
+
+class TestBatchedEventSink:
+    """Test the buffered events writer"""
+
+    def test_unknown_mode_is_rejected(self, monkeypatch):
+        """Test a misspelt EVENT_SINK_MODE fails instead of running batched"""
+        monkeypatch.setenv("EVENT_SINK_MODE", "durabel")
+        with pytest.raises(ValueError, match="EVENT_SINK_MODE"):
+            EventSinkConfig.from_env()
+
+    def _event(self, order_id, event_type="order_created"):
+        return {"order_id": order_id, "event_type": event_type}
+
+    @pytest.mark.asyncio
+    async def test_flushes_on_batch_size(self, async_test_database):
+        """Test that a full batch is written with a single INSERT"""
+        order_id = f"order-{uuid.uuid4()}"
+        sink = BatchedEventSink(
+            async_test_database, max_batch_size=5, flush_interval=60, durable=True
+        )
+        sink.start()
+
+        await asyncio.gather(*(sink.write(self._event(order_id)) for _ in range(5)))
+
+        assert sink.stats()["batches_written"] == 1
+        assert sink.stats()["events_written"] == 5
+        await sink.close()
+
+    @pytest.mark.asyncio
+    async def test_close_flushes_pending_events(self, async_test_database):
+        """Test that buffered events are written on shutdown"""
+        order_id = f"order-{uuid.uuid4()}"
+        sink = BatchedEventSink(async_test_database, flush_interval=60)
+        sink.start()
+
+        for event_type in ["order_created", "payment_processed"]:
+            await sink.write(self._event(order_id, event_type))
+        await sink.close()
+
+        async with async_test_database() as db:
+            order_events = await AsyncEventRepository(db).get_order_events(order_id)
+        assert [e.event_type for e in order_events] == [
+            "order_created",
+            "payment_processed",
+        ]
+
+        with pytest.raises(RuntimeError):
+            await sink.write(self._event(order_id))
+
+    @pytest.mark.asyncio
+    async def test_durable_write_raises_when_flush_fails(self):
+        """Test that durable writers see flush failures so activities retry"""
+        broken_session = MagicMock()
+        broken_session.return_value.__aenter__.side_effect = RuntimeError("db down")
+        sink = BatchedEventSink(
+            broken_session, flush_interval=0, durable=True, flush_attempts=1
+        )
+        sink.start()
+
+        with pytest.raises(RuntimeError, match="db down"):
+            await sink.write(self._event(f"order-{uuid.uuid4()}"))
+
+        assert sink.stats()["events_dropped"] == 1
+        await sink.close()
+
+    @pytest.mark.asyncio
+    async def test_commit_with_event_uses_sink(self, async_test_database):
+        """Test that stubs route events through the process-wide sink"""
+        order_id = f"order-{uuid.uuid4()}"
+        sink = start_event_sink(
+            EventSinkConfig(mode="durable", flush_interval_ms=0), async_test_database
+        )
+        try:
+            async with async_test_database() as db:
+                await commit_with_event(db, self._event(order_id))
+            assert sink.stats()["events_written"] == 1
+        finally:
+            await stop_event_sink()
+
+        assert get_event_sink() is None
+
+    @pytest.mark.asyncio
+    async def test_inline_and_sink_events_share_a_clock(self, async_test_database):
+        """Test that both modes stamp events with the worker's clock"""
+        order_id = f"order-{uuid.uuid4()}"
+        stamps = [datetime(2001, 1, 1, 0, 0, s) for s in range(3)]
+        config = EventSinkConfig(mode="durable", flush_interval_ms=0)
+        with patch("app.event_sink.event_timestamp", side_effect=stamps):
+            async with async_test_database() as db:
+                await commit_with_event(db, self._event(order_id, "inline"))
+                start_event_sink(config, async_test_database)
+                try:
+                    await commit_with_event(db, self._event(order_id, "batched"))
+                finally:
+                    await stop_event_sink()
+                await commit_with_event(db, self._event(order_id, "inline again"))
+
+        async with async_test_database() as db:
+            order_events = await AsyncEventRepository(db).get_order_events(order_id)
+        assert [(e.event_type, e.timestamp) for e in order_events] == list(
+            zip(["inline", "batched", "inline again"], stamps)
+        )
+
+
+class TestBulkRepositoryOperations:
+    """Test bulk repository methods issue a constant number of statements"""
+
+    @pytest.fixture
+    def db_session(self, test_database):
+        """Create a test database session"""
+        session = test_database()
+        return session
+
+    def _orders(self, count):
+        return [
+            {
+                "id": f"order-{uuid.uuid4()}",
+                "status": "pending",
+                "customer_name": f"Customer {i}",
+                "items": [{"sku": "TEST123", "qty": 1}],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_orders(self, db_session):
+        """Test creating, fetching and updating many orders"""
+        repo = OrderRepository(db_session)
+        orders_data = self._orders(50)
+        order_ids = [o["id"] for o in orders_data]
+
+        with count_statements(db_session.get_bind()) as statements:
+            orders = repo.create_orders(orders_data)
+        assert len(statements) == 1
+        assert [o.id for o in orders] == order_ids
+
+        with count_statements(db_session.get_bind()) as statements:
+            updated = repo.update_orders_status(order_ids[:30], "shipped")
+        assert len(statements) == 1
+        assert len(updated) == 30
+        assert {o.status for o in updated} == {"shipped"}
+
+        with count_statements(db_session.get_bind()) as statements:
+            fetched = repo.get_orders(order_ids)
+        assert len(statements) == 1
+        assert len(fetched) == 50
+        assert sum(o.status == "shipped" for o in fetched) == 30
+
+        assert repo.get_orders([]) == []
+
+    def test_bulk_payments(self, db_session):
+        """Test creating and updating many payments"""
+        repo = PaymentRepository(db_session)
+        payments_data = [
+            {
+                "id": f"payment-{uuid.uuid4()}",
+                "order_id": f"order-{uuid.uuid4()}",
+                "amount": 10.0,
+                "status": "pending",
+            }
+            for _ in range(20)
+        ]
+        payment_ids = [p["id"] for p in payments_data]
+
+        repo.create_payments(payments_data)
+
+        with count_statements(db_session.get_bind()) as statements:
+            updated = repo.update_payments_status(payment_ids, "completed")
+        assert len(statements) == 1
+        assert len(updated) == 20
+
+        fetched = repo.get_payments(payment_ids)
+        assert {p.status for p in fetched} == {"completed"}
+
+    def test_events_for_many_orders(self, db_session):
+        """Test logging and grouping events for many orders"""
+        repo = EventRepository(db_session)
+        order_ids = [f"order-{uuid.uuid4()}" for _ in range(10)]
+        events_data = [
+            {"order_id": order_id, "event_type": event_type}
+            for order_id in order_ids[:9]
+            for event_type in ["order_created", "payment_processed"]
+        ]
+
+        with count_statements(db_session.get_bind()) as statements:
+            repo.log_events(events_data)
+        assert len(statements) == 1
+
+        with count_statements(db_session.get_bind()) as statements:
+            events_by_order = repo.get_events_for_orders(order_ids)
+        assert len(statements) == 1
+
+        assert set(events_by_order) == set(order_ids)
+        assert [e.event_type for e in events_by_order[order_ids[0]]] == [
+            "order_created",
+            "payment_processed",
+        ]
+        assert events_by_order[order_ids[9]] == []
+
+    def test_events_for_orders_break_timestamp_ties_by_id(self, db_session):
+        """Test bulk reads order same-timestamp events like per-order reads"""
+        repo = EventRepository(db_session)
+        order_id = f"order-{uuid.uuid4()}"
+        stamp = datetime(2024, 1, 1, 12, 0, 0)
+        repo.log_events(
+            [
+                {"order_id": order_id, "event_type": f"step_{i}", "timestamp": stamp}
+                for i in range(5)
+            ]
+        )
+
+        with count_statements(db_session.get_bind()) as statements:
+            bulk = repo.get_events_for_orders([order_id])[order_id]
+        assert "events.id" in statements[0].rsplit("ORDER BY", 1)[1]
+        assert [e.id for e in bulk] == [e.id for e in repo.get_order_events(order_id)]
+        assert [e.event_type for e in bulk] == [f"step_{i}" for i in range(5)]
+
+    def test_order_events_pages(self, db_session):
+        """Test keyset pages follow (timestamp, id) order across timestamp ties"""
+        repo = EventRepository(db_session)
+        order_id = f"order-{uuid.uuid4()}"
+        repo.log_events(
+            [
+                {
+                    "order_id": order_id,
+                    "event_type": f"step_{i}",
+                    "timestamp": datetime(2024, 5, 1, 10, 0, i // 2),
+                }
+                for i in range(5)
+            ]
+        )
+
+        pages, cursor = [], None
+        while True:
+            with count_statements(db_session.get_bind()) as statements:
+                page, cursor = repo.get_order_events_page(order_id, 2, cursor)
+            assert len(statements) == 1
+            pages.append([e.event_type for e in page])
+            if cursor is None:
+                break
+
+        assert pages == [["step_0", "step_1"], ["step_2", "step_3"], ["step_4"]]
+        with pytest.raises(ValueError):
+            repo.get_order_events_page(order_id, 2, "not-a-cursor")
+
+    def test_order_events_pages_with_server_timestamps(self, db_session):
+        """Test pages of events stamped by the database in the same second"""
+        repo = EventRepository(db_session)
+        order_id = f"order-{uuid.uuid4()}"
+        # No timestamp given: SQLite stores CURRENT_TIMESTAMP, without fraction
+        repo.log_events(
+            [{"order_id": order_id, "event_type": f"step_{i}"} for i in range(5)]
+        )
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = repo.get_order_events_page(order_id, 2, cursor)
+            seen.extend(e.event_type for e in page)
+            if cursor is None:
+                break
+
+        assert seen == [f"step_{i}" for i in range(5)]
+
+    @pytest.mark.asyncio
+    async def test_async_bulk_operations(self, async_test_database):
+        """Test the async bulk methods"""
+        orders_data = self._orders(5)
+        order_ids = [o["id"] for o in orders_data]
+
+        async with async_test_database() as db:
+            orders = await AsyncOrderRepository(db).create_orders(orders_data)
+            assert [o.id for o in orders] == order_ids
+
+            updated = await AsyncOrderRepository(db).update_orders_status(
+                order_ids, "paid"
+            )
+            assert {o.status for o in updated} == {"paid"}
+
+            await AsyncEventRepository(db).log_events(
+                [{"order_id": order_id, "event_type": "paid"} for order_id in order_ids]
+            )
+            events_by_order = await AsyncEventRepository(db).get_events_for_orders(
+                order_ids
+            )
+            assert all(len(events) == 1 for events in events_by_order.values())
+
+
+class TestLazyEngine:
+    """Test that engines are only created on first use"""
+
+    def test_import_does_not_connect(self):
+        """Test that importing the app works with the database down"""
+        env = {**os.environ, "DATABASE_URL": "postgresql://u:p@127.0.0.1:1/none"}
+        code = (
+            "import app.api, app.worker, app.database as d; "
+            "assert d._engine is None and d._async_engine is None"
+        )
+
+        result = subprocess.run(
+            [sys.executable, "-c", code], env=env, capture_output=True, text=True
+        )
+
+        assert result.returncode == 0, result.stderr
+
+    def test_engine_created_on_first_use(self, tmp_path):
+        """Test configure_database defers engine creation"""
+        original = database.db_config
+        try:
+            database.configure_database(
+                DatabaseConfig(url=f"sqlite:///{tmp_path}/lazy.db")
+            )
+            assert database.get_pool_stats()["sync"] is None
+
+            engine = database.get_engine()
+            assert database.get_engine() is engine
+            assert database.get_session_factory().kw["bind"] is engine
+            assert database.get_pool_stats()["sync"]["checked_out"] == 0
+        finally:
+            database.configure_database(original)
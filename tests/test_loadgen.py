@@ -0,0 +1,185 @@
+"""Tests for the load generator"""
+
+import asyncio
+
+import httpx
+import pytest
+from temporalio.exceptions import WorkflowAlreadyStartedError
+
+from app.loadgen import (
+    MAX_ERROR_SAMPLES,
+    ApiTarget,
+    LoadGenerator,
+    percentile,
+    print_summary,
+    summarize,
+)
+
+
+class FakeTarget:
+    """Completes every order immediately with fixed step timings"""
+
+    name = "fake"
+    shipping_mode = "activities"
+
+    def __init__(self, fail_start=(), already_started=(), hang=()):
+        self.fail_start = set(fail_start)
+        self.already_started = set(already_started)
+        self.hang = set(hang)
+        self.started = []
+        self.approved = []
+        self.closed = False
+
+    async def start(self, order_id):
+        index = int(order_id.rsplit("-", 1)[1])
+        if index in self.fail_start:
+            raise RuntimeError("boom")
+        if index in self.already_started:
+            raise WorkflowAlreadyStartedError(f"workflow-{order_id}", "OrderWorkflow")
+        self.started.append(order_id)
+
+    async def approve(self, order_id):
+        self.approved.append(order_id)
+
+    async def wait(self, order_id):
+        if int(order_id.rsplit("-", 1)[1]) in self.hang:
+            await asyncio.Event().wait()
+        return {
+            "status": "completed",
+            "step_timings": {"receiving": 0.1, "charging_payment": 0.3},
+        }
+
+    async def close(self):
+        self.closed = True
+
+
+class TestPercentiles:
+    def test_percentile_interpolates(self):
+        values = [1.0, 2.0, 3.0, 4.0]
+        assert percentile(values, 0) == 1.0
+        assert percentile(values, 50) == 2.5
+        assert percentile(values, 100) == 4.0
+
+    def test_percentile_of_empty_list_is_none(self):
+        assert percentile([], 99) is None
+
+    def test_summarize(self):
+        summary = summarize([float(v) for v in range(1, 101)])
+        assert summary["count"] == 100
+        assert summary["mean"] == 50.5
+        assert summary["p99"] == pytest.approx(99.01)
+        assert summary["max"] == 100.0
+
+
+class TestLoadGenerator:
+    @pytest.mark.asyncio
+    async def test_report_counts_outcomes_and_latencies(self):
+        target = FakeTarget(fail_start={1}, already_started={2})
+        generator = LoadGenerator(
+            target, orders=5, concurrency=2, approve_review=True, run_id="t"
+        )
+
+        report = await generator.run()
+
+        assert target.closed
+        assert target.approved == target.started
+        assert report["orders"]["requested"] == 5
+        assert report["orders"]["started"] == 3
+        assert report["orders"]["completed"] == 3
+        assert report["orders"]["outcomes"] == {
+            "already_started": 1,
+            "completed": 3,
+            "start_error": 1,
+        }
+        assert report["errors"] == ["start load-t-1: RuntimeError: boom"]
+        assert report["latency_seconds"]["end_to_end"]["count"] == 3
+        steps = report["latency_seconds"]["steps"]
+        assert set(steps) == {"receiving", "charging_payment"}
+        assert steps["charging_payment"]["p50"] == 0.3
+        assert report["throughput"]["completed_per_second"] > 0
+
+    @pytest.mark.asyncio
+    async def test_rate_spaces_out_starts(self):
+        generator = LoadGenerator(FakeTarget(), orders=3, rate=20.0, run_id="r")
+
+        report = await generator.run()
+
+        # Third order is due 2 / 20 = 0.1s after the first
+        assert report["duration_seconds"] >= 0.1
+        assert report["orders"]["completed"] == 3
+
+    @pytest.mark.asyncio
+    async def test_order_timeout_counts_as_failed(self):
+        generator = LoadGenerator(
+            FakeTarget(hang={0}), orders=2, run_id="h", order_timeout=0.05
+        )
+
+        report = await generator.run()
+
+        assert report["orders"]["outcomes"] == {"completed": 1, "timeout_error": 1}
+        assert report["errors"] == [
+            "timeout load-h-0: TimeoutError: not finished after 0.05s"
+        ]
+
+    @pytest.mark.asyncio
+    async def test_errors_are_counted_beyond_the_samples(self, capsys):
+        orders = MAX_ERROR_SAMPLES + 5
+        generator = LoadGenerator(
+            FakeTarget(fail_start=range(orders)), orders=orders, run_id="e"
+        )
+
+        report = await generator.run()
+        print_summary(report)
+
+        assert report["error_count"] == orders
+        assert len(report["errors"]) == MAX_ERROR_SAMPLES
+        assert f"❌ {orders} errors" in capsys.readouterr().out
+
+
+def api_target(*responses):
+    """ApiTarget whose /progress polls get `responses` (status, body) in turn"""
+    replies = iter(responses)
+
+    def handler(request):
+        status, body = next(replies)
+        return httpx.Response(status, json=body)
+
+    target = ApiTarget("http://api", "activities", poll_interval=0)
+    target.http = httpx.AsyncClient(
+        base_url="http://api", transport=httpx.MockTransport(handler)
+    )
+    return target
+
+
+class TestApiTarget:
+    @pytest.mark.asyncio
+    async def test_wait_tolerates_404_until_the_workflow_is_visible(self):
+        target = api_target(
+            (404, {"detail": "Workflow not found"}),
+            (200, {"step": "charging_payment"}),
+            (200, {"step": "completed", "step_timings": {"receiving": 0.1}}),
+        )
+
+        result = await target.wait("order-1")
+
+        assert result == {"status": "completed", "step_timings": {"receiving": 0.1}}
+        await target.close()
+
+    @pytest.mark.asyncio
+    async def test_wait_raises_on_404_after_the_workflow_was_seen(self):
+        target = api_target(
+            (200, {"step": "charging_payment"}),
+            (404, {"detail": "Workflow not found"}),
+        )
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await target.wait("order-1")
+        await target.close()
+
+    @pytest.mark.asyncio
+    async def test_wait_raises_on_server_errors(self):
+        target = api_target((500, {"detail": "Temporal client not available"}))
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await target.wait("order-1")
+        await target.close()
@@ -0,0 +1,127 @@
+"""Tests for structured logging"""
+
+import json
+import logging
+import queue
+import sys
+
+import pytest
+from temporalio import activity
+from temporalio.testing import ActivityEnvironment
+
+from app.config import LogConfig
+from app.logs import (
+    LOG_RECORDS_DROPPED,
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    TextFormatter,
+    order_id_from_workflow_id,
+    setup_logging,
+    stop_logging,
+)
+
+
+class CaptureHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def captured():
+    """Records reaching the root logger while a test runs"""
+    handler = CaptureHandler()
+    root = logging.getLogger()
+    level = root.level
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    activity.logger.activity_info_on_message = False
+    yield handler.records
+    root.removeHandler(handler)
+    root.setLevel(level)
+    activity.logger.activity_info_on_message = True
+
+
+class TestFormatters:
+    def test_order_id_from_workflow_id(self):
+        assert order_id_from_workflow_id("workflow-order-1") == "order-1"
+        assert order_id_from_workflow_id("shipping-order-1") == "order-1"
+        assert order_id_from_workflow_id("other") is None
+
+    @pytest.mark.asyncio
+    async def test_activity_records_carry_correlation_fields(self, captured):
+        async def log_something():
+            activity.logger.info("Charging %s", "payment", extra={"payment_id": "p1"})
+
+        await ActivityEnvironment().run(log_something)
+
+        entry = json.loads(JsonFormatter().format(captured[0]))
+        assert entry["message"] == "Charging payment"
+        assert entry["level"] == "INFO"
+        assert entry["payment_id"] == "p1"
+        assert entry["activity_type"] == "unknown"
+        assert entry["workflow_id"] == "test"
+
+    def test_order_id_is_derived_and_text_format_lists_fields(self):
+        record = logging.makeLogRecord(
+            {
+                "msg": "Step 1",
+                "levelname": "INFO",
+                "temporal_workflow": {"workflow_id": "workflow-o-7", "run_id": "r"},
+            }
+        )
+
+        assert json.loads(JsonFormatter().format(record))["order_id"] == "o-7"
+        line = TextFormatter().format(record)
+        assert "Step 1 [workflow_id=workflow-o-7 run_id=r order_id=o-7]" in line
+
+
+class TestQueueHandler:
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        dropped = LOG_RECORDS_DROPPED.value()
+        record = logging.makeLogRecord({"msg": "x"})
+
+        handler.handle(record)
+        handler.handle(record)
+
+        assert handler.queue.qsize() == 1
+        assert LOG_RECORDS_DROPPED.value() == dropped + 1
+
+    def test_exception_is_kept_as_text(self):
+        handler = NonBlockingQueueHandler(queue.Queue())
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            exc_info = sys.exc_info()
+        record = logging.makeLogRecord(
+            {"msg": "failed %s", "args": ("x",), "exc_info": exc_info}
+        )
+
+        prepared = handler.prepare(record)
+
+        assert prepared.getMessage() == "failed x"
+        assert prepared.exc_info is None
+        assert "ValueError: boom" in prepared.exc_text
+
+    def test_setup_logging_writes_json_lines(self, capsys):
+        setup_logging(LogConfig(level="WARNING", format="json"))
+        try:
+            logging.getLogger("app.test").info("hidden")
+            logging.getLogger("app.test").warning("shown", extra={"order_id": "o1"})
+        finally:
+            stop_logging()
+
+        lines = capsys.readouterr().out.strip().splitlines()
+        assert len(lines) == 1
+        entry = json.loads(lines[0])
+        assert entry["message"] == "shown"
+        assert entry["order_id"] == "o1"
+        assert entry["logger"] == "app.test"
+
+    def test_unknown_format_is_rejected(self):
+        with pytest.raises(ValueError):
+            setup_logging(LogConfig(format="xml"))
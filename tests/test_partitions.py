@@ -0,0 +1,143 @@
+"""Tests for events partition maintenance"""
+
+import argparse
+import gzip
+import json
+from datetime import date, datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.config import (
+    PartitionConfig,
+    add_partition_arguments,
+    partition_config_from_args,
+)
+from app.migrate import discover_migrations
+from app.models import Base, Event, Order
+from app.partitions import (
+    add_months,
+    archive_partition,
+    expired_partitions,
+    export_rows,
+    maintain_partitions,
+    partition_month,
+    partition_name,
+)
+
+
+class TestPartitionNames:
+    """Test the month arithmetic behind partition names"""
+
+    def test_add_months_crosses_years(self):
+        assert add_months(date(2025, 1, 31), -1) == date(2024, 12, 1)
+        assert add_months(date(2025, 11, 15), 3) == date(2026, 2, 1)
+        assert add_months(date(2025, 6, 1), -12) == date(2024, 6, 1)
+
+    def test_name_round_trip(self):
+        assert partition_name(date(2025, 3, 9)) == "events_p2025_03"
+        assert partition_month("events_p2025_03") == date(2025, 3, 1)
+        assert partition_month("events_default") is None
+        assert partition_month("events_p2025_3") is None
+
+    def test_expired_partitions(self):
+        names = [
+            "events_default",
+            "events_p2024_04",
+            "events_p2024_05",
+            "events_p2024_06",
+            "events_p2025_06",
+        ]
+
+        assert expired_partitions(names, 12, today=date(2025, 6, 20)) == [
+            "events_p2024_04",
+            "events_p2024_05",
+        ]
+        assert expired_partitions(names, 0, today=date(2025, 6, 20)) == []
+
+
+class TestPartitionMaintenance:
+    """Test the parts of the retention job that do not need PostgreSQL"""
+
+    def test_sqlite_is_left_alone(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}")
+        Base.metadata.create_all(engine)
+
+        report = maintain_partitions(engine, PartitionConfig())
+
+        assert report == {"partitioned": False, "created": [], "archived": {}}
+
+    def test_export_rows_writes_json_lines(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}")
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(Order.__table__.insert(), {"id": "o1", "status": "received"})
+            conn.execute(
+                Event.__table__.insert(),
+                [
+                    {
+                        "order_id": "o1",
+                        "event_type": event_type,
+                        "event_data": {"status": event_type},
+                        "timestamp": datetime(2024, 5, day),
+                    }
+                    for day, event_type in ((1, "order_received"), (2, "shipped"))
+                ],
+            )
+
+        with engine.connect() as conn:
+            path = export_rows(conn, "events", tmp_path / "archive")
+
+        assert path.name == "events.jsonl.gz"
+        assert not list(path.parent.glob("*.partial"))
+        with gzip.open(path, "rt") as f:
+            rows = [json.loads(line) for line in f]
+        assert [row["event_type"] for row in rows] == ["order_received", "shipped"]
+        assert rows[0]["timestamp"].startswith("2024-05-01")
+
+    def test_detach_commits_before_the_export(self, tmp_path):
+        """Test the lock on events is released before the slow export"""
+        steps = []
+        conn = MagicMock()
+        conn.dialect.identifier_preparer.quote = lambda name: name
+        conn.begin.return_value.__exit__.side_effect = lambda *exc: steps.append(
+            "commit"
+        )
+        conn.exec_driver_sql.side_effect = lambda sql: steps.append(sql.split()[0])
+
+        def export(conn, table, directory):
+            steps.append("export")
+            return directory / f"{table}.jsonl.gz"
+
+        config = PartitionConfig(archive="file", archive_dir=str(tmp_path))
+        with patch("app.partitions.export_rows", side_effect=export):
+            archive_partition(conn, "events_p2024_01", config)
+
+        assert steps == ["ALTER", "commit", "export", "DROP", "commit"]
+
+
+class TestPartitionConfig:
+    """Test PartitionConfig from environment and flags"""
+
+    def test_env_and_flags(self, monkeypatch):
+        monkeypatch.setenv("EVENTS_RETENTION_MONTHS", "6")
+        monkeypatch.setenv("EVENTS_ARCHIVE", "file")
+        parser = argparse.ArgumentParser()
+        add_partition_arguments(parser)
+
+        config = partition_config_from_args(
+            parser.parse_args(["--partitions-ahead", "2"])
+        )
+
+        assert config == PartitionConfig(
+            months_ahead=2, retention_months=6, archive="file"
+        )
+
+    def test_unknown_archive_mode_is_rejected(self):
+        with pytest.raises(ValueError):
+            PartitionConfig(archive="s3")
+
+    def test_partition_migration_runs_after_init(self):
+        names = [path.name for path in discover_migrations()]
+        assert names.index("002_partition_events.sql") > names.index("001_init.sql")
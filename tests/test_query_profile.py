@@ -0,0 +1,159 @@
+"""Tests for SQL query profiling and query budgets"""
+
+import logging
+import time
+import uuid
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import StaticPool
+
+from app import query_profile
+from app.database import instrument_engine
+from app.function_stubs import (
+    carrier_dispatched,
+    order_received,
+    order_shipped,
+    order_validated,
+    package_prepared,
+    payment_charged,
+)
+from app.metrics import DB_SLOW_QUERIES, QUERY_BUDGET_EXCEEDED
+from app.query_profile import (
+    QueryBudgetExceeded,
+    configure_query_budgets,
+    profile_queries,
+    query_budget,
+)
+
+
+@query_budget(1)
+async def two_statements():
+    query_profile.record("SELECT 1", 0.001)
+    query_profile.record("SELECT 2", 0.001)
+
+
+class TestQueryProfile:
+    """Test statement counting and budget enforcement"""
+
+    def test_profiles_nest(self):
+        with profile_queries("outer") as outer:
+            query_profile.record("SELECT 1", 0.002)
+            with profile_queries("inner") as inner:
+                query_profile.record("SELECT 2", 0.003)
+            assert query_profile.current_profile() is outer
+        query_profile.record("SELECT 3", 0.001)
+
+        assert (outer.statements, inner.statements) == (2, 1)
+        assert outer.seconds == pytest.approx(0.005)
+        assert query_profile.current_profile() is None
+
+    @pytest.mark.asyncio
+    async def test_raise_mode_lists_statements(self):
+        with pytest.raises(QueryBudgetExceeded, match="ran 2 SQL statements") as exc:
+            await two_statements()
+        assert "SELECT 2" in str(exc.value)
+
+    @pytest.mark.asyncio
+    async def test_warn_mode_logs_and_counts(self, caplog):
+        configure_query_budgets("warn")
+        exceeded = QUERY_BUDGET_EXCEEDED.value(function="two_statements")
+
+        with caplog.at_level(logging.WARNING, logger="app.query_profile"):
+            await two_statements()
+
+        assert caplog.records[0].statements == 2
+        assert caplog.records[0].budget == 1
+        assert QUERY_BUDGET_EXCEEDED.value(function="two_statements") == exceeded + 1
+
+    @pytest.mark.asyncio
+    async def test_off_mode_only_counts(self):
+        configure_query_budgets("off")
+        await two_statements()
+
+    def test_failed_call_is_not_reported(self):
+        with pytest.raises(ValueError):
+            with profile_queries("failing", budget=0):
+                query_profile.record("SELECT 1", 0.001)
+                raise ValueError("boom")
+
+    def test_unknown_mode_is_rejected(self):
+        with pytest.raises(ValueError):
+            configure_query_budgets("strict")
+
+    def test_slow_queries_are_logged(self, caplog):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+
+        @event.listens_for(engine, "connect")
+        def add_sleep(dbapi_connection, connection_record):
+            dbapi_connection.create_function(
+                "sleep_ms", 1, lambda ms: time.sleep(ms / 1000)
+            )
+
+        instrument_engine(engine, "slow-test", slow_query_ms=5)
+        slow = DB_SLOW_QUERIES.value(engine="slow-test", operation="SELECT")
+
+        with caplog.at_level(logging.WARNING, logger="app.database"):
+            with engine.connect() as conn, profile_queries("report"):
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT sleep_ms(10)"))
+        engine.dispose()
+
+        assert [r.statement for r in caplog.records] == ["SELECT sleep_ms(10)"]
+        assert caplog.records[0].profile == "report"
+        assert caplog.records[0].duration_ms >= 5
+        assert DB_SLOW_QUERIES.value(engine="slow-test", operation="SELECT") == (
+            slow + 1
+        )
+
+
+class TestStubQueryBudgets:
+    """Lock in the statement count of each lifecycle step"""
+
+    @pytest.fixture(autouse=True)
+    def no_flaky_calls(self):
+        with patch("app.function_stubs.flaky_call", new=AsyncMock()):
+            yield
+
+    def test_every_step_declares_a_budget(self):
+        for step in (
+            order_received,
+            order_validated,
+            payment_charged,
+            order_shipped,
+            package_prepared,
+            carrier_dispatched,
+        ):
+            assert step.query_budget >= 1
+
+    @pytest.mark.asyncio
+    async def test_lifecycle_statement_counts(self, async_test_database, query_counter):
+        order_id = f"order-{uuid.uuid4()}"
+        payment_id = f"payment-{uuid.uuid4()}"
+        steps = [
+            ("received", lambda db: order_received(order_id, db)),
+            ("retried receive", lambda db: order_received(order_id, db)),
+            ("validated", lambda db: order_validated(order_id, db)),
+            ("charged", lambda db: payment_charged(order_id, payment_id, db)),
+            ("retried charge", lambda db: payment_charged(order_id, payment_id, db)),
+            ("shipped", lambda db: order_shipped(order_id, db)),
+        ]
+
+        counts = {}
+        async with async_test_database() as db:
+            for name, step in steps:
+                with query_counter(name) as queries:
+                    await step(db)
+                counts[name] = queries.statements
+
+        # One write per step plus its event; retries find the stored row
+        # and check that its event was written
+        assert counts == {
+            "received": 2,
+            "retried receive": 3,
+            "validated": 2,
+            "charged": 3,
+            "retried charge": 3,
+            "shipped": 2,
+        }
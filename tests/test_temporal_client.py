@@ -0,0 +1,124 @@
+"""Tests for the shared Temporal client factory"""
+
+import asyncio
+import pytest
+from datetime import timedelta
+from unittest.mock import patch, MagicMock, AsyncMock
+from temporalio.client import SignalWorkflowInput
+from temporalio.converter import DataConverter
+
+from app.config import TemporalConfig
+from app.temporal_client import (
+    DefaultRpcTimeoutInterceptor,
+    build_data_converter,
+    configure_temporal,
+    get_client,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_temporal():
+    """Start and finish every test without a cached client"""
+    configure_temporal(TemporalConfig())
+    yield
+    configure_temporal(TemporalConfig.from_env())
+
+
+def signal_input(rpc_timeout=None):
+    return SignalWorkflowInput(
+        id="workflow-1",
+        run_id=None,
+        signal="cancel_order_signal",
+        args=[],
+        headers={},
+        rpc_metadata={},
+        rpc_timeout=rpc_timeout,
+    )
+
+
+class TestGetClient:
+    """Test the process-wide client"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_connection(self):
+        """Test the connection is opened once"""
+        client = MagicMock()
+
+        async def connect(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return client
+
+        with patch(
+            "app.temporal_client.Client.connect", AsyncMock(side_effect=connect)
+        ) as mock_connect:
+            results = await asyncio.gather(*(get_client() for _ in range(5)))
+            assert await get_client() is client
+
+        assert all(result is client for result in results)
+        assert mock_connect.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_connect_uses_config(self):
+        """Test address, namespace and keepalive come from the config"""
+        configure_temporal(
+            TemporalConfig(
+                address="temporal:7233",
+                namespace="orders",
+                keepalive_interval_ms=5000,
+                rpc_timeout_seconds=0,
+            )
+        )
+
+        with patch(
+            "app.temporal_client.Client.connect", AsyncMock(return_value=MagicMock())
+        ) as mock_connect:
+            await get_client()
+
+        args, kwargs = mock_connect.await_args
+        assert args == ("temporal:7233",)
+        assert kwargs["namespace"] == "orders"
+        assert kwargs["keep_alive_config"].interval_millis == 5000
+        assert kwargs["interceptors"] == []
+
+    @pytest.mark.asyncio
+    async def test_failed_connect_is_retried(self):
+        """Test a failed connect is not cached"""
+        client = MagicMock()
+        connect = AsyncMock(side_effect=[RuntimeError("unavailable"), client])
+
+        with patch("app.temporal_client.Client.connect", connect):
+            with pytest.raises(RuntimeError):
+                await get_client()
+            assert await get_client() is client
+
+
+class TestDefaultRpcTimeout:
+    """Test the default rpc_timeout interceptor"""
+
+    @pytest.mark.asyncio
+    async def test_sets_timeout_only_when_missing(self):
+        next_outbound = MagicMock()
+        next_outbound.signal_workflow = AsyncMock()
+        outbound = DefaultRpcTimeoutInterceptor(timedelta(seconds=5)).intercept_client(
+            next_outbound
+        )
+
+        await outbound.signal_workflow(signal_input())
+        await outbound.signal_workflow(signal_input(timedelta(seconds=1)))
+
+        timeouts = [
+            call.args[0].rpc_timeout
+            for call in next_outbound.signal_workflow.await_args_list
+        ]
+        assert timeouts == [timedelta(seconds=5), timedelta(seconds=1)]
+
+
+class TestDataConverter:
+    """Test data converter selection"""
+
+    def test_default(self):
+        assert build_data_converter("default") is DataConverter.default
+
+    def test_unknown_name_is_rejected(self):
+        with pytest.raises(ValueError):
+            build_data_converter("msgpack")
@@ -0,0 +1,344 @@
+"""Tests for worker configuration"""
+
+import argparse
+import asyncio
+import inspect
+import os
+import pytest
+import signal
+import subprocess
+import sys
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import timedelta
+from temporalio import activity, workflow
+from temporalio.testing import ActivityEnvironment
+from temporalio.worker import PollerBehaviorSimpleMaximum, Worker
+
+from app import activities, activity_names, shipping_activities
+from app.order_workflow import OrderWorkflow
+from app.shipping_workflow import ShippingWorkflow
+from app.supervisor import Supervisor, WorkerProcess, build_workers
+from app.config import WorkerConfig, add_worker_arguments, worker_config_from_args
+from app import query_profile
+from app.metrics import (
+    ACTIVITY_DB_STATEMENTS,
+    ACTIVITY_LATENCY,
+    ACTIVITY_RETRIES,
+    start_metrics_server,
+)
+from app.worker_options import (
+    SDK_DEFAULT,
+    ActivityMetricsInterceptor,
+    describe_worker_config,
+    run_until_stopped,
+    worker_options,
+    workflow_runner,
+)
+
+
+class TestWorkerOptions:
+    """Test WorkerConfig -> Worker keyword arguments"""
+
+    def test_defaults_leave_sdk_limits_alone(self):
+        options = worker_options(WorkerConfig())
+
+        assert options["max_cached_workflows"] == 1000
+        assert options["graceful_shutdown_timeout"] == timedelta(seconds=10)
+        assert not any(name.startswith("max_concurrent") for name in options)
+        assert not any(name.endswith("poller_behavior") for name in options)
+        assert describe_worker_config(WorkerConfig())["max_concurrent_activities"] == (
+            SDK_DEFAULT
+        )
+
+    def test_limits_pollers_and_executors(self):
+        config = WorkerConfig(
+            max_concurrent_activities=15,
+            max_concurrent_workflow_tasks=20,
+            workflow_task_pollers=2,
+            activity_task_pollers=8,
+            max_cached_workflows=200,
+            activity_executor="thread",
+            activity_executor_threads=4,
+            workflow_task_threads=2,
+        )
+
+        options = worker_options(config)
+
+        assert options["max_concurrent_activities"] == 15
+        assert options["max_concurrent_workflow_tasks"] == 20
+        assert "max_concurrent_local_activities" not in options
+        assert options["workflow_task_poller_behavior"] == PollerBehaviorSimpleMaximum(
+            2
+        )
+        assert options["activity_task_poller_behavior"] == PollerBehaviorSimpleMaximum(
+            8
+        )
+        assert options["max_cached_workflows"] == 200
+        assert isinstance(options["activity_executor"], ThreadPoolExecutor)
+        assert options["activity_executor"]._max_workers == 4
+        assert options["workflow_task_executor"]._max_workers == 2
+
+    def test_options_are_worker_arguments(self):
+        """Test every option is a Worker keyword argument"""
+        config = WorkerConfig(
+            max_concurrent_activities=5,
+            max_concurrent_workflow_tasks=5,
+            max_concurrent_local_activities=5,
+            workflow_task_pollers=2,
+            activity_task_pollers=2,
+            activity_executor="thread",
+            workflow_task_threads=2,
+        )
+        parameters = inspect.signature(Worker.__init__).parameters
+
+        assert set(worker_options(config)) <= set(parameters)
+
+    def test_cli_overrides_environment(self, monkeypatch):
+        monkeypatch.setenv("WORKER_MAX_CONCURRENT_ACTIVITIES", "10")
+        monkeypatch.setenv("WORKER_WORKFLOW_TASK_POLLERS", "3")
+        parser = argparse.ArgumentParser()
+        add_worker_arguments(parser)
+
+        config = worker_config_from_args(
+            parser.parse_args(["--max-concurrent-activities", "25"])
+        )
+
+        assert config.max_concurrent_activities == 25
+        assert config.workflow_task_pollers == 3
+
+
+def python_worker(name: str, code: str) -> WorkerProcess:
+    return WorkerProcess(name=name, command=[sys.executable, "-c", code])
+
+
+class TestActivityMetrics:
+    """Test the activity metrics interceptor and worker /metrics endpoint"""
+
+    @staticmethod
+    def intercepted(result=None, error=None):
+        """Interceptor chain ending in a fake activity call"""
+
+        class Next:
+            async def execute_activity(self, input):
+                if error is not None:
+                    raise error
+                return result
+
+        return ActivityMetricsInterceptor().intercept_activity(Next())
+
+    @staticmethod
+    def count(outcome):
+        for key, series in ACTIVITY_LATENCY.snapshot().items():
+            if key == ("test_activity", "test-queue", outcome):
+                return series["count"]
+        return 0
+
+    @pytest.mark.asyncio
+    async def test_records_latency_and_retries(self):
+        env = ActivityEnvironment()
+        env.info = replace(
+            env.info, activity_type="test_activity", task_queue="test-queue", attempt=2
+        )
+        successes, failures = self.count("success"), self.count("failure")
+        retries = ACTIVITY_RETRIES.value(
+            activity="test_activity", task_queue="test-queue"
+        )
+
+        assert await env.run(self.intercepted(result=5).execute_activity, None) == 5
+        with pytest.raises(RuntimeError):
+            await env.run(
+                self.intercepted(error=RuntimeError("x")).execute_activity, None
+            )
+
+        assert self.count("success") == successes + 1
+        assert self.count("failure") == failures + 1
+        assert (
+            ACTIVITY_RETRIES.value(activity="test_activity", task_queue="test-queue")
+            == retries + 2
+        )
+
+    @pytest.mark.asyncio
+    async def test_counts_statements_per_attempt(self):
+        env = ActivityEnvironment()
+        env.info = replace(
+            env.info, activity_type="query_activity", task_queue="test-queue"
+        )
+        key = ("query_activity", "test-queue")
+        before = ACTIVITY_DB_STATEMENTS.snapshot().get(key, {"count": 0, "sum": 0})
+
+        class Next:
+            async def execute_activity(self, input):
+                query_profile.record("SELECT 1", 0.001)
+                query_profile.record("SELECT 2", 0.001)
+
+        inbound = ActivityMetricsInterceptor().intercept_activity(Next())
+        await env.run(inbound.execute_activity, None)
+
+        after = ACTIVITY_DB_STATEMENTS.snapshot()[key]
+        assert after["count"] == before["count"] + 1
+        assert after["sum"] == before["sum"] + 2
+
+    def test_metrics_server_serves_registry(self):
+        server = start_metrics_server("127.0.0.1", 0)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as r:
+                body = r.read().decode()
+        finally:
+            server.shutdown()
+
+        assert "# TYPE activity_execution_seconds histogram" in body
+        assert "# TYPE db_query_seconds histogram" in body
+
+
+class TestSupervisor:
+    """Test the multi-process worker supervisor"""
+
+    def test_builds_one_slot_per_process(self):
+        workers = build_workers(3, 1, ["--db-pool-size", "2"], [])
+
+        assert [w.name for w in workers] == [
+            "my-task-queue[0]",
+            "my-task-queue[1]",
+            "my-task-queue[2]",
+            "shipping-task-queue[0]",
+        ]
+        assert workers[0].command[1:] == ["-m", "app.worker", "--db-pool-size", "2"]
+        assert workers[3].command[1:] == ["-m", "app.worker_shipping"]
+        assert workers[0].env == {}
+
+    def test_assigns_metrics_ports_per_process(self):
+        workers = build_workers(2, 1, [], [], 9100, 9200)
+
+        assert [w.env["METRICS_PORT"] for w in workers] == ["9100", "9101", "9102"]
+        assert workers[2].env["TEMPORAL_METRICS_PORT"] == "9202"
+
+    @pytest.mark.asyncio
+    async def test_restarts_crashed_workers(self):
+        worker = python_worker("crashy", "import sys; sys.exit(3)")
+        supervisor = Supervisor([worker], restart_delay=0.01, max_restart_delay=0.01)
+
+        async def stop_after_restarts():
+            while worker.restarts < 2:
+                await asyncio.sleep(0.01)
+            supervisor.stop()
+
+        await asyncio.wait_for(
+            asyncio.gather(supervisor.run(), stop_after_restarts()), timeout=30
+        )
+
+        assert worker.restarts >= 2
+        assert len(set(worker.pids)) == len(worker.pids)
+
+    @pytest.mark.asyncio
+    async def test_stop_terminates_children(self):
+        worker = python_worker("sleepy", "import time; time.sleep(60)")
+        supervisor = Supervisor([worker], shutdown_timeout=10)
+
+        async def stop_when_started():
+            while worker.process is None:
+                await asyncio.sleep(0.01)
+            supervisor.stop()
+
+        await asyncio.wait_for(
+            asyncio.gather(supervisor.run(), stop_when_started()), timeout=30
+        )
+
+        assert worker.process.returncode == -signal.SIGTERM
+        assert worker.restarts == 0
+
+    @pytest.mark.asyncio
+    async def test_kills_children_that_ignore_sigterm(self):
+        code = (
+            "import signal, time; "
+            "signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+            "print('ready', flush=True); time.sleep(60)"
+        )
+        worker = python_worker("stubborn", code)
+        supervisor = Supervisor([worker], shutdown_timeout=0.5)
+
+        async def stop_when_started():
+            while worker.process is None:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.5)  # let it install the SIGTERM handler
+            supervisor.stop()
+
+        await asyncio.wait_for(
+            asyncio.gather(supervisor.run(), stop_when_started()), timeout=30
+        )
+
+        assert worker.process.returncode == -signal.SIGKILL
+
+
+class TestGracefulShutdown:
+    """Test run_until_stopped"""
+
+    @pytest.mark.asyncio
+    async def test_sigterm_shuts_worker_down(self):
+        class FakeWorker:
+            def __init__(self):
+                self.stopped = asyncio.Event()
+                self.shutdown_calls = 0
+
+            async def run(self):
+                await self.stopped.wait()
+
+            async def shutdown(self):
+                self.shutdown_calls += 1
+                self.stopped.set()
+
+        worker = FakeWorker()
+
+        def send_sigterm_twice():
+            os.kill(os.getpid(), signal.SIGTERM)
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        asyncio.get_running_loop().call_later(0.05, send_sigterm_twice)
+
+        await asyncio.wait_for(run_until_stopped(worker), timeout=10)
+
+        assert worker.shutdown_calls == 1
+
+
+class TestWorkflowSandboxImports:
+    """Test the workflows stay light to import in the sandbox"""
+
+    def test_workflow_modules_do_not_import_database(self):
+        code = (
+            "import sys, app.order_workflow, app.shipping_workflow; "
+            "heavy = [m for m in ('sqlalchemy', 'app.activities', 'app.database') "
+            "if m in sys.modules]; "
+            "assert not heavy, heavy"
+        )
+
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+
+        assert result.returncode == 0, result.stderr
+
+    def test_activity_names_match_registered_activities(self):
+        registered = set()
+        for module in (activities, shipping_activities):
+            for value in vars(module).values():
+                defn = activity._Definition.from_callable(value)
+                if defn is not None:
+                    registered.add(defn.name)
+        names = {
+            value
+            for name, value in vars(activity_names).items()
+            if name.isupper() and isinstance(value, str)
+        }
+
+        assert names <= registered
+
+    @pytest.mark.asyncio
+    async def test_workflows_load_in_passthrough_sandbox(self):
+        runner = workflow_runner()
+
+        for workflow_class in (OrderWorkflow, ShippingWorkflow):
+            runner.prepare_workflow(
+                workflow._Definition.must_from_class(workflow_class)
+            )